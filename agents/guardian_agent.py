@@ -14,6 +14,9 @@ import requests
 import platform
 import logging
 import uuid
+import math
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
 # Configuração de Logging (Stdout apenas - Serviço cuida do arquivo/rotação)
@@ -24,12 +27,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger("GuardianAgent")
 
+# Métricas numéricas amostradas no ring (ordem fixa das colunas)
+SAMPLE_METRICS = (
+    "cpu_usage", "ram_usage", "ram_free_gb", "disk_usage", "disk_free_gb",
+    "net_sent_mbps", "net_recv_mbps", "latency_ms", "target_latency_ms",
+)
+MAX_RING_CAPACITY = 4096
+
+
+class SampleRing:
+    """
+    Ring buffer compacto de amostras: uma coluna array('d') por métrica
+    (8 bytes por valor), com NaN para valores ausentes.
+    Cada amostra recebe um número de sequência crescente; o upload lê a janela
+    desde a última sequência enviada com sucesso.
+    """
+
+    def __init__(self, metrics, capacity):
+        self.metrics = tuple(metrics)
+        self.capacity = capacity
+        self.timestamps = array("d", [math.nan]) * capacity
+        self.columns = {name: array("d", [math.nan]) * capacity for name in self.metrics}
+        self.written = 0
+
+    def append(self, timestamp, values):
+        slot = self.written % self.capacity
+        self.timestamps[slot] = timestamp
+        for name in self.metrics:
+            value = values.get(name)
+            self.columns[name][slot] = math.nan if value is None else float(value)
+        self.written += 1
+
+    def window(self, start_seq):
+        """Amostras de start_seq até a mais recente (as sobrescritas são perdidas)."""
+        start_seq = max(start_seq, self.written - self.capacity)
+        slots = [seq % self.capacity for seq in range(start_seq, self.written)]
+        timestamps = [self.timestamps[slot] for slot in slots]
+        columns = {name: [self.columns[name][slot] for slot in slots] for name in self.metrics}
+        return start_seq, timestamps, columns
+
+
+def summarize(values):
+    """min/max/avg/p95/last de uma série (NaN = ausente). None se não houver valores."""
+    present = [v for v in values if not math.isnan(v)]
+    if not present:
+        return None
+    ordered = sorted(present)
+    # p95 por nearest-rank
+    p95 = ordered[max(math.ceil(0.95 * len(ordered)) - 1, 0)]
+    return {
+        "min": round(ordered[0], 2),
+        "max": round(ordered[-1], 2),
+        "avg": round(sum(ordered) / len(ordered), 2),
+        "p95": round(p95, 2),
+        "last": round(present[-1], 2),
+    }
+
+
 class GuardianAgent:
     def __init__(self, config_path="config.yaml"):
         self.config = self._load_config(config_path)
         self.node_url = self.config.get("node_url", "http://localhost:8000")
         self.api_key = self.config.get("api_key")
         self.interval = self.config.get("collection_interval", 60)
+        # Amostragem local em alta frequência; upload agregado a cada upload_interval
+        self.sample_interval = float(self.config.get("sample_interval", min(5, self.interval)))
+        self.upload_interval = float(self.config.get("upload_interval", self.interval))
+        self.include_raw_samples = bool(self.config.get("include_raw_samples", False))
+        # Capacidade para ~4 janelas de upload (tolera falhas de envio sem crescer sem limite)
+        capacity = int(self.config.get("ring_capacity", 4 * self.upload_interval / self.sample_interval))
+        self.ring = SampleRing(SAMPLE_METRICS, max(min(capacity, MAX_RING_CAPACITY), 1))
+        self.uploaded_seq = 0
+
+        # Probes de conectividade (executados em paralelo, com um único prazo)
+        self.network_target = self.config.get("network_target")
+        self.network_target_port = int(self.config.get("network_target_port", 443))
+        self.probe_deadline = float(self.config.get("probe_timeout", 2))
+        self.probe_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="guardian-probe")
+
+        # Contadores por delta: a primeira chamada de cpu_percent(None) só inicializa a referência
+        psutil.cpu_percent(interval=None)
+        self.prev_net = (time.monotonic(), psutil.net_io_counters())
         self.agent_id = self.config.get("agent_id") or socket.gethostname()
         self.os_type = platform.system()
         
@@ -48,6 +126,19 @@ class GuardianAgent:
         
         logger.info(f"Guardian Agent iniciado. ID: {self.agent_id} | OS: {self.os_type}")
         logger.info(f"Target NODE: {self.node_url}")
+        logger.info(f"Amostragem a cada {self.sample_interval}s, upload agregado a cada {self.upload_interval}s (ring: {self.ring.capacity} amostras)")
+
+        # Sessão HTTP reutilizada (keep-alive) para todos os uploads
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "X-API-Key": self.api_key,
+            "User-Agent": f"GuardianAgent/1.0 ({self.os_type})"
+        })
+        # Sessão própria dos probes: roda nas threads do probe_pool, em paralelo aos uploads
+        # (requests.Session não é thread-safe), e não precisa da API Key
+        self.probe_session = requests.Session()
+        self.probe_session.headers.update({"User-Agent": self.session.headers["User-Agent"]})
 
     def _load_config(self, path):
         # Procura config no diretório atual ou /etc/guardian-agent (Linux) ou C:\GuardianAgent (Windows)
@@ -69,11 +160,66 @@ class GuardianAgent:
         logger.critical("Arquivo config.yaml não encontrado!")
         sys.exit(1)
 
+    def probe_node_http(self):
+        """Latência HTTP até o NODE (HEAD na sessão keep-alive dos probes). -1 se inacessível."""
+        try:
+            t0 = time.perf_counter()
+            self.probe_session.head(self.node_url, timeout=self.probe_deadline)
+            return round((time.perf_counter() - t0) * 1000, 2)
+        except Exception:
+            return -1 # Unreachable
+
+    def probe_target_tcp(self):
+        """Latência de conexão TCP até network_target (sem ICMP, não exige privilégios)."""
+        try:
+            t0 = time.perf_counter()
+            with socket.create_connection((self.network_target, self.network_target_port), timeout=self.probe_deadline):
+                return round((time.perf_counter() - t0) * 1000, 2)
+        except OSError:
+            return None
+
+    def start_probes(self):
+        """Dispara os probes em paralelo (pool de threads) e devolve os futures."""
+        probes = {"latency_ms": self.probe_pool.submit(self.probe_node_http)}
+        if self.network_target:
+            probes["target_latency_ms"] = self.probe_pool.submit(self.probe_target_tcp)
+        return probes
+
+    def collect_probes(self, probes, started):
+        """Aguarda os probes até um prazo único; o que não terminar conta como ausente."""
+        remaining = self.probe_deadline - (time.monotonic() - started)
+        wait(probes.values(), timeout=max(remaining, 0))
+        results = {name: future.result() if future.done() else None for name, future in probes.items()}
+        if results["latency_ms"] is None:
+            results["latency_ms"] = -1 # Unreachable (prazo esgotado)
+        return results
+
+    def network_rates(self):
+        """Taxa de envio/recepção (Mbps) desde a amostra anterior."""
+        now = time.monotonic()
+        net = psutil.net_io_counters()
+        prev_time, prev_net = self.prev_net
+        self.prev_net = (now, net)
+        elapsed = now - prev_time
+        sent = net.bytes_sent - prev_net.bytes_sent
+        recv = net.bytes_recv - prev_net.bytes_recv
+        # Contador reiniciado/estourado (ou intervalo nulo): sem taxa nesta amostra
+        if elapsed <= 0 or sent < 0 or recv < 0:
+            return None, None
+        return round(sent * 8 / elapsed / 1e6, 3), round(recv * 8 / elapsed / 1e6, 3)
+
     def collect_metrics(self):
-        """Coleta métricas de sistema (CPU, RAM, Disco, Rede)."""
+        """
+        Coleta métricas de sistema (CPU, RAM, Disco, Rede) sem bloquear:
+        CPU e rede por delta em relação à amostra anterior, probes em paralelo.
+        """
         try:
-            # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Probes disparados primeiro; rodam enquanto os contadores locais são lidos
+            probes_started = time.monotonic()
+            probes = self.start_probes()
+
+            # CPU (delta desde a chamada anterior, sem dormir)
+            cpu_percent = psutil.cpu_percent(interval=None)
             
             # Memória
             mem = psutil.virtual_memory()
@@ -82,17 +228,11 @@ class GuardianAgent:
             disk_path = 'C:\\' if self.os_type == 'Windows' else '/'
             disk = psutil.disk_usage(disk_path)
             
-            # Rede (Bytes I/O)
-            net = psutil.net_io_counters()
+            # Rede (taxa por delta dos contadores)
+            net_sent_mbps, net_recv_mbps = self.network_rates()
             
-            # Latência (Simulada via Ping HTTP simples no próprio Node)
-            latency_ms = 0
-            try:
-                t0 = time.time()
-                requests.head(self.node_url, timeout=2)
-                latency_ms = round((time.time() - t0) * 1000, 2)
-            except:
-                latency_ms = -1 # Unreachable
+            # Latência (NODE via HTTP e alvo externo via TCP), com prazo único
+            probe_results = self.collect_probes(probes, probes_started)
 
             payload = {
                 "agent_id": self.agent_id,
@@ -104,9 +244,10 @@ class GuardianAgent:
                     "ram_free_gb": round(mem.available / (1024**3), 2),
                     "disk_usage": disk.percent,
                     "disk_free_gb": round(disk.free / (1024**3), 2),
-                    "net_sent_mb": round(net.bytes_sent / (1024**2), 2),
-                    "net_recv_mb": round(net.bytes_recv / (1024**2), 2),
-                    "latency_ms": latency_ms
+                    "net_sent_mbps": net_sent_mbps,
+                    "net_recv_mbps": net_recv_mbps,
+                    "latency_ms": probe_results["latency_ms"],
+                    "target_latency_ms": probe_results.get("target_latency_ms")
                 },
                 "host_info": self.host_info
             }
@@ -116,21 +257,64 @@ class GuardianAgent:
             logger.error(f"Erro na coleta de métricas: {e}")
             return None
 
+    def record_sample(self):
+        """Coleta uma amostra e grava no ring local."""
+        sample = self.collect_metrics()
+        if not sample:
+            return
+        values = dict(sample["metrics"])
+        # Latência -1 (NODE inacessível) é tratada como amostra ausente nas estatísticas
+        if values.get("latency_ms") is not None and values["latency_ms"] < 0:
+            values["latency_ms"] = None
+        self.ring.append(sample["timestamp"], values)
+
+    def build_upload(self):
+        """
+        Payload agregado da janela desde o último upload bem-sucedido:
+        resumo (min/max/avg/p95/last) por métrica e, opcionalmente, as amostras brutas.
+        "metrics" (médias da janela) mantém compatibilidade com o formato anterior.
+        """
+        start_seq, timestamps, columns = self.ring.window(self.uploaded_seq)
+        if not timestamps:
+            return None, start_seq
+        stats = {name: summarize(values) for name, values in columns.items()}
+
+        metrics = {name: (s["avg"] if s else None) for name, s in stats.items()}
+        if metrics.get("latency_ms") is None:
+            metrics["latency_ms"] = -1 # Unreachable durante toda a janela
+
+        payload = {
+            "agent_id": self.agent_id,
+            "timestamp": timestamps[-1],
+            "timestamp_iso": datetime.fromtimestamp(timestamps[-1]).isoformat(),
+            "metrics": metrics,
+            "summary": {
+                "window_start": timestamps[0],
+                "window_end": timestamps[-1],
+                "samples": len(timestamps),
+                "sample_interval": self.sample_interval,
+                "metrics": {name: s for name, s in stats.items() if s is not None},
+            },
+            "host_info": self.host_info
+        }
+        if self.include_raw_samples:
+            # Formato colunar (compacto): listas paralelas, null para ausentes
+            payload["samples"] = {"timestamp": timestamps}
+            for name, values in columns.items():
+                payload["samples"][name] = [None if math.isnan(v) else round(v, 2) for v in values]
+        return payload, start_seq + len(timestamps)
+
     def send_data(self, payload):
-        """Envia dados para o Guardian NODE."""
-        if not payload: return
+        """Envia dados para o Guardian NODE. Retorna True se aceito."""
+        if not payload: return False
 
         url = f"{self.node_url}/ingest/agent"
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": self.api_key,
-            "User-Agent": f"GuardianAgent/1.0 ({self.os_type})"
-        }
         
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=5)
+            response = self.session.post(url, json=payload, timeout=(3, 10))
             if response.status_code == 200:
-                logger.info(f"Payload enviado com sucesso. Size: {len(str(payload))} bytes.")
+                logger.info(f"Payload enviado com sucesso ({payload['summary']['samples']} amostras). Size: {len(response.request.body or b'')} bytes.")
+                return True
             elif response.status_code == 401:
                 logger.error("Falha de Autenticação (401). Verifique a API Key.")
             else:
@@ -139,18 +323,33 @@ class GuardianAgent:
             logger.warning("Falha de conexão com o Guardian NODE.")
         except Exception as e:
             logger.error(f"Erro ao enviar dados: {e}")
+        return False
+
+    def upload(self):
+        """Envia a janela agregada; em caso de falha, a próxima janela inclui estas amostras."""
+        payload, next_seq = self.build_upload()
+        if payload and self.send_data(payload):
+            self.uploaded_seq = next_seq
 
     def run(self):
-        """Loop principal de execução."""
+        """Loop principal: amostragem a cada sample_interval, upload a cada upload_interval."""
         logger.info("Iniciando loop de coleta...")
+        next_sample = time.monotonic()
+        next_upload = next_sample + self.upload_interval
         while True:
             try:
-                payload = self.collect_metrics()
-                self.send_data(payload)
+                self.record_sample()
+                if time.monotonic() >= next_upload:
+                    self.upload()
+                    next_upload += self.upload_interval
+                    # Upload atrasado (ex.: NODE lento): não acumula envios em sequência
+                    next_upload = max(next_upload, time.monotonic())
             except Exception as e:
                 logger.error(f"Erro inesperado no loop principal: {e}")
             
-            time.sleep(self.interval)
+            next_sample += self.sample_interval
+            time.sleep(max(next_sample - time.monotonic(), 0))
+            next_sample = max(next_sample, time.monotonic() - self.sample_interval)
 
 if __name__ == "__main__":
     agent = GuardianAgent()
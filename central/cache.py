@@ -0,0 +1,225 @@
+# ==============================================================================
+# NOC - Guardian Central: Caches de Autenticação
+# ==============================================================================
+# Cache LRU com TTL por entrada e cache negativo (chaves inválidas), usado para
+# evitar uma ida ao banco (e uma escrita) a cada requisição autenticada.
+# ==============================================================================
+
+import os
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Janela máxima para uma revogação de API Key ter efeito
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_NEGATIVE_TTL = float(os.getenv("API_KEY_NEGATIVE_TTL", "60"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+# Intervalo de gravação em lote de last_used_at
+API_KEY_TOUCH_INTERVAL = float(os.getenv("API_KEY_TOUCH_INTERVAL", "30"))
+
+# Cache de Tenants: TTL por entrada, cache negativo e refresh em lote em background
+TENANT_CACHE_TTL = float(os.getenv("TENANT_CACHE_TTL", "60"))
+TENANT_NEGATIVE_TTL = float(os.getenv("TENANT_NEGATIVE_TTL", "30"))
+TENANT_REFRESH_INTERVAL = float(os.getenv("TENANT_REFRESH_INTERVAL", "30"))
+TENANT_CACHE_SIZE = int(os.getenv("TENANT_CACHE_SIZE", "10000"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache LRU com expiração por entrada.
+    Valores None são tratados como resultado negativo e usam negative_ttl.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "negative_hits": 0, "evictions": 0}
+
+    def get(self, key: Hashable, default=_MISSING):
+        """Retorna o valor em cache ou `default` se ausente/expirado."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.stats["misses"] += 1
+            return default
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        if entry[1] is None:
+            self.stats["negative_hits"] += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def keys(self) -> List[Hashable]:
+        return list(self._data.keys())
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ApiKeyCache:
+    """
+    Resolução API Key -> tenant_id com cache positivo/negativo.
+    O uso das chaves (last_used_at) é acumulado em memória e gravado em lote
+    periodicamente, em vez de um UPDATE por requisição.
+    """
+
+    def __init__(self, lookup: Callable[[str], Awaitable[Optional[str]]],
+                 touch: Callable[[Dict[str, datetime]], Awaitable[None]],
+                 ttl: float = API_KEY_CACHE_TTL, negative_ttl: float = API_KEY_NEGATIVE_TTL,
+                 maxsize: int = API_KEY_CACHE_SIZE, touch_interval: float = API_KEY_TOUCH_INTERVAL):
+        self.lookup = lookup
+        self.touch = touch
+        self.touch_interval = touch_interval
+        self.cache = TTLCache(maxsize, ttl, negative_ttl)
+        self._pending_usage: Dict[str, datetime] = {}
+
+    @staticmethod
+    def hash_key(raw_key: str) -> str:
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    async def resolve(self, raw_key: str) -> Optional[str]:
+        """
+        Retorna o tenant_id da chave (None se inválida ou revogada).
+        Falhas de banco propagam a exceção e não são cacheadas.
+        """
+        key_hash = self.hash_key(raw_key)
+        tenant_id = self.cache.get(key_hash)
+        if tenant_id is _MISSING:
+            tenant_id = await self.lookup(key_hash)
+            self.cache.set(key_hash, tenant_id)
+        if tenant_id is not None:
+            self._pending_usage[key_hash] = datetime.now(timezone.utc)
+        return tenant_id
+
+    def invalidate(self, raw_key: Optional[str] = None):
+        """Remove uma chave (ou todas) do cache, p.ex. após revogação."""
+        if raw_key is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(self.hash_key(raw_key))
+
+    async def flush_usage(self):
+        """Grava em lote o last_used_at acumulado desde o último flush."""
+        if not self._pending_usage:
+            return
+        usage, self._pending_usage = self._pending_usage, {}
+        try:
+            await self.touch(usage)
+        except Exception as e:
+            # Reinsere para a próxima rodada sem sobrescrever usos mais recentes
+            for key_hash, used_at in usage.items():
+                self._pending_usage.setdefault(key_hash, used_at)
+            print(f"[AUTH CACHE ERROR] Falha ao gravar last_used_at: {e}")
+
+    async def run_usage_flusher(self):
+        """Loop em background que grava last_used_at a cada touch_interval."""
+        while True:
+            try:
+                await asyncio.sleep(self.touch_interval)
+                await self.flush_usage()
+            except asyncio.CancelledError:
+                break
+
+
+class TenantCache:
+    """
+    Cache tenant_id -> status com TTL por entrada e cache negativo (tenant inexistente).
+    Um refresher em background recarrega todos os tenants com um único SELECT,
+    e misses concorrentes da mesma chave compartilham uma única consulta.
+    """
+
+    def __init__(self, fetch_one: Callable[[str], Awaitable[Optional[str]]],
+                 fetch_all: Callable[[], Awaitable[Dict[str, str]]],
+                 ttl: float = TENANT_CACHE_TTL, negative_ttl: float = TENANT_NEGATIVE_TTL,
+                 refresh_interval: float = TENANT_REFRESH_INTERVAL, maxsize: int = TENANT_CACHE_SIZE,
+                 fallback: Optional[Dict[str, str]] = None):
+        self.fetch_one = fetch_one
+        self.fetch_all = fetch_all
+        self.refresh_interval = refresh_interval
+        self.cache = TTLCache(maxsize, ttl, negative_ttl)
+        # Tenants assumidos quando o banco não os conhece (ex.: DB desativado)
+        self.fallback = fallback or {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_status(self, tenant_id: str) -> Optional[str]:
+        """Status do tenant (None se inexistente). Falhas de banco propagam e não são cacheadas."""
+        status = self.cache.get(tenant_id)
+        if status is not _MISSING:
+            return status
+
+        inflight = self._inflight.get(tenant_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[tenant_id] = future
+        try:
+            status = await self.fetch_one(tenant_id)
+            if status is None:
+                status = self.fallback.get(tenant_id)
+            self.cache.set(tenant_id, status)
+            future.set_result(status)
+            return status
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita "Future exception was never retrieved" quando não há concorrentes
+            future.exception()
+            raise
+        finally:
+            del self._inflight[tenant_id]
+
+    def invalidate(self, tenant_id: Optional[str] = None):
+        if tenant_id is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(tenant_id)
+
+    async def refresh_all(self):
+        """Recarrega todos os tenants (um SELECT) e marca como inexistentes os que sumiram."""
+        statuses = dict(self.fallback)
+        statuses.update(await self.fetch_all())
+        for tenant_id in self.cache.keys():
+            if tenant_id not in statuses:
+                self.cache.set(tenant_id, None)
+        for tenant_id, status in statuses.items():
+            self.cache.set(tenant_id, status)
+
+    async def run_refresher(self):
+        """Loop em background que recarrega o cache a cada refresh_interval."""
+        while True:
+            try:
+                await self.refresh_all()
+                await asyncio.sleep(self.refresh_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"[TENANT CACHE ERROR] Falha ao recarregar tenants: {e}")
+                await asyncio.sleep(self.refresh_interval)
@@ -1,11 +1,13 @@
 import os
+import re
 import asyncio
 import json
 import time
 import secrets
 import hashlib
-from datetime import datetime
-from typing import Optional, Dict, Tuple
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Tuple
 
 # Tenta importar asyncpg, mas não falha o módulo se não existir (para permitir validação de código)
 try:
@@ -13,6 +15,447 @@ try:
 except ImportError:
     asyncpg = None
 
+# ==============================================================================
+# Telemetry Writer (Ingestão em Lote)
+# ==============================================================================
+# Parâmetros do escritor em background. A fila absorve rajadas de ingestão e o
+# flusher grava em lote (COPY) por tamanho ou por tempo, o que ocorrer primeiro.
+TELEMETRY_QUEUE_MAX = int(os.getenv("TELEMETRY_QUEUE_MAX", "10000"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "500"))
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "1.0"))
+# Tempo máximo que uma requisição espera por espaço na fila antes de ser rejeitada
+TELEMETRY_ENQUEUE_TIMEOUT = float(os.getenv("TELEMETRY_ENQUEUE_TIMEOUT", "2.0"))
+
+# Cópia integral do payload em JSONB (opcional). As métricas tipadas são sempre gravadas.
+TELEMETRY_STORE_PAYLOAD = os.getenv("TELEMETRY_STORE_PAYLOAD", "true").lower() in ("1", "true", "yes")
+
+# Métricas tipadas (colunas DOUBLE PRECISION) extraídas do payload de collect_metrics().
+# Formato: (coluna, seção do payload, campo)
+TELEMETRY_METRIC_FIELDS = [
+    ("cpu_usage", "system_health", "cpu_usage"),
+    ("memory_usage", "system_health", "memory_usage"),
+    ("disk_usage", "system_health", "disk_usage"),
+    ("disk_free_gb", "system_health", "disk_free_gb"),
+    ("latency_ms", "network", "latency_ms"),
+    ("packet_loss", "network", "packet_loss"),
+    ("bandwidth_mbps", "network", "bandwidth_usage_mbps"),
+]
+TELEMETRY_METRIC_COLUMNS = [column for column, _, _ in TELEMETRY_METRIC_FIELDS]
+
+# Métricas dos Guardian Agents (dict "metrics", plano) mapeadas para as mesmas colunas.
+# Formato: coluna -> campos do Agent somados (ex.: banda = envio + recepção)
+AGENT_METRIC_FIELDS = {
+    "cpu_usage": ("cpu_usage",),
+    "memory_usage": ("ram_usage",),
+    "disk_usage": ("disk_usage",),
+    "disk_free_gb": ("disk_free_gb",),
+    "latency_ms": ("latency_ms",),
+    "bandwidth_mbps": ("net_sent_mbps", "net_recv_mbps"),
+}
+
+TELEMETRY_COLUMNS = ["timestamp", "node_id", "payload", "tenant_id"] + TELEMETRY_METRIC_COLUMNS
+
+# Último estado conhecido por node (node_latest), mantido via upsert a cada lote gravado.
+# Evita o DISTINCT ON sobre toda a hypertable nas leituras do Dashboard.
+NODE_LATEST_UPSERT_SQL = """
+    INSERT INTO node_latest (tenant_id, node_id, timestamp, {columns})
+    VALUES ($1, $2, $3, {placeholders})
+    ON CONFLICT (tenant_id, node_id) DO UPDATE SET
+        timestamp = EXCLUDED.timestamp, {updates}
+    WHERE node_latest.timestamp <= EXCLUDED.timestamp
+""".format(
+    columns=", ".join(TELEMETRY_METRIC_COLUMNS),
+    placeholders=", ".join(f"${i + 4}" for i in range(len(TELEMETRY_METRIC_COLUMNS))),
+    updates=", ".join(f"{c} = EXCLUDED.{c}" for c in TELEMETRY_METRIC_COLUMNS)
+)
+
+# Sentinela de encerramento do flusher
+_STOP_SIGNAL = object()
+
+# Identificadores gravados em colunas TEXT (node_id, tenant_id)
+TELEMETRY_ID_MAX_LENGTH = 128
+# "\u0000" no JSON serializado (não precedido de barra escapada): NUL não é aceito em JSONB
+_JSON_NUL_ESCAPE = re.compile(r"(?<!\\)(?:\\\\)*\\u0000")
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class InvalidTelemetryRecord(ValueError):
+    """Linha de telemetria incompatível com o COPY (tipo ou conteúdo); rejeitada antes de entrar na fila."""
+
+
+def validate_telemetry_record(record: Tuple) -> Tuple:
+    """
+    Valida os campos livres de uma linha antes do enfileiramento: uma linha inválida
+    dentro do COPY compartilhado derrubaria o lote de todos os nodes/tenants.
+    """
+    _, node_id, payload, tenant_id = record[:4]
+    for name, value in (("node_id", node_id), ("tenant_id", tenant_id)):
+        if not isinstance(value, str) or not value:
+            raise InvalidTelemetryRecord(f"{name} deve ser texto não vazio")
+        if len(value) > TELEMETRY_ID_MAX_LENGTH or "\x00" in value:
+            raise InvalidTelemetryRecord(f"{name} inválido (máx. {TELEMETRY_ID_MAX_LENGTH} caracteres, sem NUL)")
+    if payload is not None and _JSON_NUL_ESCAPE.search(payload):
+        raise InvalidTelemetryRecord("payload contém caractere NUL (não suportado em JSONB)")
+    return record
+
+
+def is_row_error(error: Exception) -> bool:
+    """Erro causado pelo conteúdo de uma linha (e não pela conexão/banco)."""
+    if isinstance(error, (ValueError, TypeError)):
+        # Inclui asyncpg.DataError (entrada inválida detectada no cliente)
+        return True
+    sqlstate = getattr(error, "sqlstate", None) or ""
+    # 22xxx: data exception (encoding, NUL, tipo); 23xxx: violação de integridade
+    return sqlstate.startswith(("22", "23"))
+
+
+def extract_telemetry_metrics(telemetry_data: Dict) -> Tuple:
+    """
+    Extrai as métricas tipadas do payload (uma única vez, na ingestão).
+    Retorna uma tupla na ordem de TELEMETRY_METRIC_COLUMNS (None se ausente).
+    """
+    values = []
+    for _, section, field in TELEMETRY_METRIC_FIELDS:
+        group = telemetry_data.get(section)
+        values.append(_to_float(group.get(field)) if isinstance(group, dict) else None)
+    return tuple(values)
+
+
+def extract_agent_metrics(agent_data: Dict) -> Tuple:
+    """
+    Extrai as métricas tipadas do payload de um Agent, na ordem de TELEMETRY_METRIC_COLUMNS.
+    Latência negativa (NODE inacessível) é gravada como ausente.
+    """
+    metrics = agent_data.get("metrics")
+    if not isinstance(metrics, dict):
+        metrics = {}
+    values = []
+    for column in TELEMETRY_METRIC_COLUMNS:
+        parts = [_to_float(metrics.get(field)) for field in AGENT_METRIC_FIELDS.get(column, ())]
+        value = sum(parts) if parts and None not in parts else None
+        if column == "latency_ms" and value is not None and value < 0:
+            value = None
+        values.append(value)
+    return tuple(values)
+
+
+# ==============================================================================
+# Rollups de Telemetria (Continuous Aggregates - TimescaleDB)
+# ==============================================================================
+# Formato: (view, bucket, start_offset, end_offset, schedule_interval) da política de refresh.
+TELEMETRY_ROLLUPS = [
+    ("telemetry_1m", timedelta(minutes=1), "2 hours", "1 minute", "1 minute"),
+    ("telemetry_1h", timedelta(hours=1), "3 days", "1 hour", "30 minutes"),
+    ("telemetry_1d", timedelta(days=1), "30 days", "1 day", "6 hours"),
+]
+
+# IDR = 100 - MAX(CPU, RAM, DISK) (ver docs/KPI_DEFINITION.md)
+IDR_SQL_EXPR = "100 - GREATEST(cpu_usage, memory_usage, disk_usage)"
+
+# Agregações sobre a tabela bruta (usadas na definição dos rollups e nas consultas em resolução < 1 min)
+TELEMETRY_ROLLUP_SELECT = f"""
+    count(*) AS samples,
+    avg(cpu_usage) AS cpu_avg, max(cpu_usage) AS cpu_max,
+    avg(memory_usage) AS memory_avg, max(memory_usage) AS memory_max,
+    avg(disk_usage) AS disk_avg, max(disk_usage) AS disk_max,
+    avg({IDR_SQL_EXPR}) AS idr_avg, min({IDR_SQL_EXPR}) AS idr_min
+"""
+
+# Re-agregação de um rollup em buckets maiores (médias ponderadas pelo nº de amostras)
+TELEMETRY_REAGGREGATE_SELECT = """
+    sum(samples) AS samples,
+    sum(cpu_avg * samples) / NULLIF(sum(samples), 0) AS cpu_avg, max(cpu_max) AS cpu_max,
+    sum(memory_avg * samples) / NULLIF(sum(samples), 0) AS memory_avg, max(memory_max) AS memory_max,
+    sum(disk_avg * samples) / NULLIF(sum(samples), 0) AS disk_avg, max(disk_max) AS disk_max,
+    sum(idr_avg * samples) / NULLIF(sum(samples), 0) AS idr_avg, min(idr_min) AS idr_min
+"""
+
+
+# ==============================================================================
+# Retenção e Compressão (Chunks - TimescaleDB)
+# ==============================================================================
+# Retenção por drop de chunks inteiros (sem DELETE linha a linha, sem bloat, WAL mínimo).
+# A retenção de telemetria deve ser maior que o maior start_offset dos rollups (30 dias),
+# caso contrário o refresh apagaria agregados de períodos já removidos da tabela bruta.
+EVENTS_RETENTION_DAYS = int(os.getenv("EVENTS_RETENTION_DAYS", "90"))
+TELEMETRY_RETENTION_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", "90"))
+# Chunks mais antigos que N dias são comprimidos (segmentby tenant_id, node_id)
+COMPRESS_AFTER_DAYS = int(os.getenv("COMPRESS_AFTER_DAYS", "7"))
+
+# Formato: (hypertable, coluna de tempo, retenção em dias)
+HYPERTABLE_POLICIES = [
+    ("events", "time", EVENTS_RETENTION_DAYS),
+    ("telemetry", "timestamp", TELEMETRY_RETENTION_DAYS),
+]
+
+# Colunas de ordenação da compressão (devem cobrir a chave primária, quando houver)
+HYPERTABLE_COMPRESS_ORDERBY = {
+    "events": "time DESC",
+    "telemetry": "timestamp DESC, id",
+}
+
+
+def select_telemetry_source(resolution: timedelta) -> str:
+    """
+    Escolhe o rollup mais grosso cujo bucket ainda atende à resolução pedida.
+    Abaixo de 1 minuto a consulta vai para a tabela bruta.
+    """
+    source = "telemetry"
+    for view, bucket, _, _, _ in TELEMETRY_ROLLUPS:
+        if bucket <= resolution:
+            source = view
+    return source
+
+
+def align_resolution(resolution: timedelta) -> timedelta:
+    """
+    Arredonda a resolução para cima até um múltiplo do bucket do rollup escolhido:
+    cada ponto re-agrega o mesmo número de buckets e fica alinhado a eles.
+    """
+    source = select_telemetry_source(resolution)
+    for view, bucket, _, _, _ in TELEMETRY_ROLLUPS:
+        if view == source:
+            return -(-resolution // bucket) * bucket
+    return resolution
+
+
+class TelemetryQueueFull(Exception):
+    """Fila de telemetria cheia (Backpressure). A requisição deve ser reenviada."""
+
+
+class _BatchCompletion:
+    """
+    Conclusão de um lote enfileirado por enqueue_batch (as linhas podem cair em flushes diferentes).
+    O future resolve com o erro de cada linha, na ordem do lote (None = gravada).
+    """
+
+    __slots__ = ("future", "remaining", "errors")
+
+    def __init__(self, count: int):
+        self.future = asyncio.get_running_loop().create_future()
+        self.remaining = count
+        self.errors: List[Optional[Exception]] = [None] * count
+
+    def done(self, position: int, error: Optional[Exception]):
+        self.remaining -= 1
+        self.errors[position] = error
+        if self.remaining == 0 and not self.future.done():
+            self.future.set_result(self.errors)
+
+
+class TelemetryWriter:
+    """
+    Escritor de telemetria em background.
+    As requisições apenas enfileiram linhas; um único flusher drena a fila e
+    persiste cada lote com uma única operação COPY (copy_records_to_table).
+    Itens da fila: (linha, conclusão, posição no lote) - conclusão é None para enqueue() simples.
+    Capacidade: max_queue linhas, reservadas em ordem de chegada (FIFO) antes do enfileiramento;
+    um lote à espera de espaço não é ultrapassado por linhas avulsas que chegaram depois.
+    """
+
+    def __init__(self, manager, batch_size: int = TELEMETRY_BATCH_SIZE,
+                 flush_interval: float = TELEMETRY_FLUSH_INTERVAL,
+                 max_queue: int = TELEMETRY_QUEUE_MAX,
+                 enqueue_timeout: float = TELEMETRY_ENQUEUE_TIMEOUT):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        # Linhas com espaço reservado (na fila ou prestes a entrar)
+        self._reserved = 0
+        # Formato: (linhas, future) de quem aguarda espaço, em ordem de chegada
+        self._space_waiters: deque = deque()
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "rejected": 0,
+            "failed": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        """Inicia o flusher (idempotente)."""
+        if self.running:
+            return
+        # A capacidade é controlada por _reserve/_release (em linhas), não pela Queue
+        self.queue = asyncio.Queue()
+        self._reserved = 0
+        self._space_waiters.clear()
+        self.task = asyncio.create_task(self._run())
+        print(f"[DATABASE] Telemetry Writer iniciado (batch={self.batch_size}, intervalo={self.flush_interval}s, fila={self.max_queue})")
+
+    async def _reserve(self, count: int):
+        """
+        Reserva espaço para count linhas, na ordem de chegada.
+        Levanta TelemetryQueueFull se o espaço não for liberado em enqueue_timeout.
+        """
+        if not self._space_waiters and self._reserved + count <= self.max_queue:
+            self._reserved += count
+            return
+        entry = (count, asyncio.get_running_loop().create_future())
+        self._space_waiters.append(entry)
+        try:
+            await asyncio.wait_for(entry[1], timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            if entry[1].done() and not entry[1].cancelled():
+                # Espaço concedido no mesmo instante do timeout
+                return
+            if entry in self._space_waiters:
+                self._space_waiters.remove(entry)
+            # Quem estava atrás deste pedido pode caber no espaço livre
+            self._grant_waiting()
+            self.stats["rejected"] += count
+            raise TelemetryQueueFull("Telemetry queue full")
+
+    def _release(self, count: int):
+        """Libera o espaço de count linhas retiradas da fila pelo flusher."""
+        self._reserved -= count
+        self._grant_waiting()
+
+    def _grant_waiting(self):
+        while self._space_waiters:
+            count, waiter = self._space_waiters[0]
+            if waiter.done():
+                # Requisição cancelada (ex.: cliente desconectou) enquanto aguardava
+                self._space_waiters.popleft()
+                continue
+            if self._reserved + count > self.max_queue:
+                break
+            self._space_waiters.popleft()
+            self._reserved += count
+            waiter.set_result(None)
+
+    async def enqueue(self, record: Tuple):
+        """
+        Enfileira uma linha de telemetria.
+        Backpressure: aguarda até enqueue_timeout por espaço; se a fila continuar
+        cheia, levanta TelemetryQueueFull para que o chamador rejeite a requisição.
+        """
+        await self._reserve(1)
+        self.queue.put_nowait((record, None, 0))
+        self.stats["enqueued"] += 1
+
+    async def enqueue_batch(self, records: list) -> asyncio.Future:
+        """
+        Enfileira um lote inteiro (tudo ou nada) e devolve um future concluído quando
+        todas as linhas forem processadas, com o erro de cada linha (None = gravada).
+        Mesma backpressure de enqueue(): TelemetryQueueFull se não houver espaço a tempo.
+        """
+        if len(records) > self.max_queue:
+            self.stats["rejected"] += len(records)
+            raise TelemetryQueueFull("Telemetry batch larger than queue")
+        # Espaço do lote inteiro reservado de uma vez: o lote entra inteiro na fila
+        await self._reserve(len(records))
+        completion = _BatchCompletion(len(records))
+        for position, record in enumerate(records):
+            self.queue.put_nowait((record, completion, position))
+        self.stats["enqueued"] += len(records)
+        return completion.future
+
+    async def _collect_batch(self) -> Tuple[list, bool]:
+        """
+        Aguarda o primeiro item e acumula até batch_size ou até o fim da janela de tempo.
+        Retorna (lote, parar) - parar=True quando o sinal de encerramento foi consumido.
+        """
+        first = await self.queue.get()
+        if first is _STOP_SIGNAL:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP_SIGNAL:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                # Espaço liberado ao sair da fila (e não ao fim da gravação), como numa Queue limitada
+                self._release(len(batch))
+                await self._write(batch)
+
+        # Encerramento: drena o que chegou depois do sinal
+        pending = []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        self._release(len(pending))
+        for i in range(0, len(pending), self.batch_size):
+            await self._write(pending[i:i + self.batch_size])
+
+    async def _write(self, batch: list):
+        started = time.monotonic()
+        # Índice no lote -> erro das linhas não gravadas
+        rejected: Dict[int, Exception] = {}
+        await self._copy_isolating(batch, 0, rejected)
+
+        self.stats["written"] += len(batch) - len(rejected)
+        self.stats["failed"] += len(rejected)
+        self.stats["batches"] += 1
+        self.stats["last_batch_size"] = len(batch)
+        self.stats["last_flush_ms"] = round((time.monotonic() - started) * 1000, 2)
+        if rejected:
+            error = next(iter(rejected.values()))
+            print(f"[DATABASE ERROR] Falha ao persistir Telemetria ({len(rejected)} de {len(batch)} linhas): {error}")
+        for index, (_, completion, position) in enumerate(batch):
+            if completion is not None:
+                completion.done(position, rejected.get(index))
+
+    async def _copy_isolating(self, batch: list, offset: int, rejected: Dict[int, Exception]):
+        """
+        COPY de um trecho do lote. Se falhar por causa de uma linha (is_row_error), divide
+        o trecho ao meio até isolar as linhas ruins, e só elas são descartadas. Falhas de
+        conexão/banco descartam o trecho sem novas tentativas contra um banco indisponível.
+        """
+        try:
+            await self.manager.copy_telemetry([item[0] for item in batch])
+        except Exception as e:
+            if len(batch) == 1 or not is_row_error(e):
+                for index in range(offset, offset + len(batch)):
+                    rejected[index] = e
+                return
+            middle = len(batch) // 2
+            await self._copy_isolating(batch[:middle], offset, rejected)
+            await self._copy_isolating(batch[middle:], offset + middle, rejected)
+
+    async def stop(self):
+        """Interrompe o flusher após gravar tudo o que ainda estiver na fila (Flush-on-Shutdown)."""
+        if not self.running:
+            return
+        pending = self.queue.qsize()
+        await self.queue.put(_STOP_SIGNAL)
+        await self.task
+        self.task = None
+        print(f"[DATABASE] Telemetry Writer encerrado ({pending} linhas pendentes gravadas).")
+
+
 class DatabaseManager:
     def __init__(self):
         self.pool = None
@@ -23,6 +466,7 @@ class DatabaseManager:
         self.db_name = os.getenv("POSTGRES_DB", "noc_guardian")
         self.host = os.getenv("POSTGRES_HOST", "localhost")
         self.port = os.getenv("POSTGRES_PORT", "5432")
+        self.telemetry_writer = TelemetryWriter(self)
 
     async def connect(self):
         """
@@ -40,12 +484,17 @@ class DatabaseManager:
             
             # Inicializa Schema
             await self.init_schema()
+
+            # Inicia escritor de telemetria em lote
+            self.telemetry_writer.start()
             
         except Exception as e:
             print(f"[DATABASE ERROR] Falha na conexão: {e}")
             self.enabled = False
 
     async def close(self):
+        # Flush da fila de telemetria antes de fechar o pool
+        await self.telemetry_writer.stop()
         if self.pool:
             await self.pool.close()
             print("[DATABASE] Conexão encerrada.")
@@ -160,11 +609,61 @@ class DatabaseManager:
                         id BIGSERIAL,
                         timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                         node_id TEXT,
-                        payload JSONB NOT NULL,
+                        payload JSONB,
                         tenant_id TEXT DEFAULT 'default',
+                        cpu_usage DOUBLE PRECISION,
+                        memory_usage DOUBLE PRECISION,
+                        disk_usage DOUBLE PRECISION,
+                        disk_free_gb DOUBLE PRECISION,
+                        latency_ms DOUBLE PRECISION,
+                        packet_loss DOUBLE PRECISION,
+                        bandwidth_mbps DOUBLE PRECISION,
                         PRIMARY KEY (timestamp, id)
                     );
                 """)
+                # Migração Aditiva: colunas tipadas e payload JSONB opcional
+                try:
+                    for column in TELEMETRY_METRIC_COLUMNS:
+                        await conn.execute(f"ALTER TABLE telemetry ADD COLUMN IF NOT EXISTS {column} DOUBLE PRECISION;")
+                    # Só quando necessário: em hypertable comprimida o ALTER falharia a cada boot
+                    payload_nullable = await conn.fetchval("""
+                        SELECT is_nullable FROM information_schema.columns
+                        WHERE table_schema = current_schema() AND table_name = 'telemetry' AND column_name = 'payload'
+                    """)
+                    if payload_nullable == "NO":
+                        await conn.execute("ALTER TABLE telemetry ALTER COLUMN payload DROP NOT NULL;")
+                except Exception as e:
+                    print(f"[DATABASE WARNING] Falha ao migrar colunas de 'telemetry': {e}")
+
+                # 5.2 Tabela NODE_LATEST (Último estado por node - O(nodes) nas leituras)
+                metric_columns_ddl = ",\n".join(f"{c} DOUBLE PRECISION" for c in TELEMETRY_METRIC_COLUMNS)
+                await conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS node_latest (
+                        tenant_id TEXT NOT NULL,
+                        node_id TEXT NOT NULL,
+                        timestamp TIMESTAMPTZ NOT NULL,
+                        {metric_columns_ddl},
+                        PRIMARY KEY (tenant_id, node_id)
+                    );
+                """)
+                # Backfill único a partir do histórico (somente se a tabela estiver vazia)
+                has_latest = await conn.fetchval("SELECT EXISTS (SELECT 1 FROM node_latest);")
+                if not has_latest:
+                    metric_columns = ", ".join(TELEMETRY_METRIC_COLUMNS)
+                    metric_values = ", ".join(
+                        f"COALESCE({c}, (payload->'{section}'->>'{field}')::float8)"
+                        for c, section, field in TELEMETRY_METRIC_FIELDS
+                    )
+                    await conn.execute(f"""
+                        INSERT INTO node_latest (tenant_id, node_id, timestamp, {metric_columns})
+                        SELECT DISTINCT ON (COALESCE(tenant_id, 'default'), node_id)
+                            COALESCE(tenant_id, 'default'), node_id, timestamp, {metric_values}
+                        FROM telemetry
+                        WHERE node_id IS NOT NULL
+                        ORDER BY COALESCE(tenant_id, 'default'), node_id, timestamp DESC
+                        ON CONFLICT (tenant_id, node_id) DO NOTHING;
+                    """)
+                    print("[DATABASE] Tabela 'node_latest' populada a partir do histórico de telemetria.")
 
                 # 6. Converter EVENTS e TELEMETRY em Hypertable (TimescaleDB)
                 # Verifica se já é hypertable para evitar erro
@@ -201,6 +700,56 @@ class DatabaseManager:
                 except Exception as e:
                     print(f"[DATABASE WARNING] Falha ao criar índices: {e}")
 
+                # 8. Compressão Nativa e Retenção por Chunks
+                for table, _, retention_days in HYPERTABLE_POLICIES:
+                    try:
+                        compression_enabled = await conn.fetchval("""
+                            SELECT compression_enabled FROM timescaledb_information.hypertables
+                            WHERE hypertable_name = $1;
+                        """, table)
+                        if compression_enabled is False:
+                            await conn.execute(f"""
+                                ALTER TABLE {table} SET (
+                                    timescaledb.compress,
+                                    timescaledb.compress_segmentby = 'tenant_id, node_id',
+                                    timescaledb.compress_orderby = '{HYPERTABLE_COMPRESS_ORDERBY[table]}'
+                                );
+                            """)
+                            print(f"[DATABASE] Compressão nativa habilitada em '{table}'.")
+                        await conn.execute(f"""
+                            SELECT add_compression_policy('{table}', INTERVAL '{COMPRESS_AFTER_DAYS} days', if_not_exists => true);
+                        """)
+                        await conn.execute(f"""
+                            SELECT add_retention_policy('{table}', INTERVAL '{retention_days} days', if_not_exists => true);
+                        """)
+                    except Exception as e:
+                        print(f"[DATABASE WARNING] Falha ao configurar compressão/retenção em '{table}': {e}")
+
+                # 9. Rollups de Telemetria (Continuous Aggregates 1m / 1h / 1d)
+                # Cada comando roda isolado: continuous aggregates não aceitam bloco de transação.
+                for view, bucket, start_offset, end_offset, schedule in TELEMETRY_ROLLUPS:
+                    try:
+                        await conn.execute(f"""
+                            CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+                            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+                            SELECT time_bucket(INTERVAL '{int(bucket.total_seconds())} seconds', timestamp) AS bucket,
+                                tenant_id,
+                                node_id,
+                                {TELEMETRY_ROLLUP_SELECT}
+                            FROM telemetry
+                            GROUP BY bucket, tenant_id, node_id
+                            WITH NO DATA;
+                        """)
+                        await conn.execute(f"""
+                            SELECT add_continuous_aggregate_policy('{view}',
+                                start_offset => INTERVAL '{start_offset}',
+                                end_offset => INTERVAL '{end_offset}',
+                                schedule_interval => INTERVAL '{schedule}',
+                                if_not_exists => true);
+                        """)
+                    except Exception as e:
+                        print(f"[DATABASE WARNING] Falha ao criar rollup '{view}': {e}")
+
             except Exception as e:
                 print(f"[DATABASE ERROR] Falha na inicialização do Schema: {e}")
 
@@ -215,6 +764,22 @@ class DatabaseManager:
             print(f"[DATABASE ERROR] get_tenant: {e}")
             return None
 
+    async def get_tenant_status(self, tenant_id: str) -> Optional[str]:
+        """
+        Status do tenant (None se inexistente).
+        Erros de banco são propagados para não serem cacheados como tenant inexistente.
+        """
+        if not self.enabled: return None
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("SELECT status FROM tenants WHERE tenant_id = $1", tenant_id)
+
+    async def list_tenant_statuses(self) -> Dict[str, str]:
+        """Todos os tenants e seus status em um único SELECT (refresh do cache)."""
+        if not self.enabled: return {}
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT tenant_id, status FROM tenants")
+            return {r["tenant_id"]: r["status"] for r in rows}
+
     async def list_tenants_with_stats(self) -> list:
         """Lista tenants com contagem de nodes."""
         if not self.enabled: return []
@@ -280,6 +845,33 @@ class DatabaseManager:
             print(f"[DATABASE ERROR] validate_api_key: {e}")
             return None
 
+    async def lookup_api_key(self, key_hash: str) -> Optional[str]:
+        """
+        Resolve o hash de uma API Key ativa para o tenant_id (somente leitura).
+        Erros de banco são propagados para não serem cacheados como chave inválida.
+        """
+        if not self.enabled: return None
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("""
+                SELECT tenant_id FROM tenant_api_keys
+                WHERE api_key_hash = $1 AND status = 'ACTIVE'
+            """, key_hash)
+
+    async def touch_api_keys(self, usage: Dict[str, datetime]):
+        """
+        Atualiza last_used_at de várias chaves em um único UPDATE.
+        usage: {api_key_hash: último uso}
+        """
+        if not self.enabled or not usage: return
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                UPDATE tenant_api_keys AS k
+                SET last_used_at = u.used_at
+                FROM unnest($1::text[], $2::timestamptz[]) AS u(api_key_hash, used_at)
+                WHERE k.api_key_hash = u.api_key_hash
+                  AND (k.last_used_at IS NULL OR k.last_used_at < u.used_at)
+            """, list(usage.keys()), list(usage.values()))
+
 
 
     async def upsert_node(self, node_data: Dict):
@@ -316,6 +908,22 @@ class DatabaseManager:
         except Exception as e:
             print(f"[DATABASE ERROR] Falha ao persistir Node: {e}")
 
+    async def touch_nodes_last_seen(self, entries: list):
+        """
+        Atualiza last_seen de vários nodes em um único UPDATE (sem reescrever metadata).
+        entries: [(node_id, tenant_id, last_seen)]
+        """
+        if not self.enabled or not entries: return
+        node_ids, tenant_ids, last_seen = zip(*entries)
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                UPDATE nodes AS n
+                SET last_seen = u.last_seen
+                FROM unnest($1::text[], $2::text[], $3::timestamptz[]) AS u(node_id, tenant_id, last_seen)
+                WHERE n.node_id = u.node_id AND n.tenant_id = u.tenant_id
+                  AND (n.last_seen IS NULL OR n.last_seen < u.last_seen)
+            """, list(node_ids), list(tenant_ids), list(last_seen))
+
     async def insert_alert(self, alert_data: Dict):
         """
         Insere um novo alerta.
@@ -365,52 +973,273 @@ class DatabaseManager:
         except Exception as e:
             print(f"[DATABASE ERROR] Falha ao persistir Evento: {e}")
 
+    @staticmethod
+    def build_telemetry_record(telemetry_data: Dict) -> Tuple:
+        """
+        Converte o payload decodificado em uma linha da tabela telemetry (TELEMETRY_COLUMNS).
+        Levanta InvalidTelemetryRecord se a linha não puder entrar no COPY.
+        """
+        record = (
+            datetime.utcnow(), # Horário de recepção na Central
+            telemetry_data.get("node_id"),
+            json.dumps(telemetry_data) if TELEMETRY_STORE_PAYLOAD else None,
+            telemetry_data.get("tenant_id", "default")
+        ) + extract_telemetry_metrics(telemetry_data)
+        return validate_telemetry_record(record)
+
+    @staticmethod
+    def build_agent_telemetry_record(agent_data: Dict, tenant_id: str) -> Tuple:
+        """
+        Converte o payload de um Guardian Agent em uma linha da tabela telemetry (node_id = agent_id).
+        Levanta InvalidTelemetryRecord se a linha não puder entrar no COPY.
+        """
+        record = (
+            datetime.utcnow(), # Horário de recepção na Central
+            agent_data.get("agent_id") or agent_data.get("hostname"),
+            json.dumps(agent_data) if TELEMETRY_STORE_PAYLOAD else None,
+            tenant_id or "default"
+        ) + extract_agent_metrics(agent_data)
+        return validate_telemetry_record(record)
+
     async def insert_telemetry(self, telemetry_data: Dict):
         """
-        Insere dados de telemetria na série temporal.
+        Enfileira dados de telemetria para gravação em lote (Telemetry Writer).
+        Levanta TelemetryQueueFull se a fila estiver saturada (Backpressure).
         """
         if not self.enabled: return
 
+        await self.enqueue_telemetry_record(self.build_telemetry_record(telemetry_data))
+
+    async def insert_agent_telemetry(self, agent_data: Dict, tenant_id: str):
+        """
+        Enfileira as métricas de um Guardian Agent no mesmo caminho da telemetria dos NODEs
+        (COPY em lote + node_latest). Levanta TelemetryQueueFull se a fila estiver saturada.
+        """
+        if not self.enabled: return
+
+        await self.enqueue_telemetry_record(self.build_agent_telemetry_record(agent_data, tenant_id))
+
+    async def enqueue_telemetry_record(self, record: Tuple):
+        """Entrega uma linha pronta ao Telemetry Writer (ou grava direto, se ele não estiver ativo)."""
+        if self.telemetry_writer.running:
+            await self.telemetry_writer.enqueue(record)
+            return
+
+        # Fallback: escrita direta se o writer não estiver ativo
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO telemetry (timestamp, node_id, payload, tenant_id)
-                    VALUES ($1, $2, $3, $4)
-                """,
-                datetime.utcnow(), # Use current time or extract from payload if available
-                telemetry_data.get("node_id"),
-                json.dumps(telemetry_data),
-                telemetry_data.get("tenant_id", "default")
-                )
+            await self.copy_telemetry([record])
         except Exception as e:
             print(f"[DATABASE ERROR] Falha ao persistir Telemetria: {e}")
 
-    async def purge_old_data(self, retention_days_events: int = 90, retention_days_alerts: int = 180):
+    async def insert_telemetry_batch(self, records: list) -> List[Optional[Exception]]:
+        """
+        Persiste um lote de linhas (build_telemetry_record) pelo Telemetry Writer, aguardando
+        a gravação: o chamador precisa saber o resultado de cada item para responder item a item.
+        Retorna o erro de cada linha, na ordem do lote (None = gravada).
+        Levanta TelemetryQueueFull (Backpressure); no fallback sem writer, erros de banco são propagados.
+        """
+        if not self.enabled or not records: return [None] * len(records)
+
+        if self.telemetry_writer.running:
+            return await (await self.telemetry_writer.enqueue_batch(records))
+
+        # Fallback: escrita direta se o writer não estiver ativo
+        await self.copy_telemetry(records)
+        return [None] * len(records)
+
+    async def copy_telemetry(self, records: list):
+        """
+        Grava um lote de linhas de telemetria com uma única operação COPY
+        e atualiza o último estado conhecido (node_latest) de cada node do lote.
+        """
+        # Apenas a linha mais recente de cada (tenant, node) vai para node_latest
+        latest = {}
+        for record in records:
+            timestamp, node_id, _, tenant_id = record[:4]
+            if not node_id:
+                continue
+            key = (tenant_id or "default", node_id)
+            if key not in latest or timestamp >= latest[key][2]:
+                latest[key] = (key[0], node_id, timestamp) + tuple(record[4:])
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "telemetry",
+                    records=records,
+                    columns=TELEMETRY_COLUMNS
+                )
+                if latest:
+                    await conn.executemany(NODE_LATEST_UPSERT_SQL, list(latest.values()))
+
+    async def get_latest_telemetry(self) -> list:
+        """Retorna o último estado conhecido de cada node (node_latest)."""
+        if not self.enabled: return []
+        metric_columns = ", ".join(TELEMETRY_METRIC_COLUMNS)
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT tenant_id, node_id, timestamp, {metric_columns}
+                FROM node_latest
+                ORDER BY tenant_id, node_id
+            """)
+            return [dict(r) for r in rows]
+
+    async def get_node_metrics(self, tenant_id: str, node_id: str, start: datetime, end: datetime,
+                               resolution: timedelta) -> Tuple[str, list]:
+        """
+        Histórico de métricas de um node em buckets de `resolution`.
+        Lê do rollup mais grosso que atende à resolução (ou da tabela bruta abaixo de 1 min).
+        Retorna (fonte, pontos).
+        """
+        if not self.enabled: return "disabled", []
+
+        source = select_telemetry_source(resolution)
+        if source == "telemetry":
+            query = f"""
+                SELECT time_bucket($1::interval, timestamp) AS time, {TELEMETRY_ROLLUP_SELECT}
+                FROM telemetry
+                WHERE tenant_id = $2 AND node_id = $3 AND timestamp >= $4 AND timestamp < $5
+                GROUP BY 1
+                ORDER BY 1
+            """
+        else:
+            query = f"""
+                SELECT time_bucket($1::interval, bucket) AS time, {TELEMETRY_REAGGREGATE_SELECT}
+                FROM {source}
+                WHERE tenant_id = $2 AND node_id = $3 AND bucket >= $4 AND bucket < $5
+                GROUP BY 1
+                ORDER BY 1
+            """
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, resolution, tenant_id, node_id, start, end)
+            return source, [dict(r) for r in rows]
+
+    async def get_idr_time_in_state(self, source: str, start: datetime, end: datetime,
+                                    healthy_min: float, warning_min: float, tenant_id: str) -> list:
+        """
+        Tempo em estado do IDR por node de um tenant em uma única passada sobre o rollup
+        `source`: cada bucket é classificado pelo IDR médio e contado com count(*) FILTER.
+        """
+        if not self.enabled: return []
+
+        query = f"""
+            SELECT tenant_id, node_id,
+                count(*) AS buckets,
+                sum(samples) AS samples,
+                sum(idr_avg * samples) / NULLIF(sum(samples), 0) AS idr_avg,
+                min(idr_min) AS idr_min,
+                count(*) FILTER (WHERE idr_avg >= $3) AS healthy,
+                count(*) FILTER (WHERE idr_avg >= $4 AND idr_avg < $3) AS warning,
+                count(*) FILTER (WHERE idr_avg < $4) AS critical,
+                max(bucket) AS last_bucket
+            FROM {source}
+            WHERE bucket >= $1 AND bucket < $2 AND tenant_id = $5
+            GROUP BY tenant_id, node_id
+            ORDER BY tenant_id, node_id
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, start, end, healthy_min, warning_min, tenant_id)
+            return [dict(r) for r in rows]
+
+    async def _relation_bytes(self, conn, table: str) -> int:
+        """Tamanho total em disco de uma tabela (hypertable: soma de todos os chunks)."""
+        # hypertable_size() devolve NULL (sem erro) para tabelas comuns; sem TimescaleDB, a função não existe
+        size = None
+        try:
+            size = await conn.fetchval("SELECT hypertable_size($1::regclass);", table)
+        except Exception:
+            pass
+        if size is None:
+            size = await conn.fetchval("SELECT pg_total_relation_size($1::regclass);", table)
+        return int(size or 0)
+
+    async def _drop_old_chunks(self, conn, table: str, time_column: str, retention_days: int) -> Dict:
+        """
+        Remove chunks inteiros mais antigos que a retenção (drop_chunks).
+        Fallback para DELETE quando a tabela não é hypertable (Postgres vanilla).
+        """
+        bytes_before = await self._relation_bytes(conn, table)
+        try:
+            chunks = await conn.fetch(
+                "SELECT drop_chunks($1::regclass, older_than => NOW() - INTERVAL '1 day' * $2);",
+                table, retention_days
+            )
+            removed = f"{len(chunks)} chunks"
+        except Exception as e:
+            print(f"[DATABASE MAINTENANCE WARNING] drop_chunks indisponível para '{table}' ({e}). Usando DELETE.")
+            removed = await conn.execute(
+                f"DELETE FROM {table} WHERE {time_column} < NOW() - INTERVAL '1 day' * $1",
+                retention_days
+            )
+        bytes_after = await self._relation_bytes(conn, table)
+        return {
+            "removed": removed,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_reclaimed": max(bytes_before - bytes_after, 0)
+        }
+
+    async def _compression_stats(self, conn, table: str) -> Optional[Dict]:
+        """Bytes antes/depois da compressão nativa (hypertable_compression_stats)."""
+        try:
+            row = await conn.fetchrow("""
+                SELECT COALESCE(SUM(before_compression_total_bytes), 0) AS before_bytes,
+                       COALESCE(SUM(after_compression_total_bytes), 0) AS after_bytes,
+                       COALESCE(SUM(number_compressed_chunks), 0) AS compressed_chunks
+                FROM hypertable_compression_stats($1::regclass);
+            """, table)
+            return {
+                "compressed_chunks": int(row["compressed_chunks"]),
+                "bytes_saved": max(int(row["before_bytes"]) - int(row["after_bytes"]), 0)
+            }
+        except Exception:
+            return None
+
+    async def purge_old_data(self, retention_days_events: int = EVENTS_RETENTION_DAYS,
+                             retention_days_alerts: int = 180,
+                             retention_days_telemetry: int = TELEMETRY_RETENTION_DAYS) -> Dict:
         """
         Remove dados antigos do banco de dados (Política de Retenção).
+        Hypertables (events, telemetry) perdem chunks inteiros via drop_chunks.
+        Retorna um relatório com os bytes recuperados por tabela.
         """
-        if not self.enabled: return
-        
+        if not self.enabled: return {}
+
+        report = {}
         try:
-            print(f"[DATABASE MAINTENANCE] Iniciando limpeza de dados (Eventos > {retention_days_events}d, Alertas > {retention_days_alerts}d)...")
+            print(f"[DATABASE MAINTENANCE] Iniciando limpeza de dados (Eventos > {retention_days_events}d, Telemetria > {retention_days_telemetry}d, Alertas > {retention_days_alerts}d)...")
             async with self.pool.acquire() as conn:
-                # 1. Limpar Eventos Antigos
-                # TimescaleDB tem drop_chunks, mas assumindo Postgres vanilla ou Timescale básico:
-                events_res = await conn.execute("""
-                    DELETE FROM events 
-                    WHERE time < NOW() - INTERVAL '1 day' * $1
-                """, retention_days_events)
-                
-                # 2. Limpar Alertas Antigos
+                # 1. Eventos e Telemetria (Hypertables - drop de chunks)
+                report["events"] = await self._drop_old_chunks(conn, "events", "time", retention_days_events)
+                report["telemetry"] = await self._drop_old_chunks(conn, "telemetry", "timestamp", retention_days_telemetry)
+
+                # 2. Limpar Alertas Antigos (tabela comum, volume baixo)
+                bytes_before = await self._relation_bytes(conn, "alerts")
                 alerts_res = await conn.execute("""
                     DELETE FROM alerts 
                     WHERE time < NOW() - INTERVAL '1 day' * $1
                 """, retention_days_alerts)
-                
-                print(f"[DATABASE MAINTENANCE] Limpeza concluída. Eventos removidos: {events_res}, Alertas removidos: {alerts_res}")
-                
+                bytes_after = await self._relation_bytes(conn, "alerts")
+                report["alerts"] = {
+                    "removed": alerts_res,
+                    "bytes_before": bytes_before,
+                    "bytes_after": bytes_after,
+                    "bytes_reclaimed": max(bytes_before - bytes_after, 0)
+                }
+
+                # 3. Economia da compressão nativa (informativo)
+                for table in ("events", "telemetry"):
+                    stats = await self._compression_stats(conn, table)
+                    if stats is not None:
+                        report[table]["compression"] = stats
+
+            print(f"[DATABASE MAINTENANCE] Limpeza concluída. Eventos: {report['events']['removed']}, Telemetria: {report['telemetry']['removed']}, Alertas: {report['alerts']['removed']}")
+
         except Exception as e:
             print(f"[DATABASE MAINTENANCE ERROR] Falha ao limpar dados antigos: {e}")
 
+        return report
+
 # Instância global
 db = DatabaseManager()
@@ -0,0 +1,141 @@
+# ==============================================================================
+# NOC - Guardian Central: Pipeline de Decodificação (Ingest)
+# ==============================================================================
+# base64 + AES-GCM + json.loads de um payload de 1MB custa milissegundos de CPU.
+# Executado direto no event loop, uma rajada desses payloads trava todas as
+# outras requisições (inclusive /health).
+#
+# Payloads pequenos (heartbeats, registro) continuam sendo decodificados inline;
+# acima de DECODE_INLINE_MAX_BYTES o trabalho vai para um pool de threads, com
+# concorrência limitada por semáforo e métricas de tempo de fila.
+# Envelopes comprimidos são dimensionados pelo limite pós-descompressão do KeyRing
+# (e não pelo tamanho recebido): um frame pequeno pode expandir até esse limite.
+# Lotes (ingest em lote) são dimensionados pela soma dos itens e decodificados numa
+# única chamada: N itens pequenos somam o mesmo custo de CPU de um payload grande.
+#
+# Threads (e não processos): o AESGCM já construído no KeyRing não é
+# serializável, e a cifra/decifra da biblioteca cryptography libera o GIL.
+# ==============================================================================
+
+import os
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar, Union
+
+from guardian_crypto import CODEC_SEPARATOR, ENVELOPE_SEPARATOR, Envelope, KeyRing
+
+DECODE_INLINE_MAX_BYTES = int(os.getenv("DECODE_INLINE_MAX_BYTES", "65536"))
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Máximo de payloads grandes em decodificação/espera no pool ao mesmo tempo
+DECODE_MAX_CONCURRENCY = int(os.getenv("DECODE_MAX_CONCURRENCY", str(DECODE_WORKERS * 2)))
+
+T = TypeVar("T")
+
+
+class DecodePipeline:
+    """
+    Decodifica envelopes do ingest inline ou no pool de threads, conforme o tamanho.
+    """
+
+    def __init__(self, keyring: KeyRing, inline_max_bytes: int = DECODE_INLINE_MAX_BYTES,
+                 workers: int = DECODE_WORKERS, max_concurrency: int = DECODE_MAX_CONCURRENCY):
+        self.keyring = keyring
+        self.inline_max_bytes = inline_max_bytes
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {
+            "inline": 0,
+            "offloaded": 0,
+            "waiting": 0,
+            "in_flight": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+            "decode_ms_total": 0.0,
+        }
+
+    def _ensure_pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="guardian-decode")
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def run(self, size: int, func: Callable[..., T], *args) -> T:
+        """Executa func(*args) inline se size <= inline_max_bytes; caso contrário, no pool."""
+        if size <= self.inline_max_bytes:
+            self.stats["inline"] += 1
+            return func(*args)
+
+        self._ensure_pool()
+        queued_at = time.perf_counter()
+        self.stats["waiting"] += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats["waiting"] -= 1
+
+        self.stats["in_flight"] += 1
+        try:
+            # O tempo de fila inclui a espera pelo semáforo e por uma thread livre
+            result, started_at, finished_at = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _timed_call, func, args
+            )
+        finally:
+            self.stats["in_flight"] -= 1
+            self._semaphore.release()
+
+        wait_ms = (started_at - queued_at) * 1000
+        self.stats["offloaded"] += 1
+        self.stats["queue_wait_ms_total"] += wait_ms
+        self.stats["queue_wait_ms_max"] = max(self.stats["queue_wait_ms_max"], wait_ms)
+        self.stats["decode_ms_total"] += (finished_at - started_at) * 1000
+        return result
+
+    async def open(self, envelope: Union[str, Envelope]) -> Dict:
+        """
+        Descriptografa e decodifica um envelope de texto (JSON {"payload": ...})
+        ou binário (application/octet-stream).
+        """
+        if isinstance(envelope, Envelope):
+            size = self.work_size(len(envelope.frame), envelope.codec is not None)
+            return await self.run(size, self.keyring.open_envelope, envelope)
+        return await self.run(self.text_work_size(envelope), self.keyring.open, envelope)
+
+    async def open_batch(self, envelopes: List[str]) -> List[Union[Dict, Exception]]:
+        """
+        Decodifica os envelopes de texto de um lote numa única execução (inline ou no pool,
+        pelo tamanho somado). Retorna, na ordem, o payload ou a exceção de cada item.
+        """
+        size = sum(self.text_work_size(envelope) for envelope in envelopes)
+        return await self.run(size, self._open_many, envelopes)
+
+    def _open_many(self, envelopes: List[str]) -> List[Union[Dict, Exception]]:
+        results = []
+        for envelope in envelopes:
+            try:
+                results.append(self.keyring.open(envelope))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def text_work_size(self, envelope: str) -> int:
+        """Tamanho de trabalho de um envelope de texto: o codec vem no cabeçalho "kid+codec:" (sem decodificar o base64)."""
+        header = envelope.rpartition(ENVELOPE_SEPARATOR)[0]
+        return self.work_size(len(envelope), CODEC_SEPARATOR in header)
+
+    def work_size(self, size: int, compressed: bool) -> int:
+        """Tamanho usado na decisão inline/pool: comprimido vale o limite pós-descompressão."""
+        return max(size, self.keyring.max_decompressed_bytes) if compressed else size
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def _timed_call(func, args):
+    # Executa no worker: marca início/fim com o mesmo relógio do event loop
+    started_at = time.perf_counter()
+    result = func(*args)
+    return result, started_at, time.perf_counter()
@@ -0,0 +1,168 @@
+# ==============================================================================
+# NOC - Guardian Central: Event Log Sink (JSONL Append-Only)
+# ==============================================================================
+# Persistência em disco dos eventos de auditoria fora do event loop.
+# log_event() apenas enfileira; uma thread dedicada mantém o arquivo aberto,
+# grava em lote, rotaciona diariamente (events-YYYY-MM-DD.log) e aplica a
+# política de fsync configurada.
+# ==============================================================================
+
+import os
+import json
+import time
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", ".")
+# Política de fsync:
+#   none     -> apenas flush (o SO decide quando ir ao disco)
+#   batch    -> fsync após cada lote gravado
+#   interval -> fsync no máximo a cada EVENT_LOG_FSYNC_INTERVAL segundos
+EVENT_LOG_FSYNC = os.getenv("EVENT_LOG_FSYNC", "interval").lower()
+EVENT_LOG_FSYNC_INTERVAL = float(os.getenv("EVENT_LOG_FSYNC_INTERVAL", "1.0"))
+EVENT_LOG_BATCH_SIZE = int(os.getenv("EVENT_LOG_BATCH_SIZE", "256"))
+EVENT_LOG_QUEUE_MAX = int(os.getenv("EVENT_LOG_QUEUE_MAX", "10000"))
+
+# Sentinela de encerramento da thread
+_STOP_SIGNAL = object()
+
+
+class EventLogWriter:
+    """
+    Sink de eventos JSONL alimentado por fila e gravado por uma thread dedicada.
+    """
+
+    def __init__(self, log_dir: str = EVENT_LOG_DIR, fsync_policy: str = EVENT_LOG_FSYNC,
+                 fsync_interval: float = EVENT_LOG_FSYNC_INTERVAL,
+                 batch_size: int = EVENT_LOG_BATCH_SIZE, max_queue: int = EVENT_LOG_QUEUE_MAX):
+        if fsync_policy not in ("none", "batch", "interval"):
+            print(f"[EVENT LOG WARNING] EVENT_LOG_FSYNC inválido '{fsync_policy}'. Usando 'interval'.")
+            fsync_policy = "interval"
+        self.log_dir = log_dir
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_date = None
+        self._last_fsync = 0.0
+        self._dirty = False
+        self.stats = {
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "errors": 0,
+            "current_file": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Inicia a thread de escrita (idempotente)."""
+        if self.running:
+            return
+        self.thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, event_data: Dict):
+        """
+        Enfileira um evento (não bloqueia o event loop).
+        Se a fila estiver cheia o evento é descartado do JSONL (continua em memória e no DB).
+        """
+        try:
+            self.queue.put_nowait(event_data)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def stop(self, timeout: float = 5.0):
+        """Grava os eventos pendentes, sincroniza e fecha o arquivo."""
+        if not self.running:
+            return
+        self.queue.put(_STOP_SIGNAL)
+        self.thread.join(timeout)
+        self.thread = None
+
+    # --------------------------------------------------------------------------
+    # Thread de escrita
+    # --------------------------------------------------------------------------
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                # Com dados pendentes de fsync, acorda ao fim do intervalo mesmo sem novos eventos
+                timeout = self.fsync_interval if self._dirty else None
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._maybe_fsync(self._file)
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP_SIGNAL in batch:
+                batch = [e for e in batch if e is not _STOP_SIGNAL]
+                stopping = True
+            if batch:
+                self._write_batch(batch)
+
+        self._close(sync=True)
+
+    def _write_batch(self, batch: list):
+        try:
+            f = self._current_file()
+            f.write("".join(json.dumps(e) + "\n" for e in batch))
+            f.flush()
+            self._dirty = self.fsync_policy == "interval"
+            self._maybe_fsync(f)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[EVENT LOG ERROR] Falha ao gravar {len(batch)} eventos: {e}")
+
+    def _current_file(self):
+        """Retorna o arquivo do dia, rotacionando na virada de data."""
+        date_str = datetime.now().strftime("%Y-%m-%d")
+        if self._file is None or date_str != self._file_date:
+            self._close(sync=True)
+            filename = os.path.join(self.log_dir, f"events-{date_str}.log")
+            self._file = open(filename, "a", encoding="utf-8")
+            self._file_date = date_str
+            self.stats["current_file"] = filename
+        return self._file
+
+    def _maybe_fsync(self, f):
+        if f is None:
+            return
+        if self.fsync_policy == "batch":
+            os.fsync(f.fileno())
+        elif self.fsync_policy == "interval":
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self._last_fsync = now
+                self._dirty = False
+
+    def _close(self, sync: bool = False):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if sync and self.fsync_policy != "none":
+                os.fsync(self._file.fileno())
+            self._file.close()
+        except Exception as e:
+            print(f"[EVENT LOG ERROR] Falha ao fechar arquivo de eventos: {e}")
+        self._file = None
+        self._file_date = None
+        self._dirty = False
+
+
+# Instância global
+event_log = EventLogWriter()
@@ -0,0 +1,79 @@
+# ==============================================================================
+# NOC - Guardian Central: Agendador de Expiração (Health Engine)
+# ==============================================================================
+# Min-heap de prazos (deadline = last_seen + 3x heartbeat_interval) por node.
+# Cada heartbeat reagenda o prazo do node; o Health Engine dorme exatamente até
+# o próximo vencimento e só avalia os nós que de fato expiraram.
+# ==============================================================================
+
+import asyncio
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ExpiryScheduler:
+    """
+    Heap de (deadline, key) com remoção preguiçosa: reagendar apenas empilha um
+    novo prazo, e entradas cujo prazo não é mais o vigente são descartadas ao sair do heap.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def schedule(self, key: str, deadline: float):
+        """Define (ou substitui) o prazo de expiração de uma chave."""
+        self._deadlines[key] = deadline
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, key))
+        # Acorda o loop se o novo prazo vence antes do que ele está aguardando
+        if self._wakeup is not None and (earliest is None or deadline < earliest):
+            self._wakeup.set()
+        self._compact()
+
+    def cancel(self, key: str):
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self) -> Optional[float]:
+        """Prazo vigente mais próximo (descarta entradas obsoletas do topo)."""
+        while self._heap:
+            deadline, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_expired(self, now: float) -> List[str]:
+        """Remove e retorna as chaves cujo prazo vigente já venceu."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                expired.append(key)
+        return expired
+
+    async def wait(self):
+        """Dorme até o próximo vencimento ou até um prazo mais cedo ser agendado."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.clear()
+        deadline = self.next_deadline()
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        if timeout == 0:
+            return
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _compact(self):
+        # Cada heartbeat deixa uma entrada obsoleta; reconstrói o heap se elas dominarem
+        if len(self._heap) > 4 * len(self._deadlines) + 64:
+            self._heap = [(d, k) for k, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
@@ -0,0 +1,359 @@
+# ==============================================================================
+# NOC - Guardian: Camada de Criptografia (Envelope AES-256-GCM)
+# ==============================================================================
+# Módulo compartilhado entre Central e NODE. Cada serviço é construído a partir
+# do próprio diretório (central/ e node/), por isso existe uma cópia idêntica
+# em cada um: alterações devem ser aplicadas nas duas. O deploy (workflow e
+# ops/deploy_prod.sh) compara as cópias com cmp e aborta se divergirem.
+#
+# Formato do envelope (texto, transportado em {"payload": ...}):
+#   legado:   base64(nonce || ciphertext || tag)
+#   com kid:  <key_id>:base64(nonce || ciphertext || tag)   (AAD = key_id)
+# Formato binário (application/octet-stream): corpo = nonce || ciphertext || tag,
+# com o key-id (se houver) no header X-Guardian-Key-Id. Evita o base64 (+33%).
+#
+# Compressão (compress-then-encrypt): o JSON pode ser comprimido (gzip, ou zstd
+# se o pacote zstandard estiver instalado) antes da cifra. O codec vai no
+# cabeçalho do envelope ("<key_id>+<codec>:base64", ou header X-Guardian-Codec
+# no binário) e também entra no AAD, de modo que não pode ser trocado em trânsito.
+# O prefixo de key-id permite várias chaves ativas ao mesmo tempo (rotação sem
+# downtime). O objeto AESGCM é construído uma única vez por chave.
+# ==============================================================================
+
+import os
+import re
+import gzip
+import zlib
+import json
+import base64
+import threading
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# zstd é opcional: sem o pacote, apenas gzip fica disponível
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+KEY_SIZE = 32
+ENVELOPE_SEPARATOR = ":"
+KEY_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+BINARY_CONTENT_TYPE = "application/octet-stream"
+KEY_ID_HEADER = "X-Guardian-Key-Id"
+CODEC_HEADER = "X-Guardian-Codec"
+CODEC_SEPARATOR = "+"
+# Só vale a pena comprimir acima deste tamanho, e só se economizar ao menos 10%
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MAX_RATIO = 0.9
+# Limite padrão de tamanho após descompressão (proteção contra "zip bombs").
+# Quem recebe envelopes de terceiros (Central) deve passar o seu limite de ingest ao KeyRing.
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+
+class UnknownKeyId(ValueError):
+    """Envelope cifrado com um key-id que este serviço não conhece."""
+
+
+class UnsupportedCodec(ValueError):
+    """Envelope comprimido com um codec indisponível neste serviço."""
+
+
+class PayloadTooLarge(ValueError):
+    """Payload que, descomprimido, excede o limite configurado."""
+
+
+# ==============================================================================
+# Codecs de compressão
+# ==============================================================================
+def _gzip_compress(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=6)
+
+
+def _gzip_decompress(data: bytes, max_bytes: int) -> bytes:
+    # Para no limite (+1 byte para detectar o excesso) sem materializar o resto
+    raw = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, max_bytes + 1)
+    if len(raw) > max_bytes:
+        raise PayloadTooLarge(f"Payload descomprimido excede o limite ({max_bytes} bytes)")
+    return raw
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes, max_bytes: int) -> bytes:
+    # Frames com tamanho de conteúdo no cabeçalho são alocados com esse tamanho:
+    # valida antes de descomprimir. max_output_size cobre os frames sem o tamanho.
+    try:
+        content_size = zstandard.frame_content_size(data)
+    except zstandard.ZstdError:
+        raise ValueError("Frame zstd inválido")
+    if content_size > max_bytes:
+        raise PayloadTooLarge(f"Payload descomprimido excede o limite ({max_bytes} bytes)")
+    try:
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=max_bytes)
+    except zstandard.ZstdError as e:
+        if content_size < 0:
+            raise PayloadTooLarge(f"Payload descomprimido excede o limite ({max_bytes} bytes)")
+        raise ValueError(f"Frame zstd inválido: {e}")
+
+
+CODECS = {"gzip": (_gzip_compress, _gzip_decompress)}
+if zstandard is not None:
+    CODECS["zstd"] = (_zstd_compress, _zstd_decompress)
+
+
+def resolve_codec(name: Optional[str]) -> Optional[str]:
+    """
+    Converte a configuração (auto/zstd/gzip/none) no codec efetivo.
+    "auto" prefere zstd e cai para gzip se o pacote zstandard não estiver instalado.
+    """
+    name = (name or "none").strip().lower()
+    if name in ("", "none", "off", "false"):
+        return None
+    if name == "auto":
+        return "zstd" if "zstd" in CODECS else "gzip"
+    if name not in CODECS:
+        raise UnsupportedCodec(f"Codec indisponível: {name!r}")
+    return name
+
+
+def compress(data: bytes, codec: Optional[str], min_bytes: int = COMPRESS_MIN_BYTES) -> Tuple[Optional[str], bytes]:
+    """
+    Comprime `data` se valer a pena (tamanho >= min_bytes e ganho de pelo menos 10%).
+    Retorna (codec efetivo ou None, bytes).
+    """
+    if codec is None or len(data) < min_bytes:
+        return None, data
+    compressed = CODECS[codec][0](data)
+    if len(compressed) > len(data) * COMPRESS_MAX_RATIO:
+        return None, data
+    return codec, compressed
+
+
+def decompress(data: bytes, codec: Optional[str], max_bytes: int = MAX_DECOMPRESSED_BYTES) -> bytes:
+    if codec is None:
+        return data
+    try:
+        decompressor = CODECS[codec][1]
+    except KeyError:
+        raise UnsupportedCodec(f"Codec indisponível: {codec!r}")
+    return decompressor(data, max_bytes)
+
+
+class TransferStats:
+    """
+    Contadores de banda: bytes de JSON (antes) e de frame cifrado (depois da compressão).
+    Cada thread incrementa os próprios contadores (sem lock no caminho de seal/open, que
+    roda também no pool de decodificação); snapshot() soma os de todas as threads.
+    """
+
+    FIELDS = ("messages", "compressed", "raw_bytes", "wire_bytes")
+    DIRECTIONS = ("sealed", "opened")
+
+    def __init__(self):
+        self._local = threading.local()
+        # Contadores de todas as threads (list.append é atômico)
+        self._all = []
+
+    def _counters(self) -> Dict[str, list]:
+        try:
+            return self._local.counters
+        except AttributeError:
+            counters = self._local.counters = {direction: [0, 0, 0, 0] for direction in self.DIRECTIONS}
+            self._all.append(counters)
+            return counters
+
+    def record(self, direction: str, raw_bytes: int, wire_bytes: int, compressed: bool):
+        # direction: "sealed" (saída) ou "opened" (entrada); mesma ordem de FIELDS
+        counters = self._counters()[direction]
+        counters[0] += 1
+        counters[1] += compressed
+        counters[2] += raw_bytes
+        counters[3] += wire_bytes
+
+    def snapshot(self) -> Dict:
+        stats = {}
+        for direction in self.DIRECTIONS:
+            totals = [sum(values) for values in zip(*(counters[direction] for counters in list(self._all)))] or [0] * 4
+            stats.update({f"{direction}_{field}": total for field, total in zip(self.FIELDS, totals)})
+            raw = stats[f"{direction}_raw_bytes"]
+            stats[f"{direction}_ratio"] = round(stats[f"{direction}_wire_bytes"] / raw, 3) if raw else None
+        return stats
+
+
+def parse_key(key_hex: str) -> bytes:
+    """Converte a chave HEX e valida o tamanho (AES-256)."""
+    key = bytes.fromhex(key_hex.strip())
+    if len(key) != KEY_SIZE:
+        raise ValueError(f"Chave tem {len(key)} bytes. DEVE ter {KEY_SIZE} bytes ({KEY_SIZE * 2} hex chars)")
+    return key
+
+
+class Envelope(NamedTuple):
+    """Envelope já cifrado: key-id (None = chave legada) + frame binário."""
+
+    key_id: Optional[str]
+    frame: bytes
+    codec: Optional[str] = None
+
+    @property
+    def header(self) -> str:
+        """Prefixo do envelope de texto ("" no formato legado). Também usado como AAD."""
+        return envelope_header(self.key_id, self.codec)
+
+    def to_text(self) -> str:
+        """Forma de texto (base64 com prefixo opcional de key-id/codec) para transporte JSON."""
+        return _format_text(self.header, self.frame)
+
+    @classmethod
+    def from_text(cls, envelope: str) -> "Envelope":
+        header, frame = split_envelope(envelope)
+        key_id, _, codec = (header or "").partition(CODEC_SEPARATOR)
+        return cls(key_id or None, frame, codec or None)
+
+
+class KeyRing:
+    """
+    Conjunto de chaves ativas indexadas por key-id (None = chave legada, sem prefixo).
+    Mantém um AESGCM pronto por chave.
+    """
+
+    def __init__(self, keys: Mapping[Optional[str], bytes], active_key_id: Optional[str] = None,
+                 max_decompressed_bytes: int = MAX_DECOMPRESSED_BYTES):
+        for key_id in keys:
+            if key_id is not None and not KEY_ID_PATTERN.match(key_id):
+                raise ValueError(f"Key-id inválido: {key_id!r}")
+        if active_key_id is not None and active_key_id not in keys:
+            raise ValueError(f"Key-id ativo '{active_key_id}' não está entre as chaves configuradas")
+        self._ciphers: Dict[Optional[str], AESGCM] = {kid: AESGCM(key) for kid, key in keys.items()}
+        self.active_key_id = active_key_id
+        self.max_decompressed_bytes = max_decompressed_bytes
+        self.stats = TransferStats()
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ, **kwargs) -> "KeyRing":
+        """
+        GUARDIAN_SECRET_KEY   -> chave principal (também aceita envelopes sem prefixo)
+        GUARDIAN_KEY_ID       -> key-id da chave principal; se definido, os envelopes gerados levam o prefixo
+        GUARDIAN_SECRET_KEYS  -> chaves adicionais aceitas: "kid1:hex1,kid2:hex2"
+        """
+        keys: Dict[Optional[str], bytes] = {}
+        active_key_id = environ.get("GUARDIAN_KEY_ID") or None
+
+        primary = environ.get("GUARDIAN_SECRET_KEY")
+        if primary:
+            keys[None] = parse_key(primary)
+            if active_key_id:
+                keys[active_key_id] = keys[None]
+
+        for entry in (environ.get("GUARDIAN_SECRET_KEYS") or "").split(","):
+            if not entry.strip():
+                continue
+            key_id, _, key_hex = entry.strip().partition(ENVELOPE_SEPARATOR)
+            keys[key_id] = parse_key(key_hex)
+
+        return cls(keys, active_key_id, **kwargs)
+
+    @property
+    def key_ids(self):
+        return [kid for kid in self._ciphers if kid is not None]
+
+    def __bool__(self) -> bool:
+        return bool(self._ciphers)
+
+    def cipher(self, key_id: Optional[str]) -> AESGCM:
+        try:
+            return self._ciphers[key_id]
+        except KeyError:
+            raise UnknownKeyId(f"Key-id desconhecido: {key_id!r}")
+
+    # --------------------------------------------------------------------------
+    # Frames binários (nonce || ciphertext || tag)
+    # --------------------------------------------------------------------------
+    def encrypt_frame(self, plaintext: bytes, key_id: Optional[str] = None, aad: Optional[str] = None) -> bytes:
+        # AAD padrão = key-id (envelopes sem compressão mantêm o formato anterior)
+        aad = aad if aad is not None else key_id
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self.cipher(key_id).encrypt(nonce, plaintext, aad.encode() if aad else None)
+
+    def decrypt_frame(self, frame: bytes, key_id: Optional[str] = None, aad: Optional[str] = None) -> bytes:
+        if len(frame) < NONCE_SIZE + TAG_SIZE:
+            raise ValueError("Payload too short")
+        aad = aad if aad is not None else key_id
+        return self.cipher(key_id).decrypt(frame[:NONCE_SIZE], frame[NONCE_SIZE:], aad.encode() if aad else None)
+
+    # --------------------------------------------------------------------------
+    # Envelopes de texto (JSON)
+    # --------------------------------------------------------------------------
+    def seal_envelope(self, data: Dict, key_id: Optional[str] = None, codec: Optional[str] = None,
+                      compress_min_bytes: int = COMPRESS_MIN_BYTES) -> Envelope:
+        """
+        Serializa, comprime (se codec e se valer a pena) e cifra `data`.
+        Sem key_id explícito, usa a chave ativa.
+        """
+        key_id = key_id if key_id is not None else self.active_key_id
+        codec, _, frame = self._seal(data, key_id, codec, compress_min_bytes)
+        return Envelope(key_id, frame, codec)
+
+    def open_envelope(self, envelope: Envelope) -> Dict:
+        return self._open(envelope.key_id, envelope.codec, envelope.frame)
+
+    def seal(self, data: Dict, key_id: Optional[str] = None, codec: Optional[str] = None) -> str:
+        """Serializa, cifra e codifica `data` como envelope de texto."""
+        key_id = key_id if key_id is not None else self.active_key_id
+        _, header, frame = self._seal(data, key_id, codec, COMPRESS_MIN_BYTES)
+        return _format_text(header, frame)
+
+    def open(self, envelope: str) -> Dict:
+        header, frame = split_envelope(envelope)
+        key_id, _, codec = (header or "").partition(CODEC_SEPARATOR)
+        return self._open(key_id or None, codec or None, frame)
+
+    # Caminho quente de seal/open: sem objetos intermediários (Envelope) por mensagem
+    def _seal(self, data: Dict, key_id: Optional[str], codec: Optional[str],
+              compress_min_bytes: int) -> Tuple[Optional[str], str, bytes]:
+        raw = json.dumps(data).encode("utf-8")
+        codec, body = compress(raw, codec, compress_min_bytes)
+        header = envelope_header(key_id, codec)
+        frame = self.encrypt_frame(body, key_id, aad=header)
+        self.stats.record("sealed", len(raw), len(frame), codec is not None)
+        return codec, header, frame
+
+    def _open(self, key_id: Optional[str], codec: Optional[str], frame: bytes) -> Dict:
+        if codec is not None and codec not in CODECS:
+            raise UnsupportedCodec(f"Codec indisponível: {codec!r}")
+        body = self.decrypt_frame(frame, key_id, aad=envelope_header(key_id, codec))
+        raw = decompress(body, codec, self.max_decompressed_bytes)
+        self.stats.record("opened", len(raw), len(frame), codec is not None)
+        return json.loads(raw.decode("utf-8"))
+
+
+def envelope_header(key_id: Optional[str], codec: Optional[str]) -> str:
+    """Prefixo do envelope de texto / AAD: "<key_id>+<codec>", "<key_id>" ou "" (legado)."""
+    if codec:
+        return f"{key_id or ''}{CODEC_SEPARATOR}{codec}"
+    return key_id or ""
+
+
+def _format_text(header: str, frame: bytes) -> str:
+    encoded = base64.b64encode(frame).decode("ascii")
+    return f"{header}{ENVELOPE_SEPARATOR}{encoded}" if header else encoded
+
+
+def split_envelope(envelope: str) -> Tuple[Optional[str], bytes]:
+    """Separa o key-id (se houver) e decodifica o frame base64."""
+    key_id, separator, encoded = envelope.rpartition(ENVELOPE_SEPARATOR)
+    if not separator:
+        return None, base64.b64decode(envelope)
+    return key_id, base64.b64decode(encoded)
+
+
+def envelope_key_id(envelope: str) -> Optional[str]:
+    """Key-id do envelope (None para envelopes legados)."""
+    header, separator, _ = envelope.rpartition(ENVELOPE_SEPARATOR)
+    return (header.partition(CODEC_SEPARATOR)[0] or None) if separator else None
@@ -0,0 +1,87 @@
+# ==============================================================================
+# NOC - Guardian Central: Histórico em Memória (Ring Buffer)
+# ==============================================================================
+# Armazena os últimos N eventos/alertas em um buffer circular de capacidade fixa,
+# com índices secundários por tenant_id e por (tenant_id, node_id).
+# Inserção O(1) e leitura "últimos N do tenant X" em O(N), independentemente
+# do volume dos demais tenants.
+# ==============================================================================
+
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class RingHistory:
+    """
+    Buffer circular de dicts (eventos ou alertas) com índices por tenant e por node.
+    Os índices guardam números de sequência em ordem crescente; como a remoção
+    é sempre do item mais antigo, a expulsão também é O(1) (popleft).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots: List[Optional[Dict]] = [None] * capacity
+        self._next_seq = 0
+        self._by_tenant: Dict[str, deque] = {}
+        self._by_node: Dict[Tuple[str, str], deque] = {}
+
+    @staticmethod
+    def _keys(item: Dict) -> Tuple[str, Tuple[str, str]]:
+        tenant_id = item.get("tenant_id", "default")
+        return tenant_id, (tenant_id, item.get("node_id"))
+
+    def append(self, item: Dict):
+        """Adiciona um item, expulsando o mais antigo se a capacidade foi atingida."""
+        seq = self._next_seq
+        slot = seq % self.capacity
+
+        evicted = self._slots[slot]
+        if evicted is not None:
+            self._unindex(self._by_tenant, self._keys(evicted)[0])
+            self._unindex(self._by_node, self._keys(evicted)[1])
+
+        self._slots[slot] = item
+        tenant_key, node_key = self._keys(item)
+        self._by_tenant.setdefault(tenant_key, deque()).append(seq)
+        self._by_node.setdefault(node_key, deque()).append(seq)
+        self._next_seq += 1
+
+    @staticmethod
+    def _unindex(index: Dict, key):
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+    def iter_latest(self, tenant_id: Optional[str] = None, node_id: Optional[str] = None) -> Iterator[Dict]:
+        """Itera do mais recente para o mais antigo, opcionalmente filtrando por tenant/node."""
+        if tenant_id is None:
+            oldest = max(self._next_seq - self.capacity, 0)
+            seqs = range(self._next_seq - 1, oldest - 1, -1)
+        elif node_id is None:
+            seqs = reversed(self._by_tenant.get(tenant_id, ()))
+        else:
+            seqs = reversed(self._by_node.get((tenant_id, node_id), ()))
+        for seq in seqs:
+            yield self._slots[seq % self.capacity]
+
+    def latest(self, limit: Optional[int] = None, tenant_id: Optional[str] = None,
+               node_id: Optional[str] = None) -> List[Dict]:
+        """Retorna os últimos `limit` itens (mais recente primeiro)."""
+        limit = None if limit is None else max(limit, 0)
+        return list(islice(self.iter_latest(tenant_id, node_id), limit))
+
+    def count(self, tenant_id: Optional[str] = None, node_id: Optional[str] = None) -> int:
+        """Quantidade de itens retidos (total, por tenant ou por node)."""
+        if tenant_id is None:
+            return len(self)
+        if node_id is None:
+            return len(self._by_tenant.get(tenant_id, ()))
+        return len(self._by_node.get((tenant_id, node_id), ()))
+
+    def __len__(self) -> int:
+        return min(self._next_seq, self.capacity)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.iter_latest()
@@ -0,0 +1,131 @@
+# ==============================================================================
+# NOC - Guardian Central: Motor de KPI (IDR)
+# ==============================================================================
+# IDR (Índice de Disponibilidade de Recursos) = 100 - MAX(CPU, RAM, DISK)
+# Definição e faixas: docs/KPI_DEFINITION.md.
+#
+# Fonte única da fórmula e da classificação, usada:
+#   - por amostra: /api/nodes/status e scripts/kpi_simulator.py (último estado);
+#   - por janela: /api/kpi/idr, tempo em cada estado por node de um tenant. A janela
+#     inteira é agregada em uma única consulta (count FILTER sobre o rollup telemetry_1m
+#     ou telemetry_1h, GROUP BY node), sem trazer a série para o Python.
+# ==============================================================================
+
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Faixas de classificação (limite inferior de cada estado)
+IDR_HEALTHY_MIN = 30.0
+IDR_WARNING_MIN = 10.0
+IDR_STATES = ("HEALTHY", "WARNING", "CRITICAL")
+IDR_UNKNOWN = "UNKNOWN"
+
+KPI_DEFAULT_WINDOW = timedelta(hours=24)
+# Limitada pela retenção da telemetria bruta (e dos rollups derivados dela)
+KPI_MAX_WINDOW = timedelta(days=int(os.getenv("TELEMETRY_RETENTION_DAYS", "90")))
+# Até este tamanho de janela o tempo em estado é medido por minuto; acima, por hora
+KPI_MINUTE_WINDOW_MAX = timedelta(hours=int(os.getenv("KPI_MINUTE_WINDOW_MAX_HOURS", "168")))
+
+# Formato: (rollup, duração do bucket)
+KPI_SOURCES = [
+    ("telemetry_1m", timedelta(minutes=1)),
+    ("telemetry_1h", timedelta(hours=1)),
+]
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def compute_idr(cpu: Optional[float], ram: Optional[float], disk: Optional[float]) -> Optional[float]:
+    """IDR de uma amostra. Métricas ausentes são ignoradas (como GREATEST no SQL); sem nenhuma, None."""
+    values = [float(v) for v in (cpu, ram, disk) if v is not None]
+    if not values:
+        return None
+    return max(100.0 - max(values), 0.0)
+
+
+def classify_idr(idr: Optional[float]) -> str:
+    """HEALTHY (>= 30), WARNING (>= 10) ou CRITICAL (< 10). Sem IDR, UNKNOWN."""
+    if idr is None:
+        return IDR_UNKNOWN
+    if idr >= IDR_HEALTHY_MIN:
+        return "HEALTHY"
+    if idr >= IDR_WARNING_MIN:
+        return "WARNING"
+    return "CRITICAL"
+
+
+def parse_window(value: Optional[str]) -> timedelta:
+    """Converte a janela pedida ('90m', '24h', '7d') em timedelta. Levanta ValueError se inválida."""
+    if not value:
+        return KPI_DEFAULT_WINDOW
+    match = re.fullmatch(r"(\d+)([mhd])", value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("Invalid window (use e.g. 90m, 24h, 7d)")
+    window = timedelta(seconds=int(match.group(1)) * WINDOW_UNITS[match.group(2)])
+    if window > KPI_MAX_WINDOW:
+        raise ValueError(f"Window exceeds telemetry retention ({KPI_MAX_WINDOW.days}d)")
+    return window
+
+
+def select_kpi_source(window: timedelta):
+    """Rollup por minuto para janelas de até KPI_MINUTE_WINDOW_MAX; por hora acima disso."""
+    return KPI_SOURCES[0] if window <= KPI_MINUTE_WINDOW_MAX else KPI_SOURCES[1]
+
+
+def time_in_state(row: Dict, bucket: timedelta, window: timedelta) -> Dict:
+    """
+    Tempo em cada estado de um node na janela. Cada bucket do rollup é classificado
+    pelo IDR médio; os percentuais são relativos aos buckets com dados (cobertura à parte).
+    """
+    classified = sum(row[state.lower()] for state in IDR_STATES)
+    bucket_minutes = bucket.total_seconds() / 60
+    expected_buckets = max(window / bucket, 1)
+    idr_avg = row["idr_avg"]
+    return {
+        "node_id": row["node_id"],
+        "tenant_id": row["tenant_id"],
+        "samples": row["samples"],
+        "idr_avg": round(idr_avg, 2) if idr_avg is not None else None,
+        "idr_min": round(row["idr_min"], 2) if row["idr_min"] is not None else None,
+        "status": classify_idr(idr_avg),
+        "coverage_pct": round(min(100.0 * row["buckets"] / expected_buckets, 100.0), 2),
+        "time_in_state_pct": {
+            state: round(100.0 * row[state.lower()] / classified, 2) if classified else None
+            for state in IDR_STATES
+        },
+        "time_in_state_minutes": {
+            state: round(row[state.lower()] * bucket_minutes, 1) for state in IDR_STATES
+        },
+        "last_bucket": row["last_bucket"].isoformat() if row["last_bucket"] else None,
+    }
+
+
+async def idr_report(manager, end: datetime, window: timedelta, tenant_id: str) -> Dict:
+    """Relatório de frota de um tenant: tempo em estado por node e o agregado dos nodes na janela."""
+    source, bucket = select_kpi_source(window)
+    start = end - window
+    rows = await manager.get_idr_time_in_state(source, start, end, IDR_HEALTHY_MIN, IDR_WARNING_MIN, tenant_id)
+    nodes: List[Dict] = [time_in_state(row, bucket, window) for row in rows]
+
+    totals = {state: sum(row[state.lower()] for row in rows) for state in IDR_STATES}
+    classified = sum(totals.values())
+    return {
+        "tenant_id": tenant_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "window_seconds": int(window.total_seconds()),
+        "bucket_seconds": int(bucket.total_seconds()),
+        "source": source,
+        "fleet": {
+            "nodes": len(nodes),
+            "nodes_by_status": {
+                status: sum(1 for n in nodes if n["status"] == status) for status in IDR_STATES + (IDR_UNKNOWN,)
+            },
+            "time_in_state_pct": {
+                state: round(100.0 * totals[state] / classified, 2) if classified else None
+                for state in IDR_STATES
+            },
+        },
+        "nodes": nodes,
+    }
@@ -10,10 +10,9 @@
 # ==============================================================================
 
 import shutil
-from fastapi import FastAPI, HTTPException, Header, Request, BackgroundTasks
-from typing import Dict, Optional
+from fastapi import FastAPI, HTTPException, Header, Request, BackgroundTasks, Query
+from typing import Dict, List, Optional, Union
 import os
-import base64
 import json
 import time
 import uuid
@@ -22,10 +21,18 @@ import logging
 import sys
 import hashlib
 import traceback
-from datetime import datetime
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import re
+from datetime import datetime, timedelta, timezone
 from cryptography.exceptions import InvalidTag
-from database import db
+from database import db, align_resolution, is_row_error, InvalidTelemetryRecord, TelemetryQueueFull
+from event_log import event_log
+from history import RingHistory
+from registry import LastSeenWriter, NodeRecord, NodeRegistry
+from expiry import ExpiryScheduler
+from cache import ApiKeyCache, TenantCache
+from guardian_crypto import BINARY_CONTENT_TYPE, CODEC_HEADER, KEY_ID_HEADER, Envelope, KeyRing, PayloadTooLarge, UnknownKeyId, UnsupportedCodec, envelope_key_id
+from decode import DecodePipeline
+from kpi import classify_idr, compute_idr, idr_report, parse_window
 
 # Configuração de Logs (JSON Format friendly for Docker)
 logging.basicConfig(
@@ -44,10 +51,27 @@ APP_VERSION = "1.4.1-debug"
 app = FastAPI(title="NOC - Guardian Central", version=APP_VERSION)
 CENTRAL_TOKEN = os.getenv("CENTRAL_TOKEN")
 TELEMETRY_MAX_BYTES = int(os.getenv("TELEMETRY_MAX_BYTES", "1048576"))
+# Limite de um envelope após a descompressão (proteção contra "zip bombs")
+INGEST_MAX_DECOMPRESSED_BYTES = int(os.getenv("INGEST_MAX_DECOMPRESSED_BYTES", str(TELEMETRY_MAX_BYTES)))
+# Ingest em lote (/ingest/telemetry/batch): limites por requisição
+TELEMETRY_BATCH_MAX_BYTES = int(os.getenv("TELEMETRY_BATCH_MAX_BYTES", str(4 * 1048576)))
+TELEMETRY_BATCH_MAX_ITEMS = int(os.getenv("TELEMETRY_BATCH_MAX_ITEMS", "500"))
+# Ingest de Agents: tamanho máximo do identificador (agent_id/hostname)
+AGENT_ID_MAX_LENGTH = 128
 # Chave de Criptografia Global (Deve ser 32 bytes em HEX)
 GUARDIAN_SECRET_KEY = os.getenv("GUARDIAN_SECRET_KEY")
 GUARDIAN_ENV = os.getenv("GUARDIAN_ENV", "production")
 
+# Chaveiro AES-GCM (cifra construída uma vez por chave; múltiplos key-ids para rotação)
+try:
+    KEYRING = KeyRing.from_env(max_decompressed_bytes=INGEST_MAX_DECOMPRESSED_BYTES)
+except ValueError as e:
+    logger.critical(f"[SECURITY FATAL] Configuração de chaves inválida: {e}")
+    KEYRING = KeyRing({}, max_decompressed_bytes=INGEST_MAX_DECOMPRESSED_BYTES)
+
+# Payloads grandes são decodificados fora do event loop (pool de threads)
+DECODE_PIPELINE = DecodePipeline(KEYRING)
+
 # Métricas Internas (Self-Monitoring)
 INTERNAL_METRICS = {
     "db_write_failures": 0,
@@ -78,6 +102,8 @@ async def startup_event():
             logger.critical("[SECURITY FATAL] GUARDIAN_SECRET_KEY não é uma string HEX válida!")
     else:
         logger.critical("[SECURITY ERROR] GUARDIAN_SECRET_KEY não definida!")
+    if KEYRING.key_ids:
+        logger.info(f"[SECURITY] Key-ids aceitos: {', '.join(KEYRING.key_ids)} (ativo: {KEYRING.active_key_id or 'legado'})")
 
     logger.info(f"Default Tenant: default")
     logger.info(f"System Ready for Ingestion")
@@ -102,43 +128,22 @@ async def get_nodes_status():
     """
     logger.info("[API DEBUG] /api/nodes/status called")
     try:
-        async with db.pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT DISTINCT ON (node_id)
-                    node_id,
-                    timestamp,
-                    payload
-                FROM telemetry
-                ORDER BY node_id, timestamp DESC
-            """)
+        # Leitura O(nodes) do último estado conhecido (sem varrer a hypertable)
+        rows = await db.get_latest_telemetry()
 
         result = []
 
         for row in rows:
-            payload = row["payload"]
-
-            # Garantir dict
-            if isinstance(payload, str):
-                payload = json.loads(payload)
-
-            system_health = payload.get("system_health", {})
-
-            cpu = float(system_health.get("cpu_usage", 0))
-            ram = float(system_health.get("memory_usage", 0))
-            disk = float(system_health.get("disk_usage", 0))
+            cpu = float(row["cpu_usage"] or 0)
+            ram = float(row["memory_usage"] or 0)
+            disk = float(row["disk_usage"] or 0)
 
-            max_usage = max(cpu, ram, disk)
-            idr = 100 - max_usage
-
-            if idr >= 30:
-                status = "HEALTHY"
-            elif idr >= 10:
-                status = "WARNING"
-            else:
-                status = "CRITICAL"
+            idr = compute_idr(cpu, ram, disk)
+            status = classify_idr(idr)
 
             result.append({
                 "node_id": row["node_id"],
+                "tenant_id": row["tenant_id"],
                 "last_seen": row["timestamp"].isoformat(),
                 "cpu": cpu,
                 "ram": ram,
@@ -155,6 +160,29 @@ async def get_nodes_status():
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.get("/api/kpi/idr")
+async def get_kpi_idr(
+    tenant: Optional[str] = Query(None),
+    window: Optional[str] = Query(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """
+    Relatório de frota do IDR: percentual de tempo em HEALTHY/WARNING/CRITICAL por node
+    na janela pedida (ex.: 24h, 7d). Sempre restrito a um tenant (como as demais rotas /api).
+    """
+    tenant_id = await resolve_and_validate_tenant(tenant or x_tenant_id)
+    try:
+        span = parse_window(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        return await idr_report(db, datetime.now(timezone.utc), span, tenant_id)
+    except Exception as e:
+        logger.error(f"[API ERROR] /api/kpi/idr: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 if not GUARDIAN_SECRET_KEY:
     # AVISO: Em produção, isso deve impedir o startup. 
     # Aqui permitimos, mas o endpoint falhará se chamado.
@@ -162,27 +190,47 @@ if not GUARDIAN_SECRET_KEY:
 
 # Armazenamento em memória do registro e estado dos NODEs
 # NODES_REGISTRY armazena metadados completos (UUID, IP, Versão, Status)
-NODES_REGISTRY = {}
-# NODES_STATUS mantido para compatibilidade rápida, mas sincronizado com REGISTRY
-NODES_STATUS = {}
-# Estrutura de Alertas (Alert Engine)
-ALERTS = []
+# indexados por tenant e por (tenant, status)
+NODES_REGISTRY = NodeRegistry()
+# last_seen de heartbeats sem mudança de estado: gravado em lote (um UPDATE por intervalo)
+NODE_LAST_SEEN = LastSeenWriter(touch=db.touch_nodes_last_seen)
+# Prazos de expiração (OFFLINE) por node, ordenados em min-heap para o Health Engine
+NODE_EXPIRY = ExpiryScheduler()
+# Tolerância: 3x o intervalo de heartbeat
+OFFLINE_TOLERANCE_FACTOR = 3
+# Estrutura de Alertas (Alert Engine) - Ring buffer indexado por tenant e node
+ALERTS_MAX_SIZE = 1000
+ALERTS = RingHistory(ALERTS_MAX_SIZE)
 # Estrutura de Eventos (Event Log - Auditoria)
-EVENTS = []
 EVENTS_MAX_SIZE = 5000
+EVENTS = RingHistory(EVENTS_MAX_SIZE)
 
 # ==============================================================================
 # Multi-Tenant Helpers & Guardrails
 # ==============================================================================
-# Cache em memória de tenants válidos para evitar query no DB a cada request.
-# Formato: {tenant_id: status}
-TENANTS_CACHE = {"default": "ACTIVE"}
-TENANTS_CACHE_TTL = 0 # Timestamp de expiração
-CACHE_DURATION = 60 # Atualiza a cada 60s se falhar
+# Cache em memória de tenants para evitar query no DB a cada request.
+# TTL por entrada (TENANT_CACHE_TTL), cache negativo para tenants inexistentes e
+# refresh em background com um único SELECT. O tenant 'default' é assumido ACTIVE
+# quando o banco não o conhece (ex.: DB desativado).
+TENANTS_CACHE = TenantCache(
+    fetch_one=db.get_tenant_status,
+    fetch_all=db.list_tenant_statuses,
+    fallback={"default": "ACTIVE"}
+)
+
+# Cache API Key -> tenant_id (positivo e negativo). last_used_at é gravado em lote.
+# Revogações têm efeito em até API_KEY_CACHE_TTL segundos.
+API_KEYS_CACHE = ApiKeyCache(lookup=db.lookup_api_key, touch=db.touch_api_keys)
 
 def get_tenant_key(tenant_id: str, node_id: str) -> str:
     """Gera a chave composta para o Registry (Isolamento Lógico)."""
-    return f"{tenant_id}:{node_id}"
+    return NodeRegistry.key(tenant_id, node_id)
+
+def schedule_node_expiry(node: NodeRecord):
+    """(Re)agenda o prazo em que o node será considerado OFFLINE sem novo heartbeat."""
+    last_seen = node.last_seen or time.time()
+    interval = node.heartbeat_interval or 60
+    NODE_EXPIRY.schedule(get_tenant_key(node.tenant_id, node.node_id), last_seen + interval * OFFLINE_TOLERANCE_FACTOR)
 
 async def resolve_and_validate_tenant(
     x_tenant_id: Optional[str] = None,
@@ -200,13 +248,15 @@ async def resolve_and_validate_tenant(
     if x_api_key or x_tenant_id:
         logger.info(f"[AUTH DEBUG] Validating Tenant. API Key: {'***' if x_api_key else 'None'}, Tenant ID: {x_tenant_id}")
 
-    global TENANTS_CACHE, TENANTS_CACHE_TTL
-    
     tenant_id = None
 
     # 1. Resolução via API Key (Alta Prioridade)
     if x_api_key:
-        tenant_id = await db.validate_api_key(x_api_key)
+        try:
+            tenant_id = await API_KEYS_CACHE.resolve(x_api_key)
+        except Exception as e:
+            logger.error(f"[SECURITY] Falha ao validar API Key no banco: {e}")
+            tenant_id = None
         if not tenant_id:
             logger.warning(f"[SECURITY] API Key inválida ou revogada.")
             raise HTTPException(status_code=401, detail="Invalid or Revoked API Key")
@@ -224,23 +274,18 @@ async def resolve_and_validate_tenant(
     if not tenant_id:
         tenant_id = "default"
         
-    # Fast Path (Cache Hit)
-    if tenant_id in TENANTS_CACHE:
-        if TENANTS_CACHE[tenant_id] == "ACTIVE":
-            return tenant_id
-        else:
-            logger.warning(f"[SECURITY] Acesso negado a tenant desativado: {tenant_id}")
-            raise HTTPException(status_code=403, detail="Tenant Disabled")
-
-    # Slow Path (Cache Miss / Refresh)
-    tenant_data = await db.get_tenant(tenant_id)
-    
-    if tenant_data:
-        TENANTS_CACHE[tenant_id] = tenant_data["status"]
-        if tenant_data["status"] == "ACTIVE":
-            return tenant_id
-        else:
-            raise HTTPException(status_code=403, detail="Tenant Disabled")
+    # Cache (TTL) -> em miss, uma única consulta por tenant mesmo com requisições concorrentes
+    try:
+        tenant_status = await TENANTS_CACHE.get_status(tenant_id)
+    except Exception as e:
+        logger.error(f"[SECURITY] Falha ao consultar tenant {tenant_id} no banco: {e}")
+        tenant_status = None
+
+    if tenant_status == "ACTIVE":
+        return tenant_id
+    elif tenant_status:
+        logger.warning(f"[SECURITY] Acesso negado a tenant desativado: {tenant_id}")
+        raise HTTPException(status_code=403, detail="Tenant Disabled")
     else:
         # Tenant não existe
         logger.warning(f"[SECURITY] Tentativa de acesso a tenant inexistente: {tenant_id}")
@@ -270,19 +315,12 @@ async def log_event(event_type: str, node_id: str, severity: Optional[str], mess
             "tenant_id": tenant_id
         }
         
-        # 1. In-Memory Storage (FIFO)
-        EVENTS.insert(0, event_data)
-        if len(EVENTS) > EVENTS_MAX_SIZE:
-            EVENTS.pop()
+        # 1. In-Memory Storage (Ring buffer - descarta o mais antigo)
+        EVENTS.append(event_data)
             
         # 2. Persistência (Append-Only JSONL)
-        # Formato: events-YYYY-MM-DD.log
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        filename = f"events-{date_str}.log"
-        
-        # Escreve de forma síncrona simples (append)
-        with open(filename, "a", encoding="utf-8") as f:
-            f.write(json.dumps(event_data) + "\n")
+        # Formato: events-YYYY-MM-DD.log (gravação em lote por thread dedicada, fora do event loop)
+        event_log.write(event_data)
             
         # 3. Persistência em Banco de Dados (Postgres/Timescale)
         try:
@@ -326,9 +364,7 @@ async def trigger_alert(node_id: str, old_status: str, new_status: str, tenant_i
         "tenant_id": tenant_id
     }
     
-    ALERTS.insert(0, alert)
-    if len(ALERTS) > 1000:
-        ALERTS.pop()
+    ALERTS.append(alert)
         
     logger.info(f"[{tenant_id}][{severity}] {message}")
     
@@ -356,50 +392,67 @@ async def trigger_alert(node_id: str, old_status: str, new_status: str, tenant_i
     )
 
 
-def encrypt_payload(data: Dict) -> str:
+def encrypt_payload(data: Dict, key_id: Optional[str] = None) -> str:
     """
     Função auxiliar para criptografar payloads AES-256-GCM (Central -> Node).
+    key_id: responde com a mesma chave usada pelo Node (None = chave ativa/legada).
     """
-    if not GUARDIAN_SECRET_KEY:
+    if not KEYRING:
         raise Exception("Server Security Configuration Error")
 
-    key = bytes.fromhex(GUARDIAN_SECRET_KEY)
-    
-    # Preparar dados
-    json_str = json.dumps(data)
-    data_bytes = json_str.encode('utf-8')
-    
-    # Nonce único
-    nonce = os.urandom(12)
-    
-    # Criptografar
-    aesgcm = AESGCM(key)
-    ciphertext = aesgcm.encrypt(nonce, data_bytes, None)
-    
-    # Concatenar Nonce + Ciphertext
-    full_payload = nonce + ciphertext
-    
-    return base64.b64encode(full_payload).decode('utf-8')
+    return KEYRING.seal(data, key_id)
 
 def decrypt_payload(encrypted_b64: str) -> Dict:
     """
     Função auxiliar para descriptografar payloads AES-256-GCM.
+    Aceita envelopes legados (sem prefixo) e envelopes com key-id.
     """
-    if not GUARDIAN_SECRET_KEY:
+    if not KEYRING:
          raise Exception("Server Security Configuration Error")
 
-    key = bytes.fromhex(GUARDIAN_SECRET_KEY)
-    aesgcm = AESGCM(key)
-    full_payload = base64.b64decode(encrypted_b64)
+    return KEYRING.open(encrypted_b64)
 
-    if len(full_payload) < 28:
-            raise ValueError("Payload too short")
+async def decode_payload(envelope: Union[str, Envelope]) -> Dict:
+    """
+    Versão assíncrona de decrypt_payload para as rotas de ingest:
+    envelopes grandes são decodificados no pool sem bloquear o event loop.
+    """
+    if not KEYRING:
+         raise Exception("Server Security Configuration Error")
 
-    nonce = full_payload[:12]
-    ciphertext_with_tag = full_payload[12:]
-    
-    decrypted_bytes = aesgcm.decrypt(nonce, ciphertext_with_tag, None)
-    return json.loads(decrypted_bytes.decode('utf-8'))
+    return await DECODE_PIPELINE.open(envelope)
+
+async def decode_payload_batch(envelopes: List[str]) -> List[Union[Dict, Exception]]:
+    """
+    Decodifica os envelopes de um lote numa única execução do pipeline, dimensionada pelo
+    tamanho total do lote. Retorna, na ordem, o payload ou a exceção de cada item.
+    """
+    if not KEYRING:
+         raise Exception("Server Security Configuration Error")
+
+    return await DECODE_PIPELINE.open_batch(envelopes)
+
+async def read_ingest_envelope(request: Request) -> Union[str, Envelope]:
+    """
+    Lê o envelope cifrado do corpo da requisição de ingest.
+    - application/octet-stream: corpo = nonce || ciphertext (key-id/codec nos headers X-Guardian-Key-Id/X-Guardian-Codec)
+    - JSON (legado): {"payload": "<base64>"}
+    """
+    content_type = (request.headers.get("content-type") or "").split(";", 1)[0].strip().lower()
+    if content_type == BINARY_CONTENT_TYPE:
+        frame = await request.body()
+        if not frame:
+            raise HTTPException(status_code=400, detail="Missing 'payload' field")
+        return Envelope(request.headers.get(KEY_ID_HEADER) or None, frame, request.headers.get(CODEC_HEADER) or None)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    encrypted_b64 = data.get("payload") if isinstance(data, dict) else None
+    if not encrypted_b64 or not isinstance(encrypted_b64, str):
+        raise HTTPException(status_code=400, detail="Missing 'payload' field")
+    return encrypted_b64
 
 # ==============================================================================
 # Rota de Health Check
@@ -451,7 +504,12 @@ async def health_check() -> dict:
         "components": {
             "database": db_status,
             "disk": disk_usage,
-            "internal_errors": INTERNAL_METRICS["db_write_failures"]
+            "internal_errors": INTERNAL_METRICS["db_write_failures"],
+            "telemetry_writer": db.telemetry_writer.stats,
+            "last_seen_writer": dict(NODE_LAST_SEEN.stats, pending=NODE_LAST_SEEN.pending),
+            "event_log": event_log.stats,
+            "decode_pipeline": DECODE_PIPELINE.stats,
+            "transfer": KEYRING.stats.snapshot()
         }
     }
 
@@ -466,7 +524,7 @@ async def root() -> Dict[str, str]:
 # Rota de Registro de NODE
 # ==============================================================================
 @app.post("/ingest/register")
-async def register_node(data: Dict, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
+async def register_node(request: Request, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
     """
     Endpoint para registro inicial do NODE.
     Gera identidade única e distribui políticas de configuração.
@@ -481,14 +539,11 @@ async def register_node(data: Dict, authorization: Optional[str] = Header(None),
         if token != CENTRAL_TOKEN:
             raise HTTPException(status_code=403, detail="Forbidden")
 
-    encrypted_b64 = data.get("payload")
-
-    if not encrypted_b64:
-        raise HTTPException(status_code=400, detail="Missing 'payload'")
+    envelope = await read_ingest_envelope(request)
 
     try:
         # 1. Descriptografar payload de registro
-        reg_data = decrypt_payload(encrypted_b64)
+        reg_data = await decode_payload(envelope)
         
         # LOG DE DEBUG (Solicitado na Tarefa 4)
         logger.info(f"[REGISTER DEBUG] Payload recebido (Decrypted): {reg_data}")
@@ -502,29 +557,30 @@ async def register_node(data: Dict, authorization: Optional[str] = Header(None),
         node_uuid = str(uuid.uuid4())
         current_time = time.time()
         
-        # Chave composta para Multi-Tenancy
-        reg_key = get_tenant_key(tenant_id, node_id)
-        
-        NODES_REGISTRY[reg_key] = {
-            "uuid": node_uuid,
-            "node_id": node_id,
-            "tenant_id": tenant_id,
-            "hostname": reg_data.get("hostname"),
-            "ip": reg_data.get("ip_address") or reg_data.get("ip"), # Support both
-            "os": reg_data.get("os"),
-            "arch": reg_data.get("arch"),
-            "version": reg_data.get("agent_version") or reg_data.get("version"), # Support both
-            "registered_at": current_time,
-            "last_seen": current_time,
-            "status": "ONLINE",
-            "buffer_status": "inactive",
-            "heartbeat_interval": 60 # Default
-        }
+        # Registro indexado por tenant (chave composta para Multi-Tenancy)
+        node = NODES_REGISTRY.put(NodeRecord(
+            uuid=node_uuid,
+            node_id=node_id,
+            tenant_id=tenant_id,
+            hostname=reg_data.get("hostname"),
+            ip=reg_data.get("ip_address") or reg_data.get("ip"), # Support both
+            os=reg_data.get("os"),
+            arch=reg_data.get("arch"),
+            version=reg_data.get("agent_version") or reg_data.get("version"), # Support both
+            registered_at=current_time,
+            last_seen=current_time,
+            status="ONLINE",
+            buffer_status="inactive",
+            heartbeat_interval=60 # Default
+        ))
         
         logger.info(f"[REGISTER] NODE registrado com sucesso: {node_id} (Tenant: {tenant_id}) (UUID: {node_uuid})")
         
+        schedule_node_expiry(node)
+
         # Persistência DB
-        await db.upsert_node(NODES_REGISTRY[reg_key])
+        NODE_LAST_SEEN.discard(node)
+        await db.upsert_node(node.to_dict())
 
         # Log Event
         await log_event(
@@ -545,14 +601,21 @@ async def register_node(data: Dict, authorization: Optional[str] = Header(None),
             "message": "Welcome to Guardian Network"
         }
         
-        # 4. Criptografar Resposta
-        encrypted_policy = encrypt_payload(policy)
+        # 4. Criptografar Resposta (sempre JSON; mesma chave usada pelo Node)
+        key_id = envelope.key_id if isinstance(envelope, Envelope) else envelope_key_id(envelope)
+        encrypted_policy = encrypt_payload(policy, key_id=key_id)
         
         return {"payload": encrypted_policy}
 
     except InvalidTag:
         logger.warning(f"[REGISTER SECURITY] Falha na descriptografia (InvalidTag). Verifique se as chaves coincidem.")
         raise HTTPException(status_code=400, detail="Registration Failed: Invalid Signature (Key Mismatch?)")
+    except UnsupportedCodec as uc:
+        logger.warning(f"[REGISTER] {uc}")
+        raise HTTPException(status_code=415, detail="Unsupported Compression Codec")
+    except PayloadTooLarge as pl:
+        logger.warning(f"[REGISTER] {pl}")
+        raise HTTPException(status_code=413, detail="Payload Too Large")
     except ValueError as ve:
         logger.error(f"[REGISTER ERROR] Erro de Valor: {ve}")
         # Retornar traceback no log do servidor para debug profundo
@@ -583,23 +646,27 @@ async def ingest_agent(data: Dict, x_tenant_id: Optional[str] = Header(None), x_
     tenant_id = await resolve_and_validate_tenant(x_tenant_id, x_api_key)
 
     # Validação do Payload
+    # agent_id vira node_id (TEXT) na escrita em lote compartilhada: um valor de outro
+    # tipo (ou com NUL, que o PostgreSQL não aceita em TEXT) faria o COPY falhar
     agent_id = data.get("agent_id") or data.get("hostname")
     if not agent_id:
         raise HTTPException(status_code=400, detail="Missing agent_id or hostname")
+    if not isinstance(agent_id, str) or len(agent_id) > AGENT_ID_MAX_LENGTH or "\x00" in agent_id:
+        raise HTTPException(status_code=400, detail=f"Invalid agent_id (string, max {AGENT_ID_MAX_LENGTH} chars, no NUL)")
+    data["agent_id"] = agent_id
 
-    # Logging (Info level, no payload details)
-    logger.info(f"[AGENT INGEST] Dados recebidos de {agent_id} (Tenant: {tenant_id})")
+    # Persistência: mesmo caminho da telemetria dos NODEs (Telemetry Writer -> COPY + node_latest).
+    # A linha é validada antes de entrar na fila: payload com NUL (\u0000, inválido em JSONB) -> 400
+    try:
+        await db.insert_agent_telemetry(data, tenant_id)
+    except InvalidTelemetryRecord as it:
+        raise HTTPException(status_code=400, detail=f"Invalid Payload: {it}")
+    except TelemetryQueueFull:
+        logger.warning("[AGENT INGEST] Fila de telemetria cheia. Requisição rejeitada (503).")
+        raise HTTPException(status_code=503, detail="Ingest Queue Full", headers={"Retry-After": "5"})
 
-    # Persistência (Evento de Auditoria + Dados Básicos)
-    # Reutilizamos a tabela de eventos para armazenar a ocorrência
-    await log_event(
-        event_type="AGENT_INGEST_RECEIVED",
-        node_id=agent_id,
-        severity="INFO",
-        message=f"Agent data received from {data.get('os', 'unknown')}",
-        source="AGENT",
-        tenant_id=tenant_id
-    )
+    # Logging (Debug level, no payload details)
+    logger.debug(f"[AGENT INGEST] Métricas persistidas para {agent_id} (Tenant: {tenant_id})")
 
     # Retorno Simples
     return {"status": "received", "agent_id": agent_id, "timestamp": time.time()}
@@ -611,13 +678,13 @@ async def ingest_agent(data: Dict, x_tenant_id: Optional[str] = Header(None), x_
 # Função: Receber telemetria enviada pelos Guardian NODEs.
 # Segurança: Protegido por Token e Criptografia AES-256.
 @app.post("/ingest/telemetry")
-async def ingest_telemetry(data: Dict, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None), request: Request = None):
+async def ingest_telemetry(request: Request, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None)):
     """
     Endpoint para recepção de dados de telemetria dos nós remotos.
     Persiste os dados no TimescaleDB (Hypertable).
     """
     # 1. Rate Limiting / Size Limiting
-    cl = request.headers.get("content-length") if request else None
+    cl = request.headers.get("content-length")
     if cl and int(cl) > TELEMETRY_MAX_BYTES:
         raise HTTPException(status_code=413, detail="Payload Too Large")
 
@@ -641,15 +708,16 @@ async def ingest_telemetry(data: Dict, authorization: Optional[str] = Header(Non
          logger.critical("[ERRO CRÍTICO] GUARDIAN_SECRET_KEY não configurada no servidor.")
          raise HTTPException(status_code=500, detail="Server Security Configuration Error")
 
-    # 5. Extração do Payload Criptografado
-    encrypted_b64 = data.get("payload")
-    if not encrypted_b64:
-        raise HTTPException(status_code=400, detail="Missing 'payload' field")
+    # 5. Extração do Payload Criptografado (JSON/base64 ou binário)
+    envelope = await read_ingest_envelope(request)
 
     try:
         # 6. Descriptografia
-        telemetry_data = decrypt_payload(encrypted_b64)
+        telemetry_data = await decode_payload(envelope)
         
+        if not isinstance(telemetry_data, dict) or not isinstance(telemetry_data.get("node_id"), str) or not telemetry_data["node_id"]:
+            raise InvalidTelemetryRecord("Missing node_id")
+
         # Injeta o tenant_id nos dados para persistência
         telemetry_data["tenant_id"] = tenant_id
 
@@ -660,11 +728,28 @@ async def ingest_telemetry(data: Dict, authorization: Optional[str] = Header(Non
         node_id = telemetry_data.get("node_id", "UNKNOWN")
         logger.debug(f"[INGEST] Dados persistidos para {node_id} (Tenant: {tenant_id})")
         
-        return {"status": "received", "bytes_processed": len(encrypted_b64)}
+        bytes_processed = len(envelope.frame) if isinstance(envelope, Envelope) else len(envelope)
+        return {"status": "received", "bytes_processed": bytes_processed}
 
     except InvalidTag:
         logger.warning("[ALERTA DE SEGURANÇA] Falha na descriptografia: Assinatura inválida.")
         raise HTTPException(status_code=400, detail="Decryption Failed")
+    except UnknownKeyId as uk:
+        logger.warning(f"[ALERTA DE SEGURANÇA] {uk}")
+        raise HTTPException(status_code=400, detail="Decryption Failed: Unknown Key ID")
+    except UnsupportedCodec as uc:
+        logger.warning(f"[INGEST] {uc}")
+        raise HTTPException(status_code=415, detail="Unsupported Compression Codec")
+    except PayloadTooLarge as pl:
+        logger.warning(f"[INGEST] {pl}")
+        raise HTTPException(status_code=413, detail="Payload Too Large")
+    except InvalidTelemetryRecord as it:
+        logger.warning(f"[INGEST] Telemetria rejeitada: {it}")
+        raise HTTPException(status_code=400, detail=f"Invalid Payload: {it}")
+    except TelemetryQueueFull:
+        # Backpressure: fila do Telemetry Writer saturada. O NODE mantém o item no buffer e reenvia.
+        logger.warning("[INGEST] Fila de telemetria cheia. Requisição rejeitada (503).")
+        raise HTTPException(status_code=503, detail="Ingest Queue Full", headers={"Retry-After": "5"})
     except Exception as e:
         logger.error(f"[INGEST ERROR] Falha no processamento: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -673,11 +758,127 @@ async def ingest_telemetry(data: Dict, authorization: Optional[str] = Header(Non
         logger.error(f"[ERRO DE PROCESSAMENTO] {str(e)}")
         raise HTTPException(status_code=400, detail="Invalid Payload Format")
 
+# ==============================================================================
+# Rota de Ingestão em Lote (Store & Forward)
+# ==============================================================================
+# Função: Permitir que o NODE esvazie o buffer local em poucas requisições após
+# uma queda de conexão (em vez de um POST por item, limitado pelo rate limit).
+# Formato: {"items": ["<envelope>", ...]}; resposta com o resultado de cada item:
+#   stored   -> persistido
+#   invalid  -> rejeitado em definitivo (não reenviar)
+#   failed   -> falha temporária (reenviar depois)
+@app.post("/ingest/telemetry/batch")
+async def ingest_telemetry_batch(request: Request, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None)):
+    """
+    Recebe N envelopes de telemetria e persiste os válidos com uma única escrita em lote.
+    """
+    cl = request.headers.get("content-length")
+    if cl and int(cl) > TELEMETRY_BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Payload Too Large")
+
+    if CENTRAL_TOKEN:
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+        token = authorization.split(" ", 1)[1]
+        if token != CENTRAL_TOKEN:
+            raise HTTPException(status_code=403, detail="Forbidden")
+
+    tenant_id = "default"
+    if x_tenant_id:
+         tenant_id = await resolve_and_validate_tenant(x_tenant_id)
+
+    if not GUARDIAN_SECRET_KEY:
+         logger.critical("[ERRO CRÍTICO] GUARDIAN_SECRET_KEY não configurada no servidor.")
+         raise HTTPException(status_code=500, detail="Server Security Configuration Error")
+
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Missing 'items' field")
+    if len(items) > TELEMETRY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too Many Items (max {TELEMETRY_BATCH_MAX_ITEMS})")
+
+    # 1. Descriptografia do lote numa única execução do pipeline (inline ou pool, pelo tamanho
+    #    total); o resultado é item a item: um item inválido não derruba o lote
+    envelopes = [item for item in items if item and isinstance(item, str)]
+    try:
+        decoded = iter(await decode_payload_batch(envelopes)) if envelopes else iter(())
+    except Exception as e:
+        # Falha do servidor (pool de decodificação, configuração de chaves...): o NODE reenvia
+        logger.error(f"[INGEST BATCH ERROR] Falha ao decodificar lote ({len(envelopes)} itens): {e}")
+        raise HTTPException(status_code=503, detail="Decode Unavailable", headers={"Retry-After": "5"})
+
+    results = []
+    # Formato: (índice do resultado, linha da tabela telemetry)
+    accepted = []
+    for index, encrypted_b64 in enumerate(items):
+        try:
+            if not encrypted_b64 or not isinstance(encrypted_b64, str):
+                raise ValueError("Missing payload")
+            telemetry_data = next(decoded)
+            if isinstance(telemetry_data, Exception):
+                raise telemetry_data
+            if not isinstance(telemetry_data, dict) or not isinstance(telemetry_data.get("node_id"), str) or not telemetry_data["node_id"]:
+                raise ValueError("Missing node_id")
+            telemetry_data["tenant_id"] = tenant_id
+            # Linha validada aqui: um item inválido não pode entrar no COPY compartilhado
+            accepted.append((len(results), db.build_telemetry_record(telemetry_data)))
+            results.append({"index": index, "status": "stored"})
+        except InvalidTag:
+            results.append({"index": index, "status": "invalid", "error": "Decryption Failed"})
+        except UnknownKeyId:
+            results.append({"index": index, "status": "invalid", "error": "Unknown Key ID"})
+        except UnsupportedCodec:
+            results.append({"index": index, "status": "invalid", "error": "Unsupported Compression Codec"})
+        except PayloadTooLarge:
+            results.append({"index": index, "status": "invalid", "error": "Payload Too Large"})
+        except ValueError as e:
+            # Formato inválido (base64/binascii, JSON, UTF-8, campos obrigatórios, InvalidTelemetryRecord)
+            results.append({"index": index, "status": "invalid", "error": f"Invalid Payload: {type(e).__name__}"})
+        except Exception as e:
+            # Falha do servidor (pool de decodificação, configuração de chaves...): o NODE reenvia
+            logger.error(f"[INGEST BATCH ERROR] Falha ao decodificar item {index}: {e}")
+            results.append({"index": index, "status": "failed", "error": "Decode Unavailable"})
+
+    # 2. Persistência pelo Telemetry Writer (COPY coalescido com as demais requisições)
+    if accepted:
+        try:
+            errors = await db.insert_telemetry_batch([record for _, record in accepted])
+        except TelemetryQueueFull:
+            # Backpressure: nada do lote foi enfileirado. O NODE mantém os itens no buffer e reenvia.
+            logger.warning(f"[INGEST BATCH] Fila de telemetria cheia. Lote de {len(accepted)} itens rejeitado (503).")
+            raise HTTPException(status_code=503, detail="Ingest Queue Full", headers={"Retry-After": "5"})
+        except Exception as e:
+            INTERNAL_METRICS["db_write_failures"] += 1
+            INTERNAL_METRICS["last_db_error"] = str(e)
+            logger.error(f"[INGEST BATCH ERROR] Falha ao persistir lote ({len(accepted)} itens): {e}")
+            for position, _ in accepted:
+                results[position].update(status="failed", error="Database Unavailable")
+            errors = []
+        # Linhas rejeitadas pelo banco pelo conteúdo não adiantam ser reenviadas; as demais, sim
+        for (position, _), error in zip(accepted, errors):
+            if error is None:
+                continue
+            if is_row_error(error):
+                results[position].update(status="invalid", error=f"Invalid Payload: {type(error).__name__}")
+            else:
+                results[position].update(status="failed", error="Database Unavailable")
+
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("stored", "invalid", "failed")}
+    if summary["invalid"]:
+        logger.warning(f"[ALERTA DE SEGURANÇA] Lote com {summary['invalid']} itens inválidos (Tenant: {tenant_id})")
+    logger.info(f"[INGEST BATCH] {len(items)} itens recebidos (Tenant: {tenant_id}): {summary}")
+
+    return {"status": "processed", "summary": summary, "results": results}
+
 # ==============================================================================
 # Rota de Heartbeat (Liveness Check)
 # ==============================================================================
 @app.post("/ingest/heartbeat")
-async def ingest_heartbeat(data: Dict, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None)):
+async def ingest_heartbeat(request: Request, authorization: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None)):
     """
     Endpoint para recepção de sinais de vida (Heartbeat) dos nós.
     
@@ -693,14 +894,11 @@ async def ingest_heartbeat(data: Dict, authorization: Optional[str] = Header(Non
         if token != CENTRAL_TOKEN:
             raise HTTPException(status_code=403, detail="Forbidden")
 
-    encrypted_b64 = data.get("payload")
-
-    if not encrypted_b64:
-        raise HTTPException(status_code=400, detail="Missing 'payload' field")
+    envelope = await read_ingest_envelope(request)
         
     try:
         # Descriptografa o heartbeat
-        hb_data = decrypt_payload(encrypted_b64)
+        hb_data = await decode_payload(envelope)
         
         node_id = hb_data.get("node_id")
         if not node_id:
@@ -711,44 +909,47 @@ async def ingest_heartbeat(data: Dict, authorization: Optional[str] = Header(Non
         new_status = "DEGRADED" if buffer_status == "active" else "ONLINE"
              
         # Atualiza status em memória (Registry)
-        reg_key = get_tenant_key(tenant_id, node_id)
+        node = NODES_REGISTRY.get(tenant_id, node_id)
         
-        if reg_key in NODES_REGISTRY:
-            current_status = NODES_REGISTRY[reg_key].get("status", "UNKNOWN")
+        if node is not None:
+            current_status = node.status
             
             # Alert Engine Check (Recovery or Degradation)
             if current_status != new_status:
                 await trigger_alert(node_id, current_status, new_status, tenant_id)
 
-            NODES_REGISTRY[reg_key]["last_seen"] = hb_data.get("timestamp")
-            NODES_REGISTRY[reg_key]["status"] = new_status
-            NODES_REGISTRY[reg_key]["buffer_status"] = buffer_status
-            NODES_REGISTRY[reg_key]["version"] = hb_data.get("version")
-            NODES_REGISTRY[reg_key]["tenant_id"] = tenant_id # Assegura consistência
+            version = hb_data.get("version")
+            write_through = current_status != new_status or node.version != version or node.buffer_status != buffer_status
+
+            node.last_seen = hb_data.get("timestamp")
+            node.buffer_status = buffer_status
+            node.version = version
+            NODES_REGISTRY.set_status(node, new_status)
             
-            # Persistência DB
-            await db.upsert_node(NODES_REGISTRY[reg_key])
+            # Persistência DB: mudança de estado grava na hora; só last_seen vai para o lote
+            if write_through:
+                NODE_LAST_SEEN.discard(node)
+                await db.upsert_node(node.to_dict())
+            else:
+                NODE_LAST_SEEN.mark(node)
         else:
             # Fallback se não registrado (ou reiniciou Central)
             # Se não conhecemos, assumimos que acabou de chegar (sem alerta de mudança)
-            NODES_REGISTRY[reg_key] = {
-                "last_seen": hb_data.get("timestamp"),
-                "status": new_status,
-                "buffer_status": buffer_status,
-                "version": hb_data.get("version"),
-                "node_id": node_id,
-                "tenant_id": tenant_id,
-                "uuid": "unknown-unregistered",
-                "heartbeat_interval": 60
-            }
+            node = NODES_REGISTRY.put(NodeRecord(
+                last_seen=hb_data.get("timestamp"),
+                status=new_status,
+                buffer_status=buffer_status,
+                version=hb_data.get("version"),
+                node_id=node_id,
+                tenant_id=tenant_id,
+                uuid="unknown-unregistered",
+                heartbeat_interval=60
+            ))
             # Persistência DB (Fallback)
-            await db.upsert_node(NODES_REGISTRY[reg_key])
-        
-        # Mantém NODES_STATUS para compatibilidade
-        # Nota: NODES_STATUS agora usa a mesma chave composta ou o node_id? 
-        # Para evitar quebra, mantemos o acesso por node_id SE possível, mas isso cria conflito.
-        # Decisão: NODES_STATUS segue o Registry. Onde for usado, deve-se iterar values() ou usar chave composta.
-        NODES_STATUS[reg_key] = NODES_REGISTRY[reg_key]
+            await db.upsert_node(node.to_dict())
+
+        # Reagenda o prazo de expiração (Health Engine)
+        schedule_node_expiry(node)
         
         print(f"[HEARTBEAT] ❤️  Sinal recebido de {node_id} (Tenant: {tenant_id}) (Status: {new_status})")
         return {"status": "alive", "server_time": time.time()} # timestamp
@@ -756,6 +957,12 @@ async def ingest_heartbeat(data: Dict, authorization: Optional[str] = Header(Non
     except InvalidTag:
         print(f"[HEARTBEAT ERROR] Assinatura inválida.")
         raise HTTPException(status_code=400, detail="Security Error")
+    except UnsupportedCodec as uc:
+        print(f"[HEARTBEAT ERROR] {uc}")
+        raise HTTPException(status_code=415, detail="Unsupported Compression Codec")
+    except PayloadTooLarge as pl:
+        print(f"[HEARTBEAT ERROR] {pl}")
+        raise HTTPException(status_code=413, detail="Payload Too Large")
     except Exception as e:
         print(f"[HEARTBEAT ERROR] {e}")
         raise HTTPException(status_code=400, detail="Processing Error")
@@ -766,70 +973,84 @@ async def ingest_heartbeat(data: Dict, authorization: Optional[str] = Header(Non
 # ==============================================================================
 async def health_monitor_loop():
     """
-    Loop infinito que avalia periodicamente a saúde dos nós.
+    Loop infinito que avalia a saúde dos nós.
+    Dorme até o próximo prazo de expiração (heap) e só avalia os nós vencidos.
     """
     print("[HEALTH ENGINE] Monitoramento de nós iniciado.")
     while True:
         try:
+            await NODE_EXPIRY.wait()
             await evaluate_nodes_health()
-            await asyncio.sleep(10) # Avalia a cada 10 segundos
         except asyncio.CancelledError:
             print("[HEALTH ENGINE] Monitoramento interrompido.")
             break
         except Exception as e:
             print(f"[HEALTH ENGINE ERROR] {e}")
-            await asyncio.sleep(10)
+            await asyncio.sleep(1)
 
 async def evaluate_nodes_health():
     """
-    Avalia o estado de todos os nós registrados.
+    Avalia os nós cujo prazo de heartbeat venceu.
     Detecta nós OFFLINE baseando-se no tempo desde o último heartbeat.
     """
     now = time.time()
     
-    # Itera sobre uma cópia dos valores para evitar problemas de concorrência simples
-    # Chaves agora são compostas, mas values() continua retornando os dados do node
-    for node_data in list(NODES_REGISTRY.values()):
-        node_id = node_data.get("node_id")
-        tenant_id = node_data.get("tenant_id", "default")
+    for reg_key in NODE_EXPIRY.pop_expired(now):
+        node = NODES_REGISTRY.get_by_key(reg_key)
+        # Node removido do registro após o agendamento
+        if node is None:
+            continue
+
+        node_id = node.node_id
+        tenant_id = node.tenant_id
         
-        last_seen = node_data.get("last_seen", 0)
-        interval = node_data.get("heartbeat_interval", 60)
-        current_status = node_data.get("status", "UNKNOWN")
+        last_seen = node.last_seen or 0
+        interval = node.heartbeat_interval or 60
+        current_status = node.status
         
         # Tolerância: 3x o intervalo de heartbeat
         # Se intervalo = 60s, offline após 180s sem sinal
-        threshold = interval * 3
+        threshold = interval * OFFLINE_TOLERANCE_FACTOR
         
-        if now - last_seen > threshold:
+        if now - last_seen >= threshold:
             # Se já está OFFLINE, não faz nada
             if current_status != "OFFLINE":
                 await trigger_alert(node_id, current_status, "OFFLINE", tenant_id)
                 
                 # Atualiza no Registry
-                reg_key = get_tenant_key(tenant_id, node_id)
-                
-                # Proteção caso a chave tenha mudado ou sido removida
-                if reg_key in NODES_REGISTRY:
-                    NODES_REGISTRY[reg_key]["status"] = "OFFLINE"
+                # Proteção caso o node tenha sido removido ou substituído durante o alerta
+                if NODES_REGISTRY.get(tenant_id, node_id) is node:
+                    NODES_REGISTRY.set_status(node, "OFFLINE")
                     # Persistência DB (Atualiza status)
-                    await db.upsert_node(NODES_REGISTRY[reg_key])
-                    
-                    # Sincroniza Status
-                    if reg_key in NODES_STATUS:
-                        NODES_STATUS[reg_key]["status"] = "OFFLINE"
+                    NODE_LAST_SEEN.discard(node)
+                    await db.upsert_node(node.to_dict())
+        else:
+            # Prazo antecipado (ex.: last_seen alterado sem reagendar): reagenda
+            schedule_node_expiry(node)
 
 
 @app.on_event("startup")
 async def startup_event():
     # Inicia conexão com Banco de Dados
     await db.connect()
+    # Inicia o sink de eventos JSONL
+    event_log.start()
+    # Gravação periódica (em lote) de last_used_at das API Keys
+    asyncio.create_task(API_KEYS_CACHE.run_usage_flusher())
+    # Gravação periódica (em lote) de last_seen dos nodes
+    asyncio.create_task(NODE_LAST_SEEN.run_flusher())
+    # Refresh periódico do cache de tenants
+    asyncio.create_task(TENANTS_CACHE.run_refresher())
     # Inicia a tarefa em background sem bloquear o servidor
     asyncio.create_task(health_monitor_loop())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await API_KEYS_CACHE.flush_usage()
+    await NODE_LAST_SEEN.flush()
     await db.close()
+    event_log.stop()
+    DECODE_PIPELINE.shutdown()
 
 # ==============================================================================
 # Endpoints de Monitoramento (NOC Dashboard)
@@ -841,10 +1062,7 @@ async def get_nodes_health(authorization: Optional[str] = Header(None), x_tenant
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
-    tenant_nodes = [
-        n for n in NODES_REGISTRY.values() 
-        if n.get("tenant_id", "default") == tenant_id
-    ]
+    tenant_nodes = [n.to_dict() for n in NODES_REGISTRY.by_tenant(tenant_id)]
     
     return {
         "count": len(tenant_nodes),
@@ -859,14 +1077,9 @@ async def get_alerts(limit: int = 50, x_tenant_id: Optional[str] = Header(None))
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
-    tenant_alerts = [
-        a for a in ALERTS 
-        if a.get("tenant_id", "default") == tenant_id
-    ]
-    
     return {
-        "count": len(tenant_alerts),
-        "alerts": tenant_alerts[:limit],
+        "count": ALERTS.count(tenant_id),
+        "alerts": ALERTS.latest(limit, tenant_id),
         "tenant_id": tenant_id
     }
 
@@ -877,15 +1090,10 @@ async def get_events(limit: int = 100, x_tenant_id: Optional[str] = Header(None)
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
-    tenant_events = [
-        e for e in EVENTS 
-        if e.get("tenant_id", "default") == tenant_id
-    ]
-    
     return {
-        "count": len(tenant_events),
+        "count": EVENTS.count(tenant_id),
         "limit": limit,
-        "events": tenant_events[:limit],
+        "events": EVENTS.latest(limit, tenant_id),
         "tenant_id": tenant_id
     }
 
@@ -900,11 +1108,7 @@ async def api_get_nodes(x_tenant_id: Optional[str] = Header(None)):
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
-    tenant_nodes = [
-        n for n in NODES_REGISTRY.values() 
-        if n.get("tenant_id", "default") == tenant_id
-    ]
-    return tenant_nodes
+    return [n.to_dict() for n in NODES_REGISTRY.by_tenant(tenant_id)]
 
 @app.get("/api/nodes/{node_id}")
 async def api_get_node_details(node_id: str, x_tenant_id: Optional[str] = Header(None)):
@@ -912,13 +1116,12 @@ async def api_get_node_details(node_id: str, x_tenant_id: Optional[str] = Header
     Retorna detalhes de um nó específico.
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
-    reg_key = get_tenant_key(tenant_id, node_id)
     
-    node = NODES_REGISTRY.get(reg_key)
+    node = NODES_REGISTRY.get(tenant_id, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
         
-    return node
+    return node.to_dict()
 
 @app.get("/api/nodes/{node_id}/events")
 async def api_get_node_events(node_id: str, limit: int = 50, x_tenant_id: Optional[str] = Header(None)):
@@ -926,15 +1129,83 @@ async def api_get_node_events(node_id: str, limit: int = 50, x_tenant_id: Option
     Retorna histórico de eventos de um nó específico (Filtrado por Tenant).
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
-    reg_key = get_tenant_key(tenant_id, node_id)
-    if reg_key not in NODES_REGISTRY:
+    if NODES_REGISTRY.get(tenant_id, node_id) is None:
          raise HTTPException(status_code=404, detail="Node not found")
          
-    node_events = [
-        e for e in EVENTS 
-        if e.get("node_id") == node_id and e.get("tenant_id", "default") == tenant_id
-    ]
-    return node_events[:limit]
+    return EVENTS.latest(limit, tenant_id, node_id)
+
+# Histórico de Métricas (Rollups)
+# Sem resolução explícita, mira ~METRICS_TARGET_POINTS pontos no intervalo pedido.
+METRICS_TARGET_POINTS = 500
+METRICS_MAX_POINTS = 5000
+METRICS_DEFAULT_RANGE = timedelta(hours=24)
+RESOLUTION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+METRICS_MAX_RESOLUTION = timedelta(days=366)
+
+def parse_resolution(value: Optional[str], span: timedelta) -> timedelta:
+    """
+    Converte a resolução pedida ('30s', '5m', '1h', '1d', segundos ou 'auto') em timedelta.
+    Limita o número de pontos retornados a METRICS_MAX_POINTS e alinha ao bucket do rollup usado.
+    """
+    span_seconds = max(span.total_seconds(), 1)
+    if not value or value == "auto":
+        seconds = span_seconds / METRICS_TARGET_POINTS
+    else:
+        match = re.fullmatch(r"(\d+)([smhd]?)", value.strip().lower())
+        if not match:
+            raise HTTPException(status_code=400, detail="Invalid resolution (use e.g. 30s, 5m, 1h, 1d)")
+        seconds = int(match.group(1)) * RESOLUTION_UNITS.get(match.group(2) or "s")
+    seconds = max(seconds, span_seconds / METRICS_MAX_POINTS, 1)
+    if seconds > METRICS_MAX_RESOLUTION.total_seconds():
+        raise HTTPException(status_code=400, detail=f"Resolution too large (max {METRICS_MAX_RESOLUTION.days}d)")
+    return align_resolution(timedelta(seconds=int(seconds)))
+
+@app.get("/api/nodes/{node_id}/metrics")
+async def api_get_node_metrics(
+    node_id: str,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    resolution: Optional[str] = Query(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """
+    Retorna o histórico de CPU/RAM/DISK/IDR de um nó (Filtrado por Tenant).
+    A consulta usa o rollup mais grosso (1m/1h/1d) que atende à resolução pedida.
+    """
+    tenant_id = await resolve_and_validate_tenant(x_tenant_id)
+
+    end = to or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    start = from_ or (end - METRICS_DEFAULT_RANGE)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+
+    bucket = parse_resolution(resolution, end - start)
+
+    try:
+        source, rows = await db.get_node_metrics(tenant_id, node_id, start, end, bucket)
+    except Exception as e:
+        logger.error(f"[API ERROR] /api/nodes/{node_id}/metrics: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    points = []
+    for row in rows:
+        point = {k: (round(v, 2) if isinstance(v, float) else v) for k, v in row.items()}
+        point["time"] = row["time"].isoformat()
+        points.append(point)
+
+    return {
+        "node_id": node_id,
+        "tenant_id": tenant_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution_seconds": int(bucket.total_seconds()),
+        "source": source,
+        "points": points
+    }
 
 @app.get("/api/alerts")
 async def api_get_alerts(limit: int = 100, x_tenant_id: Optional[str] = Header(None)):
@@ -943,11 +1214,7 @@ async def api_get_alerts(limit: int = 100, x_tenant_id: Optional[str] = Header(N
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
-    tenant_alerts = [
-        a for a in ALERTS 
-        if a.get("tenant_id", "default") == tenant_id
-    ]
-    return tenant_alerts[:limit]
+    return ALERTS.latest(limit, tenant_id)
 
 @app.get("/api/alerts/active")
 async def api_get_active_alerts(x_tenant_id: Optional[str] = Header(None)):
@@ -958,29 +1225,25 @@ async def api_get_active_alerts(x_tenant_id: Optional[str] = Header(None)):
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
     active_issues = []
-    # Itera sobre Registry. Filtrar pelo Tenant.
-    for key, node_data in NODES_REGISTRY.items():
-        if node_data.get("tenant_id", "default") != tenant_id:
-            continue
-            
-        node_id = node_data.get("node_id")
-        status = node_data.get("status", "UNKNOWN")
+    # Índice (tenant, status): apenas os nós não-ONLINE do tenant
+    for node in NODES_REGISTRY.not_online(tenant_id):
+        node_id = node.node_id
+        status = node.status
         
-        if status != "ONLINE":
-            # Tenta encontrar o último alerta gerado para este nó para enriquecer o contexto
-            related_alert = next((
-                a for a in ALERTS 
-                if a["node_id"] == node_id and a["new_status"] == status and a.get("tenant_id", "default") == tenant_id
-            ), None)
-            
-            issue = {
-                "node_id": node_id,
-                "status": status,
-                "severity": "CRITICAL" if status == "OFFLINE" else "WARNING",
-                "last_seen": node_data.get("last_seen"),
-                "message": related_alert["message"] if related_alert else f"Node is {status}"
-            }
-            active_issues.append(issue)
+        # Tenta encontrar o último alerta gerado para este nó para enriquecer o contexto
+        related_alert = next((
+            a for a in ALERTS.iter_latest(tenant_id, node_id)
+            if a["new_status"] == status
+        ), None)
+        
+        issue = {
+            "node_id": node_id,
+            "status": status,
+            "severity": "CRITICAL" if status == "OFFLINE" else "WARNING",
+            "last_seen": node.last_seen,
+            "message": related_alert["message"] if related_alert else f"Node is {status}"
+        }
+        active_issues.append(issue)
     return active_issues
 
 @app.get("/api/timeline")
@@ -990,11 +1253,7 @@ async def api_get_timeline(limit: int = 100, x_tenant_id: Optional[str] = Header
     """
     tenant_id = await resolve_and_validate_tenant(x_tenant_id)
     
-    tenant_events = [
-        e for e in EVENTS 
-        if e.get("tenant_id", "default") == tenant_id
-    ]
-    return tenant_events[:limit]
+    return EVENTS.latest(limit, tenant_id)
 
 
 
@@ -0,0 +1,207 @@
+# ==============================================================================
+# NOC - Guardian Central: Registro de NODEs (In-Memory)
+# ==============================================================================
+# Substitui os dicts NODES_REGISTRY/NODES_STATUS por um registro indexado:
+#   - tenant -> nodes          (leituras do Dashboard sem varrer todos os tenants)
+#   - tenant -> status -> nodes (alertas ativos direto dos nós não-ONLINE)
+# Os registros usam __slots__ para reduzir memória por node.
+#
+# Persistência: heartbeats sem mudança só atualizam a memória; os last_seen
+# alterados são gravados em lote (LastSeenWriter). Mudanças de status, versão e
+# nodes novos continuam sendo gravados na hora (upsert_node).
+# ==============================================================================
+
+import os
+import asyncio
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Intervalo de gravação em lote de nodes.last_seen
+NODE_LAST_SEEN_FLUSH_INTERVAL = float(os.getenv("NODE_LAST_SEEN_FLUSH_INTERVAL", "30"))
+
+NODE_FIELDS = (
+    "uuid", "node_id", "tenant_id", "hostname", "ip", "os", "arch", "version",
+    "registered_at", "last_seen", "status", "buffer_status", "heartbeat_interval",
+)
+
+
+class NodeRecord:
+    """Estado de um NODE. Alterações de status devem passar por NodeRegistry.set_status()."""
+
+    __slots__ = NODE_FIELDS
+
+    def __init__(self, node_id: str, tenant_id: str = "default", uuid: Optional[str] = None,
+                 hostname: Optional[str] = None, ip: Optional[str] = None, os: Optional[str] = None,
+                 arch: Optional[str] = None, version: Optional[str] = None,
+                 registered_at: Optional[float] = None, last_seen: Optional[float] = None,
+                 status: str = "UNKNOWN", buffer_status: str = "inactive", heartbeat_interval: int = 60):
+        self.node_id = node_id
+        self.tenant_id = tenant_id
+        self.uuid = uuid
+        self.hostname = hostname
+        self.ip = ip
+        self.os = os
+        self.arch = arch
+        self.version = version
+        self.registered_at = registered_at
+        self.last_seen = last_seen
+        self.status = status
+        self.buffer_status = buffer_status
+        self.heartbeat_interval = heartbeat_interval
+
+    def to_dict(self) -> Dict:
+        """Representação serializável (API e persistência em nodes.metadata)."""
+        return {field: getattr(self, field) for field in NODE_FIELDS}
+
+
+class NodeRegistry:
+    """
+    Registro de NODEs com chave composta tenant:node (Isolamento Lógico)
+    e índices secundários por tenant e por (tenant, status).
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, NodeRecord] = {}
+        self._by_tenant: Dict[str, Dict[str, NodeRecord]] = {}
+        self._by_status: Dict[str, Dict[str, Dict[str, NodeRecord]]] = {}
+
+    @staticmethod
+    def key(tenant_id: str, node_id: str) -> str:
+        return f"{tenant_id}:{node_id}"
+
+    def get(self, tenant_id: str, node_id: str) -> Optional[NodeRecord]:
+        return self._nodes.get(self.key(tenant_id, node_id))
+
+    def get_by_key(self, key: str) -> Optional[NodeRecord]:
+        return self._nodes.get(key)
+
+    def put(self, record: NodeRecord) -> NodeRecord:
+        """Insere ou substitui o registro do node (re-indexando)."""
+        key = self.key(record.tenant_id, record.node_id)
+        previous = self._nodes.get(key)
+        if previous is not None:
+            self._unindex(key, previous)
+        self._nodes[key] = record
+        self._by_tenant.setdefault(record.tenant_id, {})[key] = record
+        self._index_status(key, record)
+        return record
+
+    def remove(self, tenant_id: str, node_id: str) -> Optional[NodeRecord]:
+        key = self.key(tenant_id, node_id)
+        record = self._nodes.pop(key, None)
+        if record is not None:
+            self._unindex(key, record)
+        return record
+
+    def set_status(self, record: NodeRecord, status: str):
+        """Atualiza o status mantendo o índice (tenant, status) consistente."""
+        if record.status == status:
+            return
+        key = self.key(record.tenant_id, record.node_id)
+        self._unindex_status(key, record)
+        record.status = status
+        self._index_status(key, record)
+
+    def by_tenant(self, tenant_id: str) -> List[NodeRecord]:
+        return list(self._by_tenant.get(tenant_id, {}).values())
+
+    def by_status(self, tenant_id: str, status: str) -> List[NodeRecord]:
+        return list(self._by_status.get(tenant_id, {}).get(status, {}).values())
+
+    def not_online(self, tenant_id: str) -> List[NodeRecord]:
+        """Nós do tenant em qualquer status diferente de ONLINE (alertas ativos)."""
+        result = []
+        for status, nodes in self._by_status.get(tenant_id, {}).items():
+            if status != "ONLINE":
+                result.extend(nodes.values())
+        return result
+
+    def values(self) -> List[NodeRecord]:
+        return list(self._nodes.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __iter__(self) -> Iterator[NodeRecord]:
+        return iter(self.values())
+
+    # --------------------------------------------------------------------------
+    # Índices
+    # --------------------------------------------------------------------------
+    def _index_status(self, key: str, record: NodeRecord):
+        self._by_status.setdefault(record.tenant_id, {}).setdefault(record.status, {})[key] = record
+
+    def _unindex_status(self, key: str, record: NodeRecord):
+        tenant_statuses = self._by_status.get(record.tenant_id, {})
+        nodes = tenant_statuses.get(record.status)
+        if nodes is not None:
+            nodes.pop(key, None)
+            if not nodes:
+                del tenant_statuses[record.status]
+        if not tenant_statuses:
+            self._by_status.pop(record.tenant_id, None)
+
+    def _unindex(self, key: str, record: NodeRecord):
+        tenant_nodes = self._by_tenant.get(record.tenant_id, {})
+        tenant_nodes.pop(key, None)
+        if not tenant_nodes:
+            self._by_tenant.pop(record.tenant_id, None)
+        self._unindex_status(key, record)
+
+
+class LastSeenWriter:
+    """
+    Acumula o last_seen dos nodes (um por node, o mais recente) e grava tudo
+    periodicamente em um único UPDATE, em vez de um upsert por heartbeat.
+    """
+
+    def __init__(self, touch: Callable[[List[Tuple[str, str, datetime]]], Awaitable[None]],
+                 flush_interval: float = NODE_LAST_SEEN_FLUSH_INTERVAL):
+        self.touch = touch
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Tuple[str, str, datetime]] = {}
+        self.stats = {"marked": 0, "written": 0, "flushes": 0, "failed_flushes": 0}
+
+    def mark(self, record: NodeRecord):
+        """Registra o last_seen atual do node para o próximo flush."""
+        if not record.last_seen:
+            return
+        last_seen = datetime.fromtimestamp(record.last_seen, timezone.utc)
+        self._pending[NodeRegistry.key(record.tenant_id, record.node_id)] = (record.node_id, record.tenant_id, last_seen)
+        self.stats["marked"] += 1
+
+    def discard(self, record: NodeRecord):
+        """Descarta o pendente do node (ex.: o estado completo acabou de ser gravado via upsert)."""
+        self._pending.pop(NodeRegistry.key(record.tenant_id, record.node_id), None)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self):
+        """Grava em lote os last_seen acumulados desde o último flush."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await self.touch(list(pending.values()))
+            self.stats["written"] += len(pending)
+            self.stats["flushes"] += 1
+        except Exception as e:
+            # Reinsere para a próxima rodada sem sobrescrever valores mais recentes
+            for key, entry in pending.items():
+                self._pending.setdefault(key, entry)
+            self.stats["failed_flushes"] += 1
+            print(f"[REGISTRY ERROR] Falha ao gravar last_seen em lote: {e}")
+
+    async def run_flusher(self):
+        """Loop em background que grava os last_seen a cada flush_interval."""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
@@ -12,19 +12,21 @@
 
 import time
 import json
+import asyncio
+import signal
 import os
-import requests
 import random
-import base64
 import platform
 import socket
 import logging
 import sys
 import shutil
 import hashlib
-from collections import deque
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.exceptions import InvalidTag
+from concurrent.futures import ThreadPoolExecutor
+from guardian_crypto import BINARY_CONTENT_TYPE, CODEC_HEADER, CODEC_SEPARATOR, KEY_ID_HEADER, Envelope, KeyRing, resolve_codec
+from disk_queue import DiskQueue
+from transport import CentralClient
+from poller import DevicePoller
 
 # Configuração de Logs
 logging.basicConfig(
@@ -55,13 +57,51 @@ if GUARDIAN_SECRET_KEY:
         logger.critical("[SECURITY FATAL] GUARDIAN_SECRET_KEY não é uma string HEX válida!")
         sys.exit(1)
 
+# Chaveiro AES-GCM: cifra construída uma única vez (e não a cada mensagem).
+# GUARDIAN_KEY_ID (opcional) prefixa os envelopes com o key-id para rotação de chaves.
+try:
+    KEYRING = KeyRing.from_env()
+except ValueError as e:
+    logger.critical(f"[SECURITY FATAL] Configuração de chaves inválida: {e}")
+    sys.exit(1)
+
 # ==============================================================================
 # Buffer Local (Store & Forward)
 # ==============================================================================
-# Configuração do buffer: Armazena até 100 payloads se a Central estiver offline.
-# Política: FIFO (First-In, First-Out). Se encher, descarta o mais antigo.
-BUFFER_MAX_SIZE = int(os.getenv("NODE_BUFFER_SIZE", "100"))
-local_buffer = deque(maxlen=BUFFER_MAX_SIZE)
+# Buffer persistente em disco (log segmentado): sobrevive a restarts do container
+# e é limitado em bytes, não em itens.
+# Política: FIFO (First-In, First-Out). Se encher, descarta os segmentos mais antigos.
+BUFFER_DIR = os.getenv("NODE_BUFFER_DIR", "/var/lib/guardian/buffer")
+BUFFER_MAX_BYTES = int(os.getenv("NODE_BUFFER_MAX_BYTES", str(256 * 1024 * 1024)))
+BUFFER_SEGMENT_BYTES = int(os.getenv("NODE_BUFFER_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+BUFFER_FSYNC = os.getenv("NODE_BUFFER_FSYNC", "true").lower() in ("1", "true", "yes")
+
+def open_local_buffer():
+    """Abre (e faz replay) do buffer em disco; sem permissão no diretório, usa /tmp."""
+    try:
+        return DiskQueue(BUFFER_DIR, BUFFER_MAX_BYTES, BUFFER_SEGMENT_BYTES, BUFFER_FSYNC)
+    except OSError as e:
+        fallback_dir = os.path.join("/tmp", "guardian_buffer")
+        logger.error(f"[BUFFER] Não foi possível usar {BUFFER_DIR} ({e}). Usando {fallback_dir} (não persiste entre containers).")
+        return DiskQueue(fallback_dir, BUFFER_MAX_BYTES, BUFFER_SEGMENT_BYTES, BUFFER_FSYNC)
+
+local_buffer = open_local_buffer()
+
+def encode_buffer_item(envelope):
+    """Envelope -> registro do buffer: b"<key_id>[+codec]:" + frame binário (sem base64)."""
+    return envelope.header.encode("ascii") + b":" + envelope.frame
+
+def decode_buffer_item(record):
+    header, _, frame = record.partition(b":")
+    key_id, _, codec = header.decode("ascii").partition(CODEC_SEPARATOR)
+    return Envelope(key_id or None, frame, codec or None)
+
+# Reenvio em lote (/ingest/telemetry/batch): limites por requisição.
+# Se a Central não tiver o endpoint (404/405), volta ao reenvio item a item.
+BATCH_INGEST_ENABLED = os.getenv("NODE_BATCH_INGEST", "true").lower() in ("1", "true", "yes")
+BATCH_MAX_ITEMS = int(os.getenv("NODE_BATCH_MAX_ITEMS", "50"))
+BATCH_MAX_BYTES = int(os.getenv("NODE_BATCH_MAX_BYTES", str(512 * 1024)))
+BATCH_FALLBACK_STATUS = (404, 405)
 
 NODE_VERSION = "1.2.1-debug"
 # Variáveis de Controle de Intervalo (Podem ser atualizadas pela Policy)
@@ -69,6 +109,55 @@ NODE_HEARTBEAT_INTERVAL = int(os.getenv("NODE_HEARTBEAT_INTERVAL", "60"))
 NODE_COLLECTION_INTERVAL = int(os.getenv("NODE_INTERVAL_SECONDS", "30"))
 NODE_UUID = None # Será preenchido no registro
 
+# Scheduler assíncrono: cada tarefa (heartbeat, coleta, upload) tem a própria cadência,
+# com jitter de +/- NODE_JITTER_RATIO para evitar que vários NODEs sincronizem.
+NODE_JITTER_RATIO = float(os.getenv("NODE_JITTER_RATIO", "0.1"))
+NODE_REGISTER_RETRY = 10
+# Backoff do upload enquanto a Central estiver indisponível
+NODE_UPLOAD_RETRY_MIN = 5
+NODE_UPLOAD_RETRY_MAX = 60
+UPLOAD_FAILING = False
+# Pool próprio para as chamadas bloqueantes (rede, cifra, disco): no shutdown,
+# cancelar a tarefa asyncio não interrompe a thread; o pool é aguardado antes
+# de fechar o buffer e a sessão HTTP.
+BLOCKING_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="guardian-node")
+
+# Transporte binário (application/octet-stream, sem base64). Se a Central não
+# suportar (HTTP 415/422), o NODE volta ao envelope JSON/base64 até reiniciar.
+# Cliente HTTP com sessão persistente (keep-alive) e timeouts por endpoint
+CENTRAL_CLIENT = CentralClient(CENTRAL_URL, AUTH_TOKEN)
+
+BINARY_TRANSPORT_ENABLED = os.getenv("NODE_BINARY_TRANSPORT", "true").lower() in ("1", "true", "yes")
+BINARY_FALLBACK_STATUS = (415, 422)
+
+# Compressão antes da cifra: auto (zstd se instalado, senão gzip), zstd, gzip ou none.
+# Payloads menores que NODE_COMPRESS_MIN_BYTES seguem sem compressão.
+try:
+    NODE_COMPRESSION = resolve_codec(os.getenv("NODE_COMPRESSION", "auto"))
+except ValueError as e:
+    logger.warning(f"[COMPRESSÃO] {e}. Enviando sem compressão.")
+    NODE_COMPRESSION = None
+NODE_COMPRESS_MIN_BYTES = int(os.getenv("NODE_COMPRESS_MIN_BYTES", "1024"))
+
+# Polling de dispositivos (SNMP/ICMP). Sem arquivo de dispositivos, só as métricas locais.
+NODE_DEVICES_FILE = os.getenv("NODE_DEVICES_FILE", "/app/devices.json")
+
+def load_device_poller():
+    if not os.path.exists(NODE_DEVICES_FILE):
+        logger.info(f"[POLLER] {NODE_DEVICES_FILE} não encontrado. Polling de dispositivos desativado.")
+        return None
+    try:
+        poller = DevicePoller.from_file(NODE_DEVICES_FILE)
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"[POLLER] Configuração de dispositivos inválida ({NODE_DEVICES_FILE}): {e}")
+        return None
+    logger.info(f"[POLLER] {len(poller.devices)} dispositivos carregados (concorrência {poller.concurrency}).")
+    return poller
+
+DEVICE_POLLER = load_device_poller()
+# Último bloco agregado do poller (repetido nos ciclos sem dispositivos vencidos)
+LAST_DEVICES = None
+
 # Healthcheck File Path
 HEALTH_FILE = "/tmp/guardian_node_health"
 
@@ -82,10 +171,11 @@ def update_health_file():
 
 def collect_metrics():
     """
-    Simula a coleta de métricas de rede local.
+    Coleta as métricas locais do host do NODE.
     
-    Realiza varreduras simuladas em dispositivos de rede (Switches, Roteadores).
-    Em produção, utilizaria bibliotecas SNMP (pysnmp) e ICMP.
+    Os dispositivos de rede (Switches, Roteadores) são consultados via SNMP/ICMP
+    pelo DevicePoller (collect_devices), que substitui os valores de rede; sem
+    dispositivos configurados, os valores de rede são simulados.
     
     Returns:
         dict: Dicionário contendo as métricas coletadas.
@@ -128,7 +218,7 @@ def collect_metrics():
 
 def encrypt_payload(data):
     """
-    Realiza o 'Data Scrubbing' e Criptografia AES-256-GCM.
+    Realiza o 'Data Scrubbing', Compressão (opcional) e Criptografia AES-256-GCM.
     
     Esta função implementa a camada de transporte seguro (Secure Communication Layer).
     
@@ -136,38 +226,18 @@ def encrypt_payload(data):
         data (dict): Dados em texto claro.
         
     Returns:
-        str: Payload criptografado em Base64 (Nonce + Ciphertext + Tag).
+        Envelope: key-id + frame binário (Nonce + Ciphertext + Tag).
+                  Envelope.to_text() gera a forma Base64 para transporte JSON.
     """
     if not GUARDIAN_SECRET_KEY:
         raise ValueError("GUARDIAN_SECRET_KEY não definida. Abortando operação insegura.")
 
     try:
-        # Converter chave de Hex para Bytes
-        key = bytes.fromhex(GUARDIAN_SECRET_KEY)
-        
-        # Preparar dados
-        json_str = json.dumps(data)
-        data_bytes = json_str.encode('utf-8')
-        
-        # AES-GCM requer um Nonce (Number used ONCE) único por mensagem
-        # Recomendação NIST: 12 bytes (96 bits) para GCM
-        nonce = os.urandom(12)
-        
-        # Inicializar cifra
-        aesgcm = AESGCM(key)
-        
-        # Criptografar
-        # O método encrypt retorna o ciphertext com a tag de autenticação anexada ao final
-        ciphertext = aesgcm.encrypt(nonce, data_bytes, None)
-        
-        # Concatenar Nonce + Ciphertext (que já inclui a Tag)
-        # Necessário enviar o Nonce para que o receptor possa descriptografar
-        full_payload = nonce + ciphertext
-        
-        # Codificar em Base64 para transporte seguro via JSON
-        encrypted_b64 = base64.b64encode(full_payload).decode('utf-8')
-        
-        return encrypted_b64
+        # AES-GCM com Nonce único de 12 bytes por mensagem (Recomendação NIST)
+        # O envelope leva Nonce + Ciphertext (com a Tag de autenticação anexada);
+        # a codificação (binário ou Base64/JSON) é decidida no envio.
+        # Compress-then-encrypt: o codec usado (se houver) fica registrado no envelope.
+        return KEYRING.seal_envelope(data, codec=NODE_COMPRESSION, compress_min_bytes=NODE_COMPRESS_MIN_BYTES)
         
     except Exception as e:
         logger.critical(f"[ERRO CRÍTICO] Falha na criptografia: {e}")
@@ -181,42 +251,44 @@ def decrypt_payload(encrypted_b64):
     if not GUARDIAN_SECRET_KEY:
          raise Exception("Server Security Configuration Error")
 
-    key = bytes.fromhex(GUARDIAN_SECRET_KEY)
-    aesgcm = AESGCM(key)
-    full_payload = base64.b64decode(encrypted_b64)
-
-    if len(full_payload) < 28:
-            raise ValueError("Payload too short")
-
-    nonce = full_payload[:12]
-    ciphertext_with_tag = full_payload[12:]
-    
-    decrypted_bytes = aesgcm.decrypt(nonce, ciphertext_with_tag, None)
-    return json.loads(decrypted_bytes.decode('utf-8'))
+    return KEYRING.open(encrypted_b64)
 
 def send_to_central(encrypted_payload, endpoint_suffix="ingest/telemetry"):
     """
     Tenta enviar um payload criptografado para a Central.
     
+    Usa o corpo binário (application/octet-stream) quando habilitado; se a
+    Central responder 415/422, desabilita o modo binário e reenvia em JSON/base64.
+
     Args:
-        encrypted_payload (str): Payload Base64 criptografado.
+        encrypted_payload (Envelope | str): Envelope cifrado (str = Base64 legado).
         endpoint_suffix (str): Sufixo da URL (ex: 'ingest/telemetry' ou 'ingest/heartbeat').
         
     Returns:
         response object se HTTP 200, None caso contrário.
     """
+    global BINARY_TRANSPORT_ENABLED
+
     try:
-        # Reconstrói a URL baseada na CENTRAL_URL configurada (assume que a env var aponta para a raiz ou endpoint padrão)
-        # Se CENTRAL_URL for 'http://api.com/ingest/telemetry', extraímos a base.
-        # Simplificação: Vamos assumir que CENTRAL_URL é a base ou ajustamos aqui.
-        
-        # Lógica de fallback robusta:
-        base_url = CENTRAL_URL.split("/ingest")[0]
-        target_url = f"{base_url}/{endpoint_suffix}"
-        
-        headers = {"Authorization": f"Bearer {AUTH_TOKEN}"} if AUTH_TOKEN else {}
-        # Timeout curto para evitar travamento do loop se a rede estiver instável
-        response = requests.post(target_url, json={"payload": encrypted_payload}, headers=headers, timeout=5)
+        # A URL base e o token vêm do CENTRAL_CLIENT (sessão persistente);
+        # o timeout (connect, read) depende do endpoint
+        response = None
+        if BINARY_TRANSPORT_ENABLED and isinstance(encrypted_payload, Envelope):
+            binary_headers = {"Content-Type": BINARY_CONTENT_TYPE}
+            if encrypted_payload.key_id:
+                binary_headers[KEY_ID_HEADER] = encrypted_payload.key_id
+            if encrypted_payload.codec:
+                binary_headers[CODEC_HEADER] = encrypted_payload.codec
+            response = CENTRAL_CLIENT.post(endpoint_suffix, data=encrypted_payload.frame, headers=binary_headers)
+            if response.status_code in BINARY_FALLBACK_STATUS:
+                logger.warning(f"[TRANSPORTE] Central não aceita envelope binário ({response.status_code}). Usando JSON/base64.")
+                BINARY_TRANSPORT_ENABLED = False
+                response = None
+
+        if response is None:
+            if isinstance(encrypted_payload, Envelope):
+                encrypted_payload = encrypted_payload.to_text()
+            response = CENTRAL_CLIENT.post(endpoint_suffix, json={"payload": encrypted_payload})
         
         if response.status_code == 200:
             return response
@@ -295,54 +367,230 @@ def send_heartbeat():
             "node_id": NODE_ID,
             "timestamp": time.time(),
             "version": NODE_VERSION,
-            "buffer_status": "active" if len(local_buffer) > 0 else "inactive",
-            "buffer_size": len(local_buffer)
+            # "active" só quando o envio está falhando (itens em trânsito normal não contam)
+            "buffer_status": "active" if UPLOAD_FAILING and len(local_buffer) > 0 else "inactive",
+            "buffer_size": len(local_buffer),
+            "buffer_bytes": local_buffer.pending_bytes,
+            # Contadores de banda (bytes antes/depois da compressão)
+            "transfer": KEYRING.stats.snapshot(),
+            # Latência HTTP por endpoint (sessão keep-alive)
+            "http": CENTRAL_CLIENT.latency_summary()
         }
         
         encrypted_hb = encrypt_payload(hb_payload)
         
         if send_to_central(encrypted_hb, endpoint_suffix="ingest/heartbeat"):
             logger.info(f"[HEARTBEAT] ❤️  Sinal enviado com sucesso.")
+            transfer = hb_payload["transfer"]
+            logger.info(f"[BANDA] Enviados {transfer['sealed_raw_bytes']} bytes JSON -> {transfer['sealed_wire_bytes']} bytes cifrados (razão {transfer['sealed_ratio']})")
         else:
             logger.warning(f"[HEARTBEAT] 💔 Falha no envio (sem buffer).")
             
     except Exception as e:
         logger.error(f"[HEARTBEAT ERROR] {e}")
 
+def send_batch_to_central(items):
+    """
+    Envia um lote de envelopes para /ingest/telemetry/batch.
+
+    Args:
+        items (list[Envelope | str]): Envelopes cifrados, em ordem cronológica.
+
+    Returns:
+        list[dict] com o resultado de cada item (stored/invalid/failed) se HTTP 200,
+        None caso contrário.
+    """
+    global BATCH_INGEST_ENABLED
+    try:
+        body = {"items": [item.to_text() if isinstance(item, Envelope) else item for item in items]}
+
+        response = CENTRAL_CLIENT.post("ingest/telemetry/batch", json=body)
+
+        if response.status_code == 200:
+            return response.json().get("results", [])
+        if response.status_code in BATCH_FALLBACK_STATUS:
+            logger.warning(f"[RETRY] Central sem suporte a ingest em lote ({response.status_code}). Reenviando item a item.")
+            BATCH_INGEST_ENABLED = False
+        else:
+            logger.warning(f"[ERRO HTTP] Central (ingest/telemetry/batch) retornou: {response.status_code} - {response.text}")
+        return None
+
+    except Exception as e:
+        logger.error(f"[FALHA DE CONEXÃO] Erro ao conectar em ingest/telemetry/batch: {e}")
+        return None
+
+def next_batch():
+    """Itens do início do buffer que cabem em um lote (BATCH_MAX_ITEMS / BATCH_MAX_BYTES)."""
+    # No JSON o frame vai em base64 (~4/3 do tamanho binário)
+    records = local_buffer.peek(BATCH_MAX_ITEMS, BATCH_MAX_BYTES * 3 // 4)
+    return [decode_buffer_item(record) for record in records]
+
 def flush_buffer():
     """
     Tenta esvaziar o buffer local reenviando os itens armazenados.
     Deve ser chamado quando a conexão com a Central parece estar saudável.
+
+    Os itens vão em lotes limitados por quantidade e tamanho; cada lote é uma
+    única requisição (e uma única escrita em lote na Central).
+
+    Returns:
+        bool: True se o buffer ficou vazio.
     """
     if not local_buffer:
-        return
+        return True
 
-    logger.info(f"[RETRY] Tentando reenviar {len(local_buffer)} itens do buffer...")
+    logger.info(f"[UPLOAD] Enviando {len(local_buffer)} itens do buffer...")
     
-    # Tentamos enviar todos os itens acumulados
     # Se falhar no meio, paramos para tentar novamente no próximo ciclo
     # Isso evita perder tempo se a conexão cair novamente
     count = 0
-    while local_buffer:
+    dropped = 0
+    while local_buffer and BATCH_INGEST_ENABLED:
+        batch = next_batch()
+        results = send_batch_to_central(batch)
+        if results is None:
+            break
+
+        statuses = {r.get("index"): r.get("status") for r in results}
+        # Confirma (commit) o prefixo de itens resolvidos (gravados ou rejeitados em
+        # definitivo); a partir do primeiro item com falha temporária, tudo é reenviado
+        resolved = 0
+        for index in range(len(batch)):
+            status = statuses.get(index, "failed")
+            if status == "stored":
+                count += 1
+            elif status == "invalid":
+                dropped += 1
+            else:
+                break
+            resolved += 1
+        local_buffer.commit(resolved)
+
+        if resolved < len(batch):
+            logger.warning(f"[RETRY FALHOU] {len(batch) - resolved} itens do lote falharam. Restam {len(local_buffer)} itens.")
+            break
+
+    # Fallback: Central sem o endpoint de lote
+    while local_buffer and not BATCH_INGEST_ENABLED:
         # Pega o item mais antigo (FIFO) sem remover ainda
-        payload = local_buffer[0]
+        payload = decode_buffer_item(local_buffer.peek(1)[0])
         
         if send_to_central(payload, endpoint_suffix="ingest/telemetry"):
-            # Se sucesso, remove do buffer
-            local_buffer.popleft()
+            # Se sucesso, remove do buffer (commit do offset em disco)
+            local_buffer.commit(1)
             count += 1
         else:
             # Se falhou, interrompe o flush e mantém no buffer
             logger.warning(f"[RETRY FALHOU] Parando reenvio. Restam {len(local_buffer)} itens.")
             break
             
+    if dropped > 0:
+        logger.warning(f"[RETRY] {dropped} itens rejeitados pela Central (inválidos) e descartados.")
     if count > 0:
         logger.info(f"[RETRY SUCESSO] {count} itens reenviados e removidos do buffer.")
+    return not local_buffer
+
+async def run_blocking(func, *args):
+    """Executa func(*args) no BLOCKING_EXECUTOR sem bloquear o event loop."""
+    return await asyncio.wrap_future(BLOCKING_EXECUTOR.submit(func, *args))
+
+def with_jitter(interval):
+    """Intervalo com jitter aleatório de +/- NODE_JITTER_RATIO."""
+    return max(interval * random.uniform(1 - NODE_JITTER_RATIO, 1 + NODE_JITTER_RATIO), 0.1)
+
+async def health_file_task():
+    """Sinal de vida para o healthcheck do Docker, independente das chamadas de rede."""
+    while True:
+        update_health_file()
+        await asyncio.sleep(30)
+
+async def heartbeat_task():
+    """Heartbeat na cadência da policy; roda em thread própria e nunca espera pelo upload."""
+    while True:
+        await run_blocking(send_heartbeat)
+        await asyncio.sleep(with_jitter(NODE_HEARTBEAT_INTERVAL))
+
+async def collect_devices(metrics):
+    """
+    Executa um ciclo do DevicePoller e anexa o bloco agregado ao payload.
+    Com o poller configurado, o bloco "network" reflete apenas os dispositivos reais:
+    ciclos sem dispositivos vencidos repetem o último bloco agregado (polled_at indica
+    a idade) e, sem medição, latência/perda/banda seguem como None (nunca simuladas).
+    """
+    global LAST_DEVICES
+    devices = await DEVICE_POLLER.poll_cycle()
+    if devices["polled"]:
+        devices["polled_at"] = time.time()
+        LAST_DEVICES = devices
+        logger.info(f"[POLLER] {devices['up']}/{devices['polled']} dispositivos UP em {devices['cycle_ms']} ms")
+
+    network = metrics["network"]
+    network["latency_ms"] = None
+    network["packet_loss"] = None
+    network["bandwidth_usage_mbps"] = None
+    if LAST_DEVICES is not None:
+        metrics["devices"] = LAST_DEVICES
+        network["latency_ms"] = LAST_DEVICES["avg_rtt_ms"]
+        network["packet_loss"] = LAST_DEVICES["packet_loss"]
+        if LAST_DEVICES["up"] == 0:
+            # Todos os dispositivos consultados sem resposta (SNMP e ICMP)
+            network["packet_loss"] = 100.0
+    return metrics
+
+async def collection_task(upload_wakeup):
+    """Coleta, criptografa e grava no buffer em disco; o envio fica com o upload_task."""
+    while True:
+        try:
+            raw_data = await run_blocking(collect_metrics)
+            if DEVICE_POLLER is not None:
+                raw_data = await collect_devices(raw_data)
+            # Processamento e Segurança (Data Scrubbing)
+            secure_payload = await run_blocking(encrypt_payload, raw_data)
+            # Store & Forward: todo item passa pelo buffer persistente
+            await run_blocking(local_buffer.append, encode_buffer_item(secure_payload))
+            upload_wakeup.set()
+        except Exception as e:
+            logger.error(f"[COLETA ERROR] Erro no ciclo de coleta: {e}")
+        await asyncio.sleep(with_jitter(NODE_COLLECTION_INTERVAL))
 
-def main_loop():
+async def upload_task(upload_wakeup):
     """
-    Loop principal do serviço NODE.
-    Executa ciclicamente a coleta e envio de dados, além do heartbeat.
+    Esvazia o buffer quando há itens novos; com a Central indisponível,
+    tenta novamente com backoff exponencial (com jitter).
+    """
+    global UPLOAD_FAILING
+    retry_delay = NODE_UPLOAD_RETRY_MIN
+    while True:
+        if UPLOAD_FAILING:
+            try:
+                await asyncio.wait_for(upload_wakeup.wait(), timeout=with_jitter(retry_delay))
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await upload_wakeup.wait()
+        upload_wakeup.clear()
+
+        try:
+            drained = await run_blocking(flush_buffer)
+        except Exception as e:
+            logger.error(f"[UPLOAD ERROR] {e}")
+            drained = False
+
+        if drained:
+            if UPLOAD_FAILING:
+                logger.info("[UPLOAD] Central disponível novamente. Buffer esvaziado.")
+            UPLOAD_FAILING = False
+            retry_delay = NODE_UPLOAD_RETRY_MIN
+        else:
+            if UPLOAD_FAILING:
+                retry_delay = min(retry_delay * 2, NODE_UPLOAD_RETRY_MAX)
+            UPLOAD_FAILING = True
+
+async def main_loop():
+    """
+    Loop principal do serviço NODE (asyncio).
+    Registro, depois tarefas independentes de heartbeat, coleta e upload,
+    canceladas de forma ordenada no SIGTERM/SIGINT.
     """
     logger.info(f"Iniciando Guardian NODE {NODE_ID} (v{NODE_VERSION})...")
     
@@ -352,77 +600,57 @@ def main_loop():
     else:
         logger.critical("[SECURITY ERROR] GUARDIAN_SECRET_KEY não definida!")
 
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass # Windows: KeyboardInterrupt encerra o asyncio.run
+
     # ==============================================================================
     # Fase de Registro (Lifecycle: STARTUP)
     # ==============================================================================
     # O Node não deve iniciar coletas até ser registrado e receber a policy.
-    while not register_node():
-        retry_delay = 10
-        logger.warning(f"[REGISTER] Falha ao registrar. Retry em {retry_delay}s...")
-        time.sleep(retry_delay)
-    
-    logger.info(f"Buffer Local Configurado: Máximo {BUFFER_MAX_SIZE} itens (FIFO)")
-    
-    # Usa variável global atualizada pelo registro
-    # collection_interval = int(os.getenv("NODE_INTERVAL_SECONDS", "30")) # REMOVIDO EM FAVOR DA POLICY
-    
-    last_collection_time = 0
-    last_heartbeat_time = 0
-    
-    while True:
+    while not await run_blocking(register_node):
+        update_health_file()
+        logger.warning(f"[REGISTER] Falha ao registrar. Retry em {NODE_REGISTER_RETRY}s...")
         try:
-            # Healthcheck Signal
-            update_health_file()
+            await asyncio.wait_for(stop_event.wait(), timeout=with_jitter(NODE_REGISTER_RETRY))
+            logger.info("Parando serviço NODE...")
+            return
+        except asyncio.TimeoutError:
+            pass
+    
+    logger.info(f"Buffer Local Configurado: {BUFFER_DIR} (máximo {BUFFER_MAX_BYTES} bytes, FIFO). Pendentes: {len(local_buffer)} itens")
 
-            now = time.time()
-            
-            # -------------------------------------------------------
-            # TAREFA 1: Heartbeat (Prioridade Alta)
-            # -------------------------------------------------------
-            if now - last_heartbeat_time >= NODE_HEARTBEAT_INTERVAL:
-                send_heartbeat()
-                last_heartbeat_time = now
-            
-            # -------------------------------------------------------
-            # TAREFA 2: Coleta de Métricas
-            # -------------------------------------------------------
-            if now - last_collection_time >= NODE_COLLECTION_INTERVAL:
-                # 1. Coleta
-                raw_data = collect_metrics()
-                
-                # 2. Processamento e Segurança (Data Scrubbing)
-                secure_payload = encrypt_payload(raw_data)
-                
-                # 3. Envio (Outbound Only) com Buffer Strategy (Store & Forward)
-                
-                # Se o buffer já tem itens, adicionamos o novo ao final para manter ordem cronológica
-                if len(local_buffer) > 0:
-                    logger.info(f"[BUFFERING] Adicionando novo item ao buffer (Fila: {len(local_buffer)})")
-                    local_buffer.append(secure_payload)
-                    # Tenta esvaziar (Store & Forward)
-                    flush_buffer()
-                    
-                else:
-                    # Se buffer vazio, tenta envio direto (Fast Path)
-                    logger.debug(f"[TUNNEL] Enviando payload seguro para {CENTRAL_URL}...")
-                    if send_to_central(secure_payload, endpoint_suffix="ingest/telemetry"):
-                        logger.info(f"[SUCESSO] Dado enviado em tempo real.")
-                    else:
-                        # Falha no envio direto -> Armazena no buffer
-                        logger.warning(f"[FALHA] Armazenando no buffer local para reenvio futuro.")
-                        local_buffer.append(secure_payload)
-                
-                last_collection_time = now
+    # As cadências (NODE_HEARTBEAT_INTERVAL / NODE_COLLECTION_INTERVAL) vêm da policy de registro
+    upload_wakeup = asyncio.Event()
+    if local_buffer:
+        upload_wakeup.set() # Replay: itens pendentes de uma execução anterior
 
-            # Tick do Loop (Sleep curto para responsividade)
-            time.sleep(1)
-            
-        except KeyboardInterrupt:
-            logger.info("Parando serviço NODE...")
-            break
-        except Exception as e:
-            logger.error(f"Erro no ciclo de monitoramento: {e}")
-            time.sleep(5)
+    tasks = [
+        asyncio.create_task(health_file_task(), name="health-file"),
+        asyncio.create_task(heartbeat_task(), name="heartbeat"),
+        asyncio.create_task(collection_task(upload_wakeup), name="collection"),
+        asyncio.create_task(upload_task(upload_wakeup), name="upload"),
+    ]
+
+    await stop_event.wait()
+    logger.info("Parando serviço NODE...")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # O cancelamento não interrompe threads já em execução (ex.: um append no buffer):
+    # aguarda as chamadas em andamento antes de fechar buffer e sessão
+    await asyncio.get_running_loop().run_in_executor(None, BLOCKING_EXECUTOR.shutdown, True)
+    CENTRAL_CLIENT.close()
+    local_buffer.close()
+    if DEVICE_POLLER is not None:
+        DEVICE_POLLER.close()
 
 if __name__ == "__main__":
-    main_loop()
+    try:
+        asyncio.run(main_loop())
+    except KeyboardInterrupt:
+        logger.info("Parando serviço NODE...")
@@ -0,0 +1,303 @@
+# ==============================================================================
+# NOC - Guardian NODE: Buffer Persistente em Disco (Store & Forward)
+# ==============================================================================
+# Log segmentado append-only: os envelopes cifrados são gravados em arquivos de
+# segmento (segment-<seq>.log) e sobrevivem a um restart do container.
+#
+# Registro: [tamanho u32][crc32 u32][dados]  (little-endian)
+# Offset de commit: arquivo "commit.offset" ("<seq> <offset>"), gravado de forma
+# atômica (tmp + fsync + rename). Tudo antes dele já foi entregue à Central.
+# Rename, criação e remoção de segmentos só são duráveis após o fsync do diretório.
+#
+# No startup os segmentos são revalidados a partir do commit (replay); um
+# registro incompleto ou com CRC inválido (crash no meio da escrita) é truncado.
+# A capacidade é limitada em bytes: ao estourar, os segmentos mais antigos são
+# descartados inteiros (política FIFO, como o deque anterior).
+# ==============================================================================
+
+import os
+import struct
+import zlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("guardian-node")
+
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+COMMIT_FILE = "commit.offset"
+
+
+class DiskQueue:
+    """
+    Fila FIFO persistente. Leitura em duas fases: peek() lê sem consumir e
+    commit(n) confirma os n primeiros itens lidos (após a entrega).
+    Thread-safe (um único processo).
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024,
+                 segment_bytes: int = 4 * 1024 * 1024, fsync: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Ao menos 4 segmentos na capacidade total: descarte por segmento não perde demais
+        self.segment_bytes = max(min(segment_bytes, max_bytes // 4), 4096)
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._segments: List[int] = []
+        # Registros e bytes pendentes (após o commit) por segmento
+        self._counts: Dict[int, int] = {}
+        self._sizes: Dict[int, int] = {}
+        self._commit: Tuple[int, int] = (1, 0)
+        self._peeked: List[Tuple[int, int]] = []
+        self._writer = None
+        self.stats = {"appended": 0, "committed": 0, "dropped": 0, "truncated_bytes": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # --------------------------------------------------------------------------
+    # API
+    # --------------------------------------------------------------------------
+    def append(self, data: bytes):
+        """Grava um item no final da fila (durável ao retornar, se fsync=True)."""
+        record = RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+        with self._lock:
+            active = self._segments[-1]
+            segment_size = self._writer.tell()
+            if segment_size > 0 and segment_size + len(record) > self.segment_bytes:
+                active = self._roll()
+            self._writer.write(record)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self._sizes[active] += len(record)
+            self._counts[active] += 1
+            self.stats["appended"] += 1
+            self._enforce_capacity()
+
+    def peek(self, max_items: int, max_bytes: Optional[int] = None) -> List[bytes]:
+        """
+        Lê até max_items itens (e até max_bytes, sempre ao menos um) a partir do
+        commit, sem consumi-los.
+        """
+        with self._lock:
+            items: List[bytes] = []
+            self._peeked = []
+            total = 0
+            seq, offset = self._commit
+            for segment in self._segments:
+                if segment < seq:
+                    continue
+                start = offset if segment == seq else 0
+                with open(self._segment_path(segment), "rb") as f:
+                    f.seek(start)
+                    position = start
+                    while len(items) < max_items:
+                        record = self._read_record(f)
+                        if record is None:
+                            break
+                        if items and max_bytes is not None and total + len(record) > max_bytes:
+                            return items
+                        position += RECORD_HEADER.size + len(record)
+                        items.append(record)
+                        self._peeked.append((segment, position))
+                        total += len(record)
+                if len(items) >= max_items:
+                    break
+            return items
+
+    def commit(self, count: int):
+        """Confirma a entrega dos `count` primeiros itens do último peek()."""
+        with self._lock:
+            # O peek pode ter sido invalidado por um descarte de capacidade no meio da entrega
+            count = min(count, len(self._peeked))
+            if count <= 0:
+                return
+            seq, offset = self._peeked[count - 1]
+            consumed = self._peeked[:count]
+            self._peeked = []
+            for segment, _ in consumed:
+                self._counts[segment] -= 1
+            # Bytes consumidos no segmento inicial e nos segmentos que ficaram para trás
+            old_seq, old_offset = self._commit
+            for segment in list(self._segments):
+                if segment > seq:
+                    break
+                start = old_offset if segment == old_seq else 0
+                end = offset if segment == seq else self._segment_file_size(segment)
+                self._sizes[segment] -= end - start
+            self._commit = (seq, offset)
+            self.stats["committed"] += count
+            self._write_commit()
+            self._delete_consumed_segments()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+    @property
+    def pending_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # --------------------------------------------------------------------------
+    # Recuperação (Replay no startup)
+    # --------------------------------------------------------------------------
+    def _recover(self):
+        self._segments = sorted(
+            int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        self._commit = self._read_commit()
+        commit_seq, commit_offset = self._commit
+
+        for segment in list(self._segments):
+            if segment < commit_seq:
+                # Já entregue (crash entre o commit e a remoção do arquivo)
+                os.remove(self._segment_path(segment))
+                self._segments.remove(segment)
+                continue
+            start = commit_offset if segment == commit_seq else 0
+            self._counts[segment], valid_end = self._scan_segment(segment, start)
+            self._sizes[segment] = valid_end - start
+
+        if not self._segments:
+            self._segments.append(commit_seq)
+            self._counts[commit_seq] = 0
+            self._sizes[commit_seq] = 0
+            if commit_offset:
+                # Commit aponta para um segmento que não existe mais: recomeça do zero
+                self._commit = (commit_seq, 0)
+                self._write_commit()
+        elif commit_seq not in self._segments:
+            self._commit = (self._segments[0], 0)
+            self._write_commit()
+
+        self._writer = open(self._segment_path(self._segments[-1]), "ab")
+        # Segmentos removidos/criado acima
+        self._fsync_directory()
+        pending = len(self)
+        if pending:
+            logger.info(f"[BUFFER] Replay: {pending} itens pendentes em disco ({self.pending_bytes} bytes, {len(self._segments)} segmentos)")
+
+    def _scan_segment(self, segment: int, start: int) -> Tuple[int, int]:
+        """Valida os registros a partir de `start`; trunca o segmento no primeiro registro inválido."""
+        path = self._segment_path(segment)
+        size = os.path.getsize(path)
+        count = 0
+        position = start
+        with open(path, "rb") as f:
+            f.seek(start)
+            while True:
+                record = self._read_record(f)
+                if record is None:
+                    break
+                count += 1
+                position += RECORD_HEADER.size + len(record)
+        if position < size:
+            logger.warning(f"[BUFFER] Segmento {segment}: {size - position} bytes corrompidos/incompletos descartados")
+            self.stats["truncated_bytes"] += size - position
+            with open(path, "r+b") as f:
+                f.truncate(position)
+        return count, position
+
+    @staticmethod
+    def _read_record(f) -> Optional[bytes]:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        length, crc = RECORD_HEADER.unpack(header)
+        data = f.read(length)
+        if len(data) < length or zlib.crc32(data) != crc:
+            return None
+        return data
+
+    # --------------------------------------------------------------------------
+    # Segmentos e Commit
+    # --------------------------------------------------------------------------
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _segment_file_size(self, segment: int) -> int:
+        return os.path.getsize(self._segment_path(segment))
+
+    def _roll(self) -> int:
+        self._writer.close()
+        segment = self._segments[-1] + 1
+        self._segments.append(segment)
+        self._counts[segment] = 0
+        self._sizes[segment] = 0
+        self._writer = open(self._segment_path(segment), "ab")
+        self._fsync_directory()
+        return segment
+
+    def _enforce_capacity(self):
+        # Descarta os segmentos mais antigos (inteiros) até caber na capacidade
+        while self.pending_bytes > self.max_bytes:
+            if len(self._segments) == 1:
+                self._roll()
+            oldest = self._segments[0]
+            dropped = self._counts[oldest]
+            self.stats["dropped"] += dropped
+            logger.warning(f"[BUFFER] Capacidade ({self.max_bytes} bytes) excedida: {dropped} itens mais antigos descartados")
+            self._counts[oldest] = 0
+            self._sizes[oldest] = 0
+            self._commit = (self._segments[1], 0)
+            self._peeked = []
+            self._write_commit()
+            self._delete_consumed_segments()
+
+    def _delete_consumed_segments(self):
+        commit_seq = self._commit[0]
+        removed = False
+        while len(self._segments) > 1 and self._segments[0] < commit_seq:
+            segment = self._segments.pop(0)
+            self._counts.pop(segment, None)
+            self._sizes.pop(segment, None)
+            try:
+                os.remove(self._segment_path(segment))
+                removed = True
+            except FileNotFoundError:
+                pass
+        if removed:
+            self._fsync_directory()
+
+    def _read_commit(self) -> Tuple[int, int]:
+        path = os.path.join(self.directory, COMMIT_FILE)
+        try:
+            with open(path) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except (FileNotFoundError, ValueError):
+            return (self._segments[0] if self._segments else 1), 0
+
+    def _write_commit(self):
+        path = os.path.join(self.directory, COMMIT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{self._commit[0]} {self._commit[1]}\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_directory()
+
+    def _fsync_directory(self):
+        """Torna duráveis as entradas do diretório (rename do commit, criação/remoção de segmentos)."""
+        # Windows não permite abrir diretórios com os.open (nem precisa deste fsync)
+        if not self.fsync or os.name == "nt":
+            return
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,203 @@
+# ==============================================================================
+# NOC - Guardian NODE: Motor de Polling de Dispositivos (SNMP + ICMP)
+# ==============================================================================
+# Consulta switches/roteadores do cliente em paralelo, com concorrência limitada,
+# timeout por dispositivo e intervalo próprio de cada dispositivo. A cada ciclo
+# de coleta, os dispositivos vencidos são consultados e o resultado é agregado
+# em um único bloco do payload de telemetria.
+#
+# Configuração (NODE_DEVICES_FILE, JSON):
+#   {"defaults": {"community": "public", "interval": 60, "timeout": 2},
+#    "devices": [{"name": "core-sw-01", "host": "10.0.0.1", "icmp": true,
+#                 "oids": {"sys_uptime": "1.3.6.1.2.1.1.3.0"}}]}
+# ==============================================================================
+
+import os
+import re
+import json
+import time
+import socket
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from snmp import SnmpClient, SnmpError
+
+logger = logging.getLogger("guardian-node")
+
+NODE_POLL_CONCURRENCY = int(os.getenv("NODE_POLL_CONCURRENCY", "64"))
+
+DEFAULT_OIDS = {
+    "sys_uptime": "1.3.6.1.2.1.1.3.0",
+    "sys_name": "1.3.6.1.2.1.1.5.0",
+}
+DEVICE_DEFAULTS = {
+    "port": 161,
+    "community": "public",
+    "interval": 60,
+    "timeout": 2.0,
+    "retries": 1,
+    "icmp": True,
+    "snmp": True,
+}
+PING_RTT_PATTERN = re.compile(r"time[=<]\s*([\d.]+)\s*ms")
+
+
+class Device:
+    """Dispositivo monitorado e o seu agendamento."""
+
+    __slots__ = ("name", "host", "port", "community", "oids", "interval", "timeout", "retries",
+                 "icmp", "snmp", "next_due", "address")
+
+    def __init__(self, name: str, host: str, port: int = 161, community: str = "public",
+                 oids: Optional[Dict[str, str]] = None, interval: float = 60, timeout: float = 2.0,
+                 retries: int = 1, icmp: bool = True, snmp: bool = True):
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.community = community
+        self.oids = dict(oids or DEFAULT_OIDS)
+        self.interval = float(interval)
+        self.timeout = float(timeout)
+        self.retries = int(retries)
+        self.icmp = icmp
+        self.snmp = snmp
+        self.next_due = 0.0
+        self.address: Optional[Tuple[str, int]] = None
+
+
+async def ping(host: str, timeout: float) -> Optional[float]:
+    """ICMP echo via utilitário `ping` (não exige root). Retorna o RTT em ms ou None."""
+    process = await asyncio.create_subprocess_exec(
+        "ping", "-n", "-c", "1", "-W", str(max(int(round(timeout)), 1)), host,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout + 1)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+    if process.returncode != 0:
+        return None
+    match = PING_RTT_PATTERN.search(stdout.decode("utf-8", "replace"))
+    return float(match.group(1)) if match else None
+
+
+class DevicePoller:
+    """
+    Polling concorrente de dispositivos: um socket SNMP compartilhado, um semáforo
+    para limitar o paralelismo e um prazo (next_due) por dispositivo.
+    """
+
+    def __init__(self, devices: List[Device], concurrency: int = NODE_POLL_CONCURRENCY,
+                 snmp_client: Optional[SnmpClient] = None):
+        self.devices = devices
+        self.concurrency = concurrency
+        self.snmp_client = snmp_client or SnmpClient()
+        self.icmp_available = True
+        self.stats = {"cycles": 0, "polled": 0, "last_cycle_ms": 0.0, "last_devices_per_second": 0.0}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "DevicePoller":
+        with open(path) as f:
+            config = json.load(f)
+        defaults = dict(DEVICE_DEFAULTS, **config.get("defaults", {}))
+        devices = []
+        for entry in config.get("devices", []):
+            options = dict(defaults, **entry)
+            if not options.get("host"):
+                raise ValueError(f"Dispositivo sem 'host': {entry}")
+            options.setdefault("name", options["host"])
+            devices.append(Device(**{k: v for k, v in options.items() if k in Device.__slots__}))
+        return cls(devices, **kwargs)
+
+    def due_devices(self, now: float) -> List[Device]:
+        return [device for device in self.devices if device.next_due <= now]
+
+    async def poll_cycle(self, now: Optional[float] = None) -> Dict:
+        """Consulta os dispositivos vencidos e devolve o bloco agregado do payload."""
+        now = time.time() if now is None else now
+        due = self.due_devices(now)
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(device: Device) -> Dict:
+            async with semaphore:
+                return await self.poll_device(device)
+
+        results = await asyncio.gather(*(bounded(device) for device in due))
+
+        for device in due:
+            device.next_due = now + device.interval
+
+        elapsed = time.perf_counter() - started
+        self.stats["cycles"] += 1
+        self.stats["polled"] += len(due)
+        self.stats["last_cycle_ms"] = round(elapsed * 1000, 2)
+        self.stats["last_devices_per_second"] = round(len(due) / elapsed, 1) if due and elapsed > 0 else 0.0
+        return aggregate_results(results, self.stats["last_cycle_ms"])
+
+    async def poll_device(self, device: Device) -> Dict:
+        """SNMP GET e ICMP em paralelo, ambos limitados pelo timeout do dispositivo."""
+        result = {"name": device.name, "host": device.host, "status": "down", "rtt_ms": None, "snmp": None}
+        try:
+            if device.address is None:
+                infos = await asyncio.get_running_loop().getaddrinfo(
+                    device.host, device.port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+                device.address = infos[0][4]
+        except OSError as e:
+            result["error"] = f"DNS: {e}"
+            return result
+
+        probes = []
+        if device.snmp:
+            probes.append(self._snmp_probe(device))
+        if device.icmp and self.icmp_available:
+            probes.append(self._icmp_probe(device))
+        for probe_result in await asyncio.gather(*probes):
+            result.update(probe_result)
+
+        if result["snmp"] is not None or result["rtt_ms"] is not None:
+            result["status"] = "up"
+        return result
+
+    async def _snmp_probe(self, device: Device) -> Dict:
+        try:
+            values = await self.snmp_client.get(device.address, device.community, list(device.oids.values()),
+                                                timeout=device.timeout / (device.retries + 1),
+                                                retries=device.retries)
+            return {"snmp": {name: values.get(oid) for name, oid in device.oids.items()}}
+        except asyncio.TimeoutError:
+            return {"snmp_error": "timeout"}
+        except (SnmpError, OSError) as e:
+            return {"snmp_error": str(e)}
+
+    async def _icmp_probe(self, device: Device) -> Dict:
+        try:
+            rtt_ms = await ping(device.address[0], device.timeout)
+            return {"rtt_ms": rtt_ms, "icmp_ok": rtt_ms is not None}
+        except FileNotFoundError:
+            logger.warning("[POLLER] Utilitário 'ping' não encontrado. ICMP desativado.")
+            self.icmp_available = False
+            return {}
+
+    def close(self):
+        self.snmp_client.close()
+
+
+def aggregate_results(results: List[Dict], cycle_ms: float) -> Dict:
+    """Bloco "devices" do payload: resumo do ciclo + resultado por dispositivo."""
+    rtts = [r["rtt_ms"] for r in results if r.get("rtt_ms") is not None]
+    icmp_probed = [r for r in results if "icmp_ok" in r]
+    icmp_lost = sum(1 for r in icmp_probed if not r["icmp_ok"])
+    up = sum(1 for r in results if r["status"] == "up")
+    return {
+        "polled": len(results),
+        "up": up,
+        "down": len(results) - up,
+        "cycle_ms": cycle_ms,
+        "avg_rtt_ms": round(sum(rtts) / len(rtts), 2) if rtts else None,
+        "packet_loss": round(100.0 * icmp_lost / len(icmp_probed), 2) if icmp_probed else None,
+        "results": results,
+    }
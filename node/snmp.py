@@ -0,0 +1,269 @@
+# ==============================================================================
+# NOC - Guardian NODE: Cliente SNMPv2c (GET) assíncrono
+# ==============================================================================
+# Implementação mínima de BER/SNMPv2c sem dependências externas: um único socket
+# UDP atende todas as consultas em paralelo, e as respostas são roteadas para a
+# requisição correta pelo request-id. Os mesmos codificadores servem para o
+# responder de teste (scripts/bench_poller.py).
+# ==============================================================================
+
+import asyncio
+import itertools
+import socket
+from typing import Dict, List, Optional, Tuple
+
+SNMP_VERSION_2C = 1
+
+# Tags BER / SNMP
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_IP_ADDRESS = 0x40
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_COUNTER64 = 0x46
+TAG_NO_SUCH_OBJECT = 0x80
+TAG_NO_SUCH_INSTANCE = 0x81
+TAG_END_OF_MIB_VIEW = 0x82
+PDU_GET_REQUEST = 0xA0
+PDU_GET_RESPONSE = 0xA2
+
+UNSIGNED_TAGS = (TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64)
+EXCEPTION_TAGS = (TAG_NO_SUCH_OBJECT, TAG_NO_SUCH_INSTANCE, TAG_END_OF_MIB_VIEW)
+
+
+class SnmpError(Exception):
+    """Resposta SNMP com error-status diferente de zero, ou mensagem malformada."""
+
+
+# ==============================================================================
+# Codificação BER
+# ==============================================================================
+def encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    raw = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def encode_tlv(tag: int, value: bytes) -> bytes:
+    return bytes([tag]) + encode_length(len(value)) + value
+
+
+def encode_integer(value: int, tag: int = TAG_INTEGER) -> bytes:
+    if tag in UNSIGNED_TAGS:
+        raw = value.to_bytes(max((value.bit_length() + 8) // 8, 1), "big")
+    else:
+        raw = value.to_bytes(max((value.bit_length() + 8) // 8, 1), "big", signed=True)
+    return encode_tlv(tag, raw)
+
+
+def encode_oid(oid: str) -> bytes:
+    parts = [int(p) for p in oid.strip(".").split(".")]
+    if len(parts) < 2:
+        raise ValueError(f"OID inválido: {oid!r}")
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return encode_tlv(TAG_OID, bytes(body))
+
+
+def encode_value(value) -> bytes:
+    """None -> NULL, int -> INTEGER, str/bytes -> OCTET STRING, (tag, valor) -> tipo explícito."""
+    if value is None:
+        return encode_tlv(TAG_NULL, b"")
+    if isinstance(value, tuple):
+        tag, raw = value
+        if tag == TAG_IP_ADDRESS:
+            return encode_tlv(tag, socket.inet_aton(raw))
+        if tag in EXCEPTION_TAGS:
+            return encode_tlv(tag, b"")
+        return encode_integer(raw, tag)
+    if isinstance(value, bool) or not isinstance(value, (int, str, bytes)):
+        raise TypeError(f"Tipo SNMP não suportado: {type(value).__name__}")
+    if isinstance(value, int):
+        return encode_integer(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return encode_tlv(TAG_OCTET_STRING, value)
+
+
+def encode_message(community: str, pdu_tag: int, request_id: int, varbinds: List[Tuple[str, object]],
+                   error_status: int = 0, error_index: int = 0) -> bytes:
+    bindings = b"".join(encode_tlv(TAG_SEQUENCE, encode_oid(oid) + encode_value(value)) for oid, value in varbinds)
+    pdu = encode_tlv(pdu_tag, encode_integer(request_id) + encode_integer(error_status)
+                     + encode_integer(error_index) + encode_tlv(TAG_SEQUENCE, bindings))
+    return encode_tlv(TAG_SEQUENCE, encode_integer(SNMP_VERSION_2C)
+                      + encode_tlv(TAG_OCTET_STRING, community.encode("utf-8")) + pdu)
+
+
+# ==============================================================================
+# Decodificação BER
+# ==============================================================================
+def decode_tlv(data: bytes, offset: int = 0) -> Tuple[int, bytes, int]:
+    """Retorna (tag, valor, próximo offset)."""
+    try:
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            length = int.from_bytes(data[offset:offset + size], "big")
+            offset += size
+    except IndexError:
+        raise SnmpError("Mensagem SNMP truncada")
+    if offset + length > len(data):
+        raise SnmpError("Mensagem SNMP truncada")
+    return tag, data[offset:offset + length], offset + length
+
+
+def decode_sequence(data: bytes) -> List[Tuple[int, bytes]]:
+    items = []
+    offset = 0
+    while offset < len(data):
+        tag, value, offset = decode_tlv(data, offset)
+        items.append((tag, value))
+    return items
+
+
+def decode_oid(raw: bytes) -> str:
+    if not raw:
+        raise SnmpError("OID vazio")
+    parts = [raw[0] // 40, raw[0] % 40]
+    value = 0
+    for byte in raw[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(p) for p in parts)
+
+
+def decode_value(tag: int, raw: bytes):
+    if tag == TAG_INTEGER:
+        return int.from_bytes(raw, "big", signed=True)
+    if tag in UNSIGNED_TAGS:
+        return int.from_bytes(raw, "big")
+    if tag == TAG_OCTET_STRING:
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return raw.hex()
+    if tag == TAG_OID:
+        return decode_oid(raw)
+    if tag == TAG_IP_ADDRESS:
+        return socket.inet_ntoa(raw)
+    # NULL, noSuchObject, noSuchInstance, endOfMibView
+    return None
+
+
+def decode_message(data: bytes) -> Dict:
+    """Decodifica uma mensagem SNMPv2c (GetRequest ou GetResponse)."""
+    tag, body, _ = decode_tlv(data)
+    if tag != TAG_SEQUENCE:
+        raise SnmpError("Mensagem SNMP inválida")
+    parts = decode_sequence(body)
+    if len(parts) != 3:
+        raise SnmpError("Mensagem SNMP inválida")
+    (_, version), (_, community), (pdu_tag, pdu) = parts
+    fields = decode_sequence(pdu)
+    if len(fields) != 4:
+        raise SnmpError("PDU SNMP inválida")
+    varbinds = []
+    for _, binding in decode_sequence(fields[3][1]):
+        (oid_tag, oid_raw), (value_tag, value_raw) = decode_sequence(binding)
+        varbinds.append((decode_oid(oid_raw), decode_value(value_tag, value_raw)))
+    return {
+        "version": int.from_bytes(version, "big"),
+        "community": community.decode("utf-8", "replace"),
+        "pdu_tag": pdu_tag,
+        "request_id": int.from_bytes(fields[0][1], "big", signed=True),
+        "error_status": int.from_bytes(fields[1][1], "big"),
+        "error_index": int.from_bytes(fields[2][1], "big"),
+        "varbinds": varbinds,
+    }
+
+
+# ==============================================================================
+# Cliente UDP
+# ==============================================================================
+class SnmpClient(asyncio.DatagramProtocol):
+    """
+    Cliente SNMPv2c GET com um único socket UDP compartilhado.
+    Requisições concorrentes são multiplexadas pelo request-id.
+    """
+
+    def __init__(self):
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._pending: Dict[int, Tuple[asyncio.Future, Tuple[str, int]]] = {}
+        self._request_ids = itertools.count(1)
+
+    async def start(self):
+        if self.transport is None:
+            loop = asyncio.get_running_loop()
+            await loop.create_datagram_endpoint(lambda: self, local_addr=("0.0.0.0", 0), family=socket.AF_INET)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            message = decode_message(data)
+        except (SnmpError, ValueError):
+            return
+        pending = self._pending.get(message["request_id"])
+        # Descarta respostas de outro endereço (spoofing/atrasadas)
+        if pending is None or pending[1][0] != addr[0] or pending[0].done():
+            return
+        pending[0].set_result(message)
+
+    def error_received(self, exc):
+        # ICMP port unreachable etc.: as requisições expiram pelo timeout
+        pass
+
+    def connection_lost(self, exc):
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Socket SNMP fechado"))
+
+    async def get(self, address: Tuple[str, int], community: str, oids: List[str],
+                  timeout: float = 2.0, retries: int = 1) -> Dict[str, object]:
+        """
+        SNMP GET em `address` (IP já resolvido, porta). Retorna {oid: valor}.
+        Levanta asyncio.TimeoutError se não houver resposta após as tentativas.
+        """
+        await self.start()
+        request_id = next(self._request_ids) % 0x7FFFFFFF or 1
+        packet = encode_message(community, PDU_GET_REQUEST, request_id, [(oid, None) for oid in oids])
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (future, address)
+        try:
+            for attempt in range(retries + 1):
+                self.transport.sendto(packet, address)
+                try:
+                    message = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+                    break
+                except asyncio.TimeoutError:
+                    if attempt == retries:
+                        raise
+        finally:
+            self._pending.pop(request_id, None)
+            if not future.done():
+                future.cancel()
+
+        if message["error_status"]:
+            raise SnmpError(f"SNMP error-status {message['error_status']} (index {message['error_index']})")
+        return dict(message["varbinds"])
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
@@ -0,0 +1,99 @@
+# ==============================================================================
+# NOC - Guardian NODE: Transporte HTTP para a Central
+# ==============================================================================
+# Sessão requests persistente com pool de conexões keep-alive: telemetria,
+# heartbeats e reenvios reutilizam a mesma conexão TCP/TLS com o Traefik em vez
+# de pagar um handshake novo a cada POST.
+#
+# Timeouts por endpoint (connect, read) e estatísticas de latência por endpoint.
+# ==============================================================================
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("guardian-node")
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("NODE_HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_POOL_SIZE = int(os.getenv("NODE_HTTP_POOL_SIZE", "4"))
+
+# Timeout de leitura por endpoint (segundos). Lotes e registro toleram mais.
+ENDPOINT_READ_TIMEOUTS = {
+    "ingest/heartbeat": float(os.getenv("NODE_HEARTBEAT_TIMEOUT", "5")),
+    "ingest/telemetry": float(os.getenv("NODE_TELEMETRY_TIMEOUT", "10")),
+    "ingest/telemetry/batch": float(os.getenv("NODE_BATCH_TIMEOUT", "30")),
+    "ingest/register": float(os.getenv("NODE_REGISTER_TIMEOUT", "10")),
+}
+DEFAULT_READ_TIMEOUT = 10.0
+
+
+class CentralClient:
+    """
+    Cliente HTTP da Central: uma sessão por processo, com keep-alive.
+    Thread-safe para uso concorrente (pool do urllib3).
+    """
+
+    def __init__(self, central_url: str, auth_token: Optional[str] = None,
+                 pool_size: int = HTTP_POOL_SIZE, connect_timeout: float = HTTP_CONNECT_TIMEOUT):
+        # CENTRAL_URL pode apontar para a raiz ou para um endpoint (.../ingest/telemetry)
+        self.base_url = central_url.split("/ingest")[0]
+        self.connect_timeout = connect_timeout
+        self.session = requests.Session()
+        if auth_token:
+            self.session.headers["Authorization"] = f"Bearer {auth_token}"
+        # Reenvia apenas falhas de conexão (o request não chegou a ser enviado);
+        # um POST que expirou na leitura não é repetido aqui (o buffer cuida disso)
+        retry = Retry(total=1, connect=1, read=0, status=0, redirect=0, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict] = {}
+
+    def timeout_for(self, endpoint_suffix: str) -> Tuple[float, float]:
+        return self.connect_timeout, ENDPOINT_READ_TIMEOUTS.get(endpoint_suffix, DEFAULT_READ_TIMEOUT)
+
+    def post(self, endpoint_suffix: str, **kwargs) -> requests.Response:
+        """POST em <base>/<endpoint_suffix> pela sessão persistente. Exceções de rede propagam."""
+        kwargs.setdefault("timeout", self.timeout_for(endpoint_suffix))
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(f"{self.base_url}/{endpoint_suffix}", **kwargs)
+            ok = True
+            return response
+        finally:
+            self._record(endpoint_suffix, (time.perf_counter() - started) * 1000, ok)
+
+    def _record(self, endpoint_suffix: str, elapsed_ms: float, ok: bool):
+        with self._lock:
+            stats = self.stats.setdefault(endpoint_suffix, {
+                "requests": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+            })
+            stats["requests"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["last_ms"] = elapsed_ms
+
+    def latency_summary(self) -> Dict[str, Dict]:
+        """Latência média/máxima por endpoint (ms), para logs e heartbeat."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": s["requests"],
+                    "errors": s["errors"],
+                    "avg_ms": round(s["total_ms"] / s["requests"], 2) if s["requests"] else None,
+                    "max_ms": round(s["max_ms"], 2),
+                }
+                for endpoint, s in self.stats.items()
+            }
+
+    def close(self):
+        self.session.close()
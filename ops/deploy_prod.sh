@@ -11,6 +11,9 @@ echo "Atualizando código do GitHub..."
 git fetch origin
 git reset --hard origin/master
 
+echo "Verificando módulos compartilhados (central/ e node/)..."
+cmp central/guardian_crypto.py node/guardian_crypto.py
+
 echo "Removendo imagens antigas..."
 docker image prune -f
 
@@ -16,11 +16,33 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from central.database import db
 
 # Configurações
-RETENTION_EVENTS_DAYS = 90
+RETENTION_EVENTS_DAYS = int(os.getenv("EVENTS_RETENTION_DAYS", "90"))
+RETENTION_TELEMETRY_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", "90"))
 RETENTION_ALERTS_DAYS = 180
 RETENTION_JSONL_DAYS = 7
 LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
+def format_bytes(num_bytes: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+def print_purge_report(report: dict):
+    """Exibe os bytes recuperados por tabela após a retenção."""
+    total = 0
+    for table, info in report.items():
+        total += info["bytes_reclaimed"]
+        print(f"[DB RETENTION] {table}: {info['removed']} | "
+              f"{format_bytes(info['bytes_before'])} -> {format_bytes(info['bytes_after'])} "
+              f"(recuperado: {format_bytes(info['bytes_reclaimed'])})")
+        compression = info.get("compression")
+        if compression:
+            print(f"[DB COMPRESSION] {table}: {compression['compressed_chunks']} chunks comprimidos, "
+                  f"economia de {format_bytes(compression['bytes_saved'])}")
+    print(f"[DB RETENTION] Total recuperado: {format_bytes(total)}")
+
 async def run_maintenance():
     print(f"[{datetime.now()}] Iniciando manutenção do NOC Guardian...")
     
@@ -28,7 +50,9 @@ async def run_maintenance():
     try:
         await db.connect()
         if db.enabled:
-            await db.purge_old_data(RETENTION_EVENTS_DAYS, RETENTION_ALERTS_DAYS)
+            report = await db.purge_old_data(RETENTION_EVENTS_DAYS, RETENTION_ALERTS_DAYS, RETENTION_TELEMETRY_DAYS)
+            if report:
+                print_purge_report(report)
         else:
             print("[WARN] Banco de dados não conectado. Pulando limpeza de DB.")
     except Exception as e:
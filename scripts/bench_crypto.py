@@ -0,0 +1,72 @@
+"""
+Benchmark da camada de criptografia (envelope AES-256-GCM).
+
+Compara o caminho antigo (AESGCM reconstruído a cada mensagem) com o KeyRing
+(cifra construída uma única vez) para payloads JSON de tamanhos variados.
+
+Reconstruir o AESGCM custa ~1.4us por mensagem (cryptography 42+): o ganho do
+KeyRing é desse tamanho e só aparece em payloads pequenos; acima de alguns KB o
+custo é dominado por json.dumps/loads e base64.
+
+Cada medição é o melhor de ROUNDS rodadas (menos sensível a ruído do que uma
+única rodada: as diferenças aqui são de poucos microssegundos por mensagem).
+
+Uso: python scripts/bench_crypto.py [repeticoes]
+"""
+import os
+import sys
+import json
+import base64
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "central"))
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from guardian_crypto import KeyRing
+
+KEY = os.urandom(32)
+SIZES = [256, 4 * 1024, 64 * 1024, 1024 * 1024]
+ROUNDS = 7
+
+
+def make_payload(size):
+    """Payload JSON de aproximadamente `size` bytes."""
+    return {"node_id": "BENCH-NODE", "blob": "x" * max(size - 40, 0)}
+
+
+def seal_per_message(data):
+    aesgcm = AESGCM(KEY)
+    nonce = os.urandom(12)
+    ciphertext = aesgcm.encrypt(nonce, json.dumps(data).encode("utf-8"), None)
+    return base64.b64encode(nonce + ciphertext).decode("utf-8")
+
+
+def open_per_message(envelope):
+    raw = base64.b64decode(envelope)
+    aesgcm = AESGCM(KEY)
+    return json.loads(aesgcm.decrypt(raw[:12], raw[12:], None).decode("utf-8"))
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    keyring = KeyRing({None: KEY})
+
+    print(f"{'tamanho':>10} | {'por-mensagem (us)':>18} | {'keyring (us)':>13} | ganho")
+    print("-" * 60)
+    for size in SIZES:
+        data = make_payload(size)
+        envelope = keyring.seal(data)
+        # Menos iterações para payloads grandes
+        number = repeat or max(10, 20000 // max(size // 1024, 1))
+
+        old = min(timeit.repeat(lambda: open_per_message(seal_per_message(data)), number=number, repeat=ROUNDS))
+        new = min(timeit.repeat(lambda: keyring.open(keyring.seal(data)), number=number, repeat=ROUNDS))
+        assert keyring.open(envelope) == data
+
+        old_us = old / number * 1e6
+        new_us = new / number * 1e6
+        print(f"{size:>10} | {old_us:>18.1f} | {new_us:>13.1f} | {old_us / new_us:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
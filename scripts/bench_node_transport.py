@@ -0,0 +1,77 @@
+"""
+Benchmark do transporte NODE -> Central.
+
+Compara requests.post() (uma conexão nova por envio) com o CentralClient do
+NODE (requests.Session com pool keep-alive) contra um servidor HTTP local.
+Mede latência média por envio e tempo de CPU do processo.
+
+Uso: python scripts/bench_node_transport.py [envios] [url]
+     (sem url, sobe um servidor HTTP/1.1 local com keep-alive)
+"""
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node"))
+
+import requests
+from transport import CentralClient
+
+PAYLOAD = {"payload": "x" * 2048}
+
+
+class StubCentral(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"status": "received"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(label, send, count):
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for _ in range(count):
+        response = send()
+        assert response.status_code == 200
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    print(f"{label:<28} | {elapsed / count * 1000:>10.3f} ms/envio | CPU {cpu / count * 1000:>8.3f} ms/envio")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = None
+    if len(sys.argv) > 2:
+        base_url = sys.argv[2].rstrip("/")
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubCentral)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    target = f"{base_url}/ingest/telemetry"
+    client = CentralClient(base_url)
+    print(f"Alvo: {target} ({count} envios)")
+
+    old = measure("requests.post (sem sessão)", lambda: requests.post(target, json=PAYLOAD, timeout=5), count)
+    new = measure("CentralClient (keep-alive)", lambda: client.post("ingest/telemetry", json=PAYLOAD), count)
+    print(f"Ganho: {old / new:.2f}x")
+
+    client.close()
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark do motor de polling do NODE (SNMPv2c) contra um responder UDP local.
+
+Sobe um agente SNMP simulado (GetRequest -> GetResponse) em 127.0.0.1 e cria N
+dispositivos apontando para ele; mede dispositivos consultados por segundo.
+ICMP fica desativado (o responder só fala SNMP).
+
+Uso: python scripts/bench_poller.py [dispositivos] [concorrencia] [atraso_ms]
+"""
+import os
+import sys
+import time
+import asyncio
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node"))
+
+from snmp import (PDU_GET_RESPONSE, TAG_NO_SUCH_OBJECT, TAG_TIMETICKS, SnmpError,
+                  decode_message, encode_message)
+from poller import Device, DevicePoller
+
+STUB_MIB = {
+    "1.3.6.1.2.1.1.3.0": (TAG_TIMETICKS, 123456),
+    "1.3.6.1.2.1.1.5.0": "stub-device",
+}
+
+
+class StubSnmpAgent(asyncio.DatagramProtocol):
+    """Agente SNMP simulado com atraso de resposta configurável (latência de rede)."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            request = decode_message(data)
+        except SnmpError:
+            return
+        self.requests += 1
+        varbinds = [(oid, STUB_MIB.get(oid, (TAG_NO_SUCH_OBJECT, 0))) for oid, _ in request["varbinds"]]
+        response = encode_message(request["community"], PDU_GET_RESPONSE, request["request_id"], varbinds)
+        delay = self.delay * random.uniform(0.5, 1.5)
+        asyncio.get_running_loop().call_later(delay, self.transport.sendto, response, addr)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    delay = (float(sys.argv[3]) if len(sys.argv) > 3 else 5.0) / 1000
+
+    loop = asyncio.get_running_loop()
+    agent = StubSnmpAgent(delay)
+    transport, _ = await loop.create_datagram_endpoint(lambda: agent, local_addr=("127.0.0.1", 0))
+    port = transport.get_extra_info("sockname")[1]
+
+    devices = [Device(f"dev-{i:04d}", "127.0.0.1", port=port, icmp=False, timeout=2.0) for i in range(count)]
+    poller = DevicePoller(devices, concurrency=concurrency)
+    print(f"{count} dispositivos, concorrência {concurrency}, atraso simulado ~{delay * 1000:.1f} ms")
+
+    for cycle in range(3):
+        started = time.perf_counter()
+        block = await poller.poll_cycle(now=time.time() + cycle * 3600)
+        elapsed = time.perf_counter() - started
+        print(f"ciclo {cycle + 1}: {block['up']}/{block['polled']} up em {elapsed * 1000:.1f} ms "
+              f"-> {block['polled'] / elapsed:.0f} dispositivos/s")
+
+    poller.close()
+    transport.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
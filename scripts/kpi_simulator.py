@@ -1,8 +1,12 @@
 import asyncio
 import os
-import json
+import sys
 import asyncpg
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "central"))
+
+from kpi import classify_idr, compute_idr
+
 # DB Config
 DB_USER = os.getenv("POSTGRES_USER", "guardian")
 DB_PASS = os.getenv("POSTGRES_PASSWORD", "guardian_pass")
@@ -16,12 +20,11 @@ async def calculate_kpi():
         dsn = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
         conn = await asyncpg.connect(dsn)
         
-        # Get last payload
+        # Último estado conhecido (node_latest: NODEs e Agents, métricas tipadas)
         row = await conn.fetchrow("""
-            SELECT details, node_id 
-            FROM events 
-            WHERE event_type = 'AGENT_INGEST_RECEIVED' 
-            ORDER BY time DESC 
+            SELECT node_id, cpu_usage, memory_usage, disk_usage
+            FROM node_latest
+            ORDER BY timestamp DESC
             LIMIT 1;
         """)
         
@@ -29,13 +32,10 @@ async def calculate_kpi():
             print("Nenhum dado encontrado.")
             return
 
-        payload = json.loads(row['details'])
-        metrics = payload.get("metrics", {})
-        
         # Extract Metrics
-        cpu = metrics.get("cpu_usage", 0)
-        ram = metrics.get("ram_usage", 0)
-        disk = metrics.get("disk_usage", 0)
+        cpu = row['cpu_usage'] or 0
+        ram = row['memory_usage'] or 0
+        disk = row['disk_usage'] or 0
         
         print(f"\n--- DADOS REAIS ({row['node_id']}) ---")
         print(f"CPU:  {cpu}%")
@@ -44,18 +44,9 @@ async def calculate_kpi():
         
         # --- KPI CALCULATION ---
         # KPI: Índice de Disponibilidade de Recursos (IDR)
-        # Lógica: O recurso mais saturado define o teto da saúde do servidor.
-        
-        max_saturation = max(cpu, ram, disk)
-        idr_score = 100 - max_saturation
-        idr_score = max(0, idr_score) # No negative scores
-        
-        # Classification
-        status = "HEALTHY"
-        if idr_score < 10: # >90% usage
-            status = "CRITICAL"
-        elif idr_score < 30: # >70% usage
-            status = "WARNING"
+        # Mesma fórmula e classificação da Central (central/kpi.py)
+        idr_score = compute_idr(cpu, ram, disk)
+        status = classify_idr(idr_score)
             
         print(f"\n--- KPI CALCULADO ---")
         print(f"KPI Nome: Índice de Disponibilidade de Recursos (IDR)")